@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class TokenBucket:
+    """`burst` tokens, refilled continuously at one token per `refill_seconds`."""
+
+    def __init__(self, burst, refill_seconds, now=None):
+        self.burst = burst; self.rate = 1.0 / refill_seconds
+        self.tokens = float(burst); self.updated = now  # None: starts full at the first take()
+
+    def ready(self, now):
+        """Refills up to `now`; True when a token is available (none is taken)."""
+        if self.updated is None: self.updated = now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate); self.updated = now
+        return self.tokens >= 1.0
+
+    def take(self, now):
+        if not self.ready(now): return False
+        self.tokens -= 1.0
+        return True
+
+
+class _Incident:
+    __slots__ = ("key", "bucket", "opened_at", "last_seen", "pending", "total", "max_score", "samples", "window", "due")
+
+    def __init__(self, key, bucket, now, window, samples):
+        self.key = key; self.bucket = bucket
+        self.opened_at = now; self.last_seen = now
+        self.pending = 0; self.total = 0; self.max_score = 0.0
+        self.samples = deque(maxlen=samples)
+        self.window = window; self.due = None
+
+
+class AlertAggregator:
+    """
+    Turns a stream of anomalous results into a handful of notifications per incident.
+
+    An incident is a run of anomalies with the same (meter_id, suggested_cause) key. Its first
+    anomaly is announced right away via `alert(result)`; later ones are coalesced and summarised
+    by `digest(summary)` when the coalescing window closes. Windows double after every digest (up to
+    `max_window`), and an incident that stays quiet for `quiet_period` is closed with a final digest
+    of whatever is still pending. Every notification spends a token from the key's bucket and from a
+    global one (both or neither); without tokens, readings stay pending until tokens come back, and a
+    final digest waits for them after its incident is closed. Final digests still waiting at stop()
+    are counted as suppressed.
+    At most `max_keys` incidents are tracked; the least recently active one is closed to make room.
+    The callbacks run outside the lock and should only queue work (e.g. on the outbound dispatcher).
+    """
+
+    def __init__(self, alert, digest, window=60.0, max_window=3600.0, quiet_period=300.0, burst=3, refill_seconds=600.0,
+                 global_burst=30, global_refill_seconds=20.0, max_keys=10_000, samples=5, interval=1.0):
+        self.alert = alert; self.digest = digest
+        self.window = window; self.max_window = max_window; self.quiet_period = quiet_period
+        self.burst = burst; self.refill_seconds = refill_seconds
+        self.global_bucket = TokenBucket(global_burst, global_refill_seconds)
+        self.max_keys = max_keys; self.samples = samples; self.interval = interval
+        self._incidents = OrderedDict()  # key -> _Incident, least recently active first
+        self._closed = deque()           # closed incidents whose final digest waits for a token, oldest first
+        self._lock = threading.Lock()
+        self._stop = threading.Event(); self._thread = None
+        self.counters = {"readings": 0, "alerts": 0, "digests": 0, "coalesced": 0, "rate_limited": 0, "evicted": 0, "suppressed": 0}
+
+    def _take(self, incident, now):
+        if incident.bucket.ready(now) and self.global_bucket.ready(now):
+            incident.bucket.take(now); self.global_bucket.take(now); return True
+        self.counters["rate_limited"] += 1
+        return False
+
+    def record(self, result, now=None):
+        """Feeds one anomalous result; returns "alert" if it is announced now, else "coalesced"."""
+        now = time.monotonic() if now is None else now
+        key = (result.get("meter_id"), result.get("suggested_cause"))
+        outbox = []
+        with self._lock:
+            self.counters["readings"] += 1
+            incident = self._incidents.get(key)
+            if incident is not None and now - incident.last_seen > self.quiet_period:
+                outbox.append(self._close(key, now)); incident = None
+            if incident is None:
+                if len(self._incidents) >= self.max_keys:
+                    old_key = next(iter(self._incidents)); self.counters["evicted"] += 1
+                    outbox.append(self._close(old_key, now))
+                incident = self._incidents[key] = _Incident(key, TokenBucket(self.burst, self.refill_seconds, now), now, self.window, self.samples)
+            else:
+                self._incidents.move_to_end(key)
+            incident.last_seen = now; incident.total += 1
+            incident.max_score = max(incident.max_score, float(result.get("anomaly_score") or 0.0))
+            if incident.total == 1 and self._take(incident, now):
+                outcome = "alert"; self.counters["alerts"] += 1
+            else:
+                outcome = "coalesced"; self.counters["coalesced"] += 1
+                incident.pending += 1; incident.samples.append(result)
+            if incident.due is None: incident.due = now + incident.window
+        self._deliver(outbox)
+        if outcome == "alert": self.alert(result)
+        return outcome
+
+    def _summary(self, incident, final):
+        meter_id, cause = incident.key
+        return {"meter_id": meter_id, "suggested_cause": cause, "readings": incident.pending, "incident_readings": incident.total,
+                "incident_seconds": round(incident.last_seen - incident.opened_at, 1), "max_score": round(incident.max_score, 4),
+                "samples": list(incident.samples), "final": final}
+
+    def _close(self, key, now):
+        """Removes an incident; returns its final digest, or None when nothing is pending or the digest has to wait for a token."""
+        incident = self._incidents.pop(key)
+        if not incident.pending: return None
+        if not self._take(incident, now):
+            if len(self._closed) >= self.max_keys: self._closed.popleft(); self.counters["suppressed"] += 1
+            self._closed.append(incident); return None
+        self.counters["digests"] += 1
+        return self._summary(incident, final=True)
+
+    def flush(self, now=None, close_all=False):
+        """
+        Sends digests whose window has closed, and final digests that were waiting for a token; closes quiet
+        incidents. close_all closes every incident and drops (as suppressed) the final digests still without a token.
+        """
+        now = time.monotonic() if now is None else now
+        outbox = []
+        with self._lock:
+            waiting = deque()
+            for incident in self._closed:
+                if self._take(incident, now): outbox.append(self._summary(incident, final=True)); self.counters["digests"] += 1
+                else: waiting.append(incident)
+            self._closed = waiting
+            for key, incident in list(self._incidents.items()):
+                if close_all or now - incident.last_seen > self.quiet_period:
+                    outbox.append(self._close(key, now))
+                elif incident.due is not None and now >= incident.due:
+                    if incident.pending and self._take(incident, now):
+                        outbox.append(self._summary(incident, final=False)); self.counters["digests"] += 1
+                        incident.pending = 0; incident.samples.clear()
+                        incident.window = min(self.max_window, incident.window * 2)
+                    incident.due = now + incident.window if incident.pending else None
+            if close_all: self.counters["suppressed"] += len(self._closed); self._closed.clear()
+        self._deliver(outbox)
+
+    def _deliver(self, outbox):
+        for summary in outbox:
+            if summary is not None: self.digest(summary)
+
+    def start(self):
+        if self._thread is not None: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="alert-aggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the flusher and sends the digests of every open incident."""
+        if self._thread is not None:
+            self._stop.set(); self._thread.join(); self._thread = None
+        self.flush(close_all=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try: self.flush()
+            except Exception as e: print(f"--- 💥 ERROR: Alert flush failed: {e} ---")
+
+    def stats(self):
+        with self._lock: return {"open_incidents": len(self._incidents), "waiting_digests": len(self._closed), **self.counters}
@@ -0,0 +1,31 @@
+# Decision rules applied on top of the model's scores. Shared by the server (main.py) and the offline
+# replay (backtest.py), so a backtest flags and explains readings exactly like /predict does.
+import numpy as np
+
+ANOMALY_THRESHOLD = 0.75
+SCORE_DECIMALS = 4        # scores are reported, and compared with ANOMALY_THRESHOLD, at this precision
+HIGH_CURRENT_THRESHOLD = 15.0; LOW_PF_THRESHOLD = 0.70; VOLTAGE_SAG_THRESHOLD = 210.0
+CURRENT_JUMP_THRESHOLD = 10.0  # amps between consecutive readings of one meter
+WINDOW_MIN_READINGS = 8   # readings in a window before its "sustained" score can raise an anomaly
+
+def round_score(score):
+    """A score (float or array) at the precision it is reported with."""
+    return np.round(score, SCORE_DECIMALS)
+
+def is_anomaly(score):
+    """Whether a score (float or array) flags an anomaly: the reported, rounded score is above ANOMALY_THRESHOLD."""
+    return round_score(score) > ANOMALY_THRESHOLD
+
+def suggest_anomaly_cause(data_payload, window=None):
+    v = data_payload.get('voltage', 230); i = data_payload.get('current', 0); pf = data_payload.get('power_factor', 1.0)
+    if window is not None and window["n"] >= WINDOW_MIN_READINGS:
+        mean, std = window["mean"], window["std"]
+        if abs(window["delta"]["current"]) > CURRENT_JUMP_THRESHOLD: return "Sudden Load Jump (Possible Bypass / Tampering)"
+        if mean["current"] > HIGH_CURRENT_THRESHOLD and std["current"] < 0.1 * mean["current"]:
+            return "Sustained High Current (Possible Theft or Overload)"
+        if mean["power_factor"] < LOW_PF_THRESHOLD: return "Persistently Low Power Factor (Possible Meter Bypass / Faulty Appliance)"
+    if i > HIGH_CURRENT_THRESHOLD:
+        return "High Current & Voltage Sag (Possible Short Circuit / Major Fault)" if v < VOLTAGE_SAG_THRESHOLD else "Sustained High Current (Possible Theft or Overload)"
+    elif pf < LOW_PF_THRESHOLD: return "Low Power Factor (Possible Industrial Motor Issue / Faulty Appliance)"
+    elif v < VOLTAGE_SAG_THRESHOLD: return "Significant Voltage Sag (Possible Grid Fault / Brownout)"
+    else: return "Unusual Pattern Detected (Check System)"
@@ -0,0 +1,175 @@
+"""
+Offline replay of historical telemetry through the server's scoring pipeline: the registry's
+compiled forest, the anomaly threshold and suggest_anomaly_cause (per reading; meter windows are
+not replayed, the canonical dataset carries no meter IDs).
+
+The dataset is converted once to the memory-mapped layout of dataset.py and scored in chunks by a
+process pool whose workers map the files themselves, so memory is bounded by the chunk size however
+large the dataset is. One pass produces, for every threshold of the sweep, the confusion matrix,
+precision, recall, F1 and the alert volume (readings flagged, per 1000 readings and, given
+--readings-per-day, per day), plus the suggested causes of the readings flagged at the server's
+threshold, split by label.
+
+Run from the project folder:
+    python backtest.py                                        # gridlock_dataset.csv, active model
+    python backtest.py fleet_2025.csv --version v0003 --workers 8 --out backtest.json
+    python backtest.py fleet_2025.csv --thresholds 0.5:0.95:0.05 --readings-per-day 2e6
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from anomaly_rules import ANOMALY_THRESHOLD, is_anomaly, round_score, suggest_anomaly_cause
+from dataset import FEATURES, Dataset, open_dataset
+from model_registry import ModelRegistry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join("ai_model", "registry")
+MODEL_PATH = os.path.join("ai_model", "gridlock_model.pkl")
+SCALER_PATH = os.path.join("ai_model", "scaler.pkl")
+CHUNK_ROWS = 1 << 18
+DEFAULT_THRESHOLDS = "0.05:0.95:0.05"
+
+_worker = {}
+
+
+def parse_thresholds(spec):
+    """"start:stop:step" (inclusive) or a comma-separated list; the server's threshold is always included."""
+    if ":" in spec:
+        start, stop, step = (float(x) for x in spec.split(":"))
+        values = np.arange(start, stop + step / 2, step)
+    else:
+        values = [float(x) for x in spec.split(",")]
+    return np.unique(np.round(np.append(values, ANOMALY_THRESHOLD), 6))
+
+def _init_worker(registry_dir, version, data_dir, thresholds):
+    _worker.update(engine=ModelRegistry(registry_dir).load(version).engine, data=Dataset(data_dir), thresholds=thresholds)
+
+def replay_chunk(start, end):
+    """
+    Scores rows [start, end). Returns counts[label, k] of readings with exactly k sweep thresholds
+    below their score (flagged at thresholds[:k]), and {(cause, label): n} over the readings the
+    server would flag.
+    """
+    data, engine, thresholds = _worker["data"], _worker["engine"], _worker["thresholds"]
+    X = np.asarray(data.X[start:end], dtype=np.float64); y = data.y[start:end]
+    scores = engine.predict_proba(X)[:, 1]
+    above = np.searchsorted(thresholds, round_score(scores), side="left")  # the reported score, as the server compares it
+    counts = np.stack([np.bincount(above[y == label], minlength=len(thresholds) + 1) for label in (0, 1)])
+    causes = {}
+    flagged = is_anomaly(scores)
+    for row, label in zip(X[flagged].tolist(), y[flagged].tolist()):
+        key = (suggest_anomaly_cause(dict(zip(FEATURES, row))), label)
+        causes[key] = causes.get(key, 0) + 1
+    return counts, causes
+
+
+def _ratio(a, b): return np.divide(a, b, out=np.zeros(len(a)), where=b > 0)
+
+def summarise(thresholds, counts, causes, readings_per_day=None):
+    """Per-threshold confusion matrices, precision/recall/F1 and alert volumes from the summed chunk counts."""
+    # flagged[label, i]: readings of that label scoring above thresholds[i] (a reverse cumulative sum).
+    flagged = counts[:, ::-1].cumsum(axis=1)[:, ::-1][:, 1:]
+    negatives, positives = counts.sum(axis=1)
+    tp, fp = flagged[1], flagged[0]
+    fn, tn = positives - tp, negatives - fp
+    precision = _ratio(tp, tp + fp); recall = _ratio(tp, tp + fn)
+    f1 = _ratio(2 * precision * recall, precision + recall); fpr = _ratio(fp, fp + tn)
+    total = positives + negatives; alerts = tp + fp
+    rows = []
+    for k, threshold in enumerate(thresholds.tolist()):
+        row = {"threshold": threshold, "tp": int(tp[k]), "fp": int(fp[k]), "tn": int(tn[k]), "fn": int(fn[k]),
+               "precision": round(float(precision[k]), 4), "recall": round(float(recall[k]), 4), "f1": round(float(f1[k]), 4),
+               "false_positive_rate": round(float(fpr[k]), 6), "alerts": int(alerts[k]),
+               "alerts_per_1k": round(1000.0 * alerts[k] / total, 3) if total else 0.0}
+        if readings_per_day: row["alerts_per_day"] = round(float(alerts[k]) / total * readings_per_day, 1) if total else 0.0
+        rows.append(row)
+    by_cause = {}
+    for (cause, label), n in causes.items():
+        entry = by_cause.setdefault(cause, {"cause": cause, "theft": 0, "normal": 0})
+        entry["theft" if label == 1 else "normal"] += n
+    return {"rows": int(total), "positives": int(positives), "negatives": int(negatives), "thresholds": rows,
+            "causes": sorted(by_cause.values(), key=lambda entry: -(entry["theft"] + entry["normal"]))}
+
+
+def run(data, registry_dir, version, thresholds, workers=None, chunk_rows=CHUNK_ROWS, progress=True):
+    """Replays the whole dataset; returns (summed counts, summed causes)."""
+    counts = np.zeros((2, len(thresholds) + 1), dtype=np.int64); causes = {}
+    ranges = [(start, min(start + chunk_rows, len(data))) for start in range(0, len(data), chunk_rows)]
+    initargs = (registry_dir, version, data.path, thresholds)
+    started = time.perf_counter(); done = 0
+    if workers == 1:
+        _init_worker(*initargs)
+        results = (replay_chunk(start, end) for start, end in ranges)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs)
+        results = (future.result() for future in as_completed([pool.submit(replay_chunk, s, e) for s, e in ranges]))
+    try:
+        for chunk_counts, chunk_causes in results:
+            counts += chunk_counts; done += 1
+            for key, n in chunk_causes.items(): causes[key] = causes.get(key, 0) + n
+            if progress:
+                elapsed = time.perf_counter() - started
+                print(f"   {done}/{len(ranges)} chunks, {min(done * chunk_rows, len(data)) / max(elapsed, 1e-9):,.0f} rows/s", end="\r")
+    finally:
+        if workers != 1: pool.shutdown(cancel_futures=True)
+    if progress: print()
+    return counts, causes
+
+
+def print_report(report):
+    print(f"\n📊 {report['rows']:,} readings ({report['positives']:,} theft) replayed through {report['model_version']} "
+          f"in {report['seconds']:.1f}s ({report['rows_per_second']:,.0f} rows/s)\n")
+    per_day = "alerts_per_day" in report["thresholds"][0] if report["thresholds"] else False
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'f1':>7} {'fpr':>9} {'alerts':>10} {'per 1k':>8}" + (f" {'per day':>10}" if per_day else ""))
+    for row in report["thresholds"]:
+        marker = "  ← server" if row["threshold"] == report["server_threshold"] else ""
+        print(f"{row['threshold']:>9.3f} {row['precision']:>9.4f} {row['recall']:>7.4f} {row['f1']:>7.4f} {row['false_positive_rate']:>9.6f} "
+              f"{row['alerts']:>10,} {row['alerts_per_1k']:>8.2f}" + (f" {row['alerts_per_day']:>10,.1f}" if per_day else "") + marker)
+    server = next(row for row in report["thresholds"] if row["threshold"] == report["server_threshold"])
+    print(f"\nConfusion matrix at {report['server_threshold']} (rows: actual normal/theft, columns: predicted normal/theft):")
+    print(f"   [[{server['tn']:>10,} {server['fp']:>10,}]\n    [{server['fn']:>10,} {server['tp']:>10,}]]")
+    if report["causes"]:
+        print("\nSuggested causes of flagged readings (theft / normal):")
+        for entry in report["causes"]: print(f"   {entry['theft']:>10,} / {entry['normal']:<10,} {entry['cause']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dataset", nargs="?", default=os.path.join(HERE, "gridlock_dataset.csv"),
+                        help="CSV (converted once to the memory-mapped layout) or an already converted directory")
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--version", help="model version to replay (default: the active one)")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="start:stop:step or a comma-separated list")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU; 1 runs inline)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--readings-per-day", type=float, help="fleet reading rate, to express alert volumes per day")
+    parser.add_argument("--out", help="write the report as JSON")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    registry.bootstrap(MODEL_PATH, SCALER_PATH)
+    version = args.version or registry.active_version()
+    if version is None or not registry.exists(version): raise SystemExit(f"❌ No model version {version!r} in {args.registry}.")
+    data = Dataset(args.dataset) if os.path.isdir(args.dataset) else open_dataset(args.dataset)
+    thresholds = parse_thresholds(args.thresholds)
+    print(f"▶ Replaying {len(data):,} readings from {args.dataset} through {version}, {len(thresholds)} thresholds")
+
+    started = time.perf_counter()
+    counts, causes = run(data, args.registry, version, thresholds, args.workers, args.chunk_rows)
+    seconds = time.perf_counter() - started
+    report = {"dataset": os.path.abspath(args.dataset), "model_version": version, "server_threshold": ANOMALY_THRESHOLD,
+              "seconds": round(seconds, 2), "rows_per_second": round(len(data) / seconds) if seconds else None,
+              **summarise(thresholds, counts, causes, args.readings_per_day)}
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Startup benchmark: cold start of the API server (fresh interpreter) to the first successful /predict,
+plus the cost of loading the model from pickles versus the compiled .npz format.
+Run from the project folder: python bench_startup.py [runs] [--out results.json]
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+RUNS = 5
+TIMEOUT = 60.0
+READING = {"voltage": 230.0, "current": 5.0, "power": 1100.0, "power_factor": 0.95}
+
+# Each snippet runs in its own interpreter, so import costs are included.
+LOAD_PICKLE = """
+import time; start = time.perf_counter()
+import joblib
+from inference import CompiledForest
+from model_registry import ModelRegistry
+r = ModelRegistry("ai_model/registry"); v = r.active_version()
+model, scaler = r.load_sklearn(v); CompiledForest.from_sklearn(model, scaler)
+print(time.perf_counter() - start)
+"""
+LOAD_NPZ = """
+import time; start = time.perf_counter()
+from inference import CompiledForest
+from model_registry import ModelRegistry, FOREST_FILE
+r = ModelRegistry("ai_model/registry"); v = r.active_version()
+CompiledForest.load(r.path(v, FOREST_FILE))
+print(time.perf_counter() - start)
+"""
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+
+def cold_start():
+    """Seconds from spawning the server to the first 200 from /predict."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/predict"
+    body = json.dumps(READING).encode()
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                               "--log-level", "warning"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < TIMEOUT:
+            if server.poll() is not None: raise SystemExit(f"❌ Server exited with code {server.returncode}.")
+            try:
+                request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+                with urllib.request.urlopen(request, timeout=1) as response:
+                    if response.status == 200: return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise SystemExit(f"❌ No successful /predict within {TIMEOUT}s.")
+    finally:
+        server.terminate(); server.wait(10)
+
+def timed_snippet(code):
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+def import_seconds():
+    code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+    return timed_snippet(code)
+
+def summary(values):
+    return {"median_s": round(statistics.median(values), 4), "min_s": round(min(values), 4), "max_s": round(max(values), 4)}
+
+def run(runs=RUNS):
+    import_seconds()  # first run migrates/compiles the registry if needed; not counted
+    results = {
+        "runs": runs,
+        "cold_start_to_first_predict": summary([cold_start() for _ in range(runs)]),
+        "import_main": summary([import_seconds() for _ in range(runs)]),
+        "model_load_pickle_and_compile": summary([timed_snippet(LOAD_PICKLE) for _ in range(runs)]),
+        "model_load_npz_mmap": summary([timed_snippet(LOAD_NPZ) for _ in range(runs)]),
+    }
+    for name, stats in results.items():
+        if name != "runs": print(f"{name:>32}: median {stats['median_s'] * 1000:8.1f} ms  (min {stats['min_s'] * 1000:.1f}, max {stats['max_s'] * 1000:.1f})")
+    return results
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    out = None
+    if "--out" in args:
+        i = args.index("--out"); out = args[i + 1]; del args[i:i + 2]
+    results = run(int(args[0]) if args else RUNS)
+    if out:
+        with open(out, "w") as f: json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {os.path.abspath(out)}")
@@ -0,0 +1,276 @@
+"""
+Benchmark suite for the hot paths: /predict (single and batch, through FastAPI's TestClient),
+perform_retraining at growing dataset sizes, add_to_ledger / verify_ledger at growing chain
+lengths and the log_user_feedback append rate.
+
+Everything runs offline in a throw-away working directory (copies of the model and dataset,
+fresh ledger and feedback log), with fixed seeds, so runs are comparable with each other.
+
+Run from the project folder:
+    python bench_suite.py                                   # default profile, prints results
+    python bench_suite.py --profile quick --out results.json
+    python bench_suite.py --baseline bench_baseline.json    # exit code 1 on a regression
+    python bench_suite.py --save-baseline bench_baseline.json
+Profiles: quick (CI-sized), default, full (retrain up to a synthetic 10M-row dataset; slow).
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_FILE = "gridlock_dataset.csv"
+MODEL_FILES = {"gridlock_model.pkl": ["ai_model/gridlock_model.pkl", "gridlock_model.pkl"],
+               "scaler.pkl": ["ai_model/scaler.pkl", "scaler.pkl"]}
+SEED = 42
+TOLERANCE = 0.25   # relative slowdown (or rate drop) reported as a regression
+
+PROFILES = {
+    "quick":   {"predict_single": 200,  "batch_sizes": [100, 1000],         "retrain_rows": [None, 100_000],
+                "ledger_lengths": [1_000, 5_000],            "feedback_rows": 2_000},
+    "default": {"predict_single": 1000, "batch_sizes": [100, 1000, 10_000], "retrain_rows": [None, 100_000, 1_000_000],
+                "ledger_lengths": [1_000, 10_000, 50_000],   "feedback_rows": 10_000},
+    "full":    {"predict_single": 2000, "batch_sizes": [100, 1000, 10_000], "retrain_rows": [None, 100_000, 1_000_000, 10_000_000],
+                "ledger_lengths": [1_000, 10_000, 100_000],  "feedback_rows": 50_000},
+}
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def quiet():
+    """The code under test prints on every call; send that to /dev/null while timing."""
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+def pct(values, q): return round(float(np.percentile(values, q)), 4)
+
+def find_artifact(candidates):
+    for path in candidates:
+        if os.path.exists(os.path.join(HERE, path)): return os.path.join(HERE, path)
+    raise SystemExit(f"❌ None of {candidates} found in {HERE}.")
+
+def prepare_workdir(workdir):
+    """Lays out the files main.py expects (ai_model/, dataset, ledger_web3 package) in `workdir`."""
+    os.makedirs(os.path.join(workdir, "ai_model"))
+    for name, candidates in MODEL_FILES.items(): shutil.copy(find_artifact(candidates), os.path.join(workdir, "ai_model", name))
+    shutil.copy(os.path.join(HERE, DATA_FILE), os.path.join(workdir, DATA_FILE))
+    if importlib.util.find_spec("ledger_web3") is None:
+        # Checkouts that keep ledger.py next to main.py: expose it under the package name main.py imports.
+        os.makedirs(os.path.join(workdir, "ledger_web3"))
+        open(os.path.join(workdir, "ledger_web3", "__init__.py"), "w").close()
+        shutil.copy(os.path.join(HERE, "ledger.py"), os.path.join(workdir, "ledger_web3", "ledger.py"))
+    sys.path[:0] = [workdir, HERE]
+    os.chdir(workdir)
+
+def synthetic_dataset(path, n_rows, seed=SEED, chunk_rows=1_000_000):
+    """
+    Writes `n_rows` rows shaped like gridlock_dataset.csv: real rows resampled with replacement,
+    with 1% (of each column's std) Gaussian jitter so the forest can't just memorise duplicates.
+    """
+    source = pd.read_csv(DATA_FILE)
+    features = ["Voltage", "Current", "Power", "Power_Factor"]
+    values = source[features].to_numpy(dtype=np.float64); labels = source["Label"].to_numpy()
+    jitter = values.std(axis=0) * 0.01
+    rng = np.random.default_rng(seed)
+    with open(path, "w") as f:
+        f.write(",".join(features + ["Label"]) + "\n")
+        for start in range(0, n_rows, chunk_rows):
+            n = min(chunk_rows, n_rows - start)
+            idx = rng.integers(0, len(values), size=n)
+            chunk = pd.DataFrame(values[idx] + rng.normal(0.0, 1.0, size=(n, len(features))) * jitter, columns=features)
+            chunk["Label"] = labels[idx]
+            chunk.to_csv(f, header=False, index=False, float_format="%.6g")
+
+
+def bench_predict(main, profile, readings):
+    from fastapi.testclient import TestClient
+    results = {}
+    rows = [dict(zip(["voltage", "current", "power", "power_factor"], r)) for r in readings.tolist()]
+    with TestClient(main.app) as client, quiet():
+        for row in rows[:50]: client.post("/predict", json=row)  # warm-up
+        n = profile["predict_single"]
+        latencies = []
+        start = time.perf_counter()
+        for row in rows[:n]:
+            t = time.perf_counter(); response = client.post("/predict", json=row); latencies.append((time.perf_counter() - t) * 1000)
+            if response.status_code != 200: raise SystemExit(f"❌ /predict returned {response.status_code}: {response.text}")
+        elapsed = time.perf_counter() - start
+        results["predict_single"] = {"requests": n, "p50_ms": pct(latencies, 50), "p95_ms": pct(latencies, 95),
+                                     "p99_ms": pct(latencies, 99), "requests_per_s": round(n / elapsed, 1)}
+
+        for size in profile["batch_sizes"]:
+            columns = {key: readings[:size, i].tolist() for i, key in enumerate(["voltage", "current", "power", "power_factor"])}
+            repeats = max(3, 2000 // size)
+            times = []
+            for _ in range(repeats):
+                t = time.perf_counter(); response = client.post("/predict_batch", json=columns); times.append(time.perf_counter() - t)
+                if response.status_code != 200: raise SystemExit(f"❌ /predict_batch returned {response.status_code}: {response.text}")
+            median = float(np.median(times))
+            results[f"predict_batch_{size}"] = {"repeats": repeats, "median_ms": round(median * 1000, 3),
+                                                 "readings_per_s": round(size / median, 1)}
+    return results
+
+def bench_retrain(main, profile):
+    results = {}
+    original = main.ORIGINAL_DATASET
+    for n_rows in profile["retrain_rows"]:
+        if n_rows is None:
+            path, label = original, f"{len(pd.read_csv(original))}_rows"
+        else:
+            path, label = f"synthetic_{n_rows}.csv", f"{n_rows}_rows"
+            t = time.perf_counter(); synthetic_dataset(path, n_rows)
+            print(f"   (generated {n_rows:,} synthetic rows in {time.perf_counter() - t:.1f}s)")
+        main.ORIGINAL_DATASET = path
+        try:
+            with quiet():
+                t = time.perf_counter(); info = main.perform_retraining("full"); elapsed = time.perf_counter() - t
+            if info is None: raise SystemExit(f"❌ perform_retraining returned nothing for {label}.")
+            results[f"retrain_full_{label}"] = {"rows": info["training_rows"], "total_s": round(elapsed, 3),
+                                                "fit_s": info["fit_seconds"], "oob_accuracy": info.get("oob_accuracy")}
+            print(f"   retrain full {label}: {elapsed:.2f}s")
+            if n_rows is None:
+                # One incremental round on the same data, fed by a small batch of feedback rows.
+                with quiet():
+                    for row in pd.read_csv(path).head(200).itertuples():
+                        main.log_user_feedback({"voltage": row.Voltage, "current": row.Current, "power": row.Power,
+                                                "power_factor": row.Power_Factor}, "theft" if row.Label else "normal")
+                    t = time.perf_counter(); info = main.perform_retraining("incremental"); elapsed = time.perf_counter() - t
+                if info is not None:
+                    results[f"retrain_incremental_{label}"] = {"rows": info["training_rows"], "total_s": round(elapsed, 3),
+                                                               "fit_s": info["fit_seconds"]}
+        finally:
+            main.ORIGINAL_DATASET = original
+            if n_rows is not None and os.path.exists(path): os.remove(path)
+    return results
+
+def bench_ledger(profile):
+    from ledger_web3 import ledger
+    results = {}
+    ledger.LEDGER_FILE = os.path.abspath("bench_ledger.jsonl")
+    entry = {"timestamp": 0.0, "payload": {"voltage": 230.0, "current": 5.0, "power": 1100.0, "power_factor": 0.95},
+             "anomaly_score": 0.9, "anomaly": True, "suggested_cause": "Bypass / Tampering"}
+    length = 0
+    for target in profile["ledger_lengths"]:
+        latencies = []
+        while length < target:
+            t = time.perf_counter(); ledger.add_to_ledger(entry); latencies.append((time.perf_counter() - t) * 1000)
+            length += 1
+        recent = latencies[-min(len(latencies), 1000):]
+        timings = {}
+        for mode in ("full", "parallel", "incremental"):
+            t = time.perf_counter(); ok = ledger.verify_ledger(mode=mode); timings[mode] = time.perf_counter() - t
+            if not ok: raise SystemExit(f"❌ verify_ledger({mode}) failed at {length} entries.")
+        results[f"ledger_{target}"] = {"entries": length, "append_p50_ms": pct(recent, 50), "append_p99_ms": pct(recent, 99),
+                                       "verify_full_s": round(timings["full"], 4), "verify_parallel_s": round(timings["parallel"], 4),
+                                       "verify_incremental_s": round(timings["incremental"], 4)}
+        print(f"   ledger {target:,}: append p50 {results[f'ledger_{target}']['append_p50_ms']} ms, full verify {timings['full']:.3f}s")
+    return results
+
+def bench_feedback(main, profile, readings):
+    n = profile["feedback_rows"]
+    main.feedback_store = main.FeedbackStore(os.path.abspath("bench_feedback"))
+    payloads = [dict(zip(["voltage", "current", "power", "power_factor"], r), suggested_cause="N/A") for r in readings[:n].tolist()]
+    with quiet():
+        t = time.perf_counter()
+        for i, payload in enumerate(payloads): main.log_user_feedback(payload, "theft" if i % 10 == 0 else "normal")
+        elapsed = time.perf_counter() - t
+    return {"feedback_append": {"rows": n, "total_s": round(elapsed, 4), "rows_per_s": round(n / elapsed, 1)}}
+
+
+def environment():
+    """Versions and the commit measured; "-dirty" marks tracked files changed since that commit."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        if commit and dirty: commit += "-dirty"
+    except OSError: commit = None
+    import sklearn
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__, "commit": commit or None,
+            "timestamp": time.time()}
+
+def run(profile_name="default", only=None):
+    profile = PROFILES[profile_name]
+    workdir = tempfile.mkdtemp(prefix="gridlock_bench_")
+    cwd = os.getcwd()
+    try:
+        prepare_workdir(workdir)
+        with quiet(): import main
+        main.send_real_email = lambda *args, **kwargs: None  # no network in benchmarks
+        readings = pd.read_csv(DATA_FILE)[["Voltage", "Current", "Power", "Power_Factor"]].to_numpy(dtype=np.float64)
+        readings = np.resize(readings[np.random.default_rng(SEED).permutation(len(readings))], (max(len(readings), 50_000), 4))
+        results = {}
+        sections = [("predict", lambda: bench_predict(main, profile, readings)), ("retrain", lambda: bench_retrain(main, profile)),
+                    ("ledger", lambda: bench_ledger(profile)), ("feedback", lambda: bench_feedback(main, profile, readings))]
+        for name, fn in sections:
+            if only and name not in only: continue
+            print(f"⏱️  {name}...")
+            results.update(fn())
+        return {"profile": profile_name, "environment": environment(), "results": results}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def metric_direction(name):
+    """-1 when lower is better (times), +1 when higher is better (rates), None for informational values."""
+    if "p99" in name: return None  # too few samples per run for a stable tail; reported, not gated
+    if name.endswith("_per_s"): return 1
+    if name.endswith("_ms") or name.endswith("_s"): return -1
+    return None
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    """Prints a metric-by-metric comparison; returns the list of regressions."""
+    regressions = []
+    print(f"\n{'benchmark':<34} {'metric':<22} {'baseline':>12} {'current':>12} {'change':>8}")
+    for bench, metrics in current["results"].items():
+        base = baseline["results"].get(bench)
+        if base is None: continue
+        for metric, value in metrics.items():
+            direction = metric_direction(metric); old = base.get(metric)
+            if direction is None or not old or value is None: continue
+            change = (value - old) / old
+            worse = -change * direction > tolerance
+            flag = " ❌" if worse else ""
+            print(f"{bench:<34} {metric:<22} {old:>12.4g} {value:>12.4g} {change * 100:>+7.1f}%{flag}")
+            if worse: regressions.append((bench, metric, old, value))
+    return regressions
+
+def print_results(report):
+    print(f"\n📊 Results ({report['profile']} profile, commit {report['environment']['commit']}):")
+    for bench, metrics in report["results"].items():
+        print(f"  {bench:<34} " + ", ".join(f"{k}={v}" for k, v in metrics.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GRIDLOCK AI benchmark suite")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--only", help="comma-separated subset of: predict, retrain, ledger, feedback")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against this results file; exit code 1 on a regression")
+    parser.add_argument("--save-baseline", help="write results to this file as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    report = run(args.profile, set(args.only.split(",")) if args.only else None)
+    print_results(report)
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f: json.dump(report, f, indent=2)
+        print(f"💾 Results written to {path}")
+    if args.baseline:
+        with open(args.baseline, "r") as f: baseline = json.load(f)
+        if baseline.get("profile") != report["profile"]: print(f"⚠️ Baseline was recorded with the {baseline.get('profile')} profile.")
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} metric(s) regressed by more than {args.tolerance * 100:.0f}%.")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline.")
@@ -0,0 +1,128 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+CASE_TTL = 7 * 24 * 3600         # seconds an unanswered case stays open
+RESOLVED_RETENTION = 30 * 24 * 3600  # seconds an answered case is kept for /cases
+STATUSES = ("open", "normal", "theft")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'open',
+    resolved_at REAL,
+    meter_id TEXT,
+    anomaly_score REAL,
+    suggested_cause TEXT,
+    model_version TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cases_status_created ON cases (status, created_at);
+CREATE INDEX IF NOT EXISTS cases_created ON cases (created_at);
+CREATE INDEX IF NOT EXISTS cases_expires ON cases (expires_at);
+"""
+_COLUMNS = ("id", "created_at", "expires_at", "status", "resolved_at", "meter_id", "anomaly_score",
+            "suggested_cause", "model_version", "payload")
+
+
+def new_case_id(now=None):
+    """Time-ordered and collision-free: millisecond timestamp (hex) plus 48 random bits."""
+    return f"case_{int((now or time.time()) * 1000):011x}{secrets.token_hex(6)}"
+
+
+class CaseStore:
+    """
+    Anomaly cases awaiting feedback, in SQLite (WAL mode, so readers never block the writer).
+    Each thread gets its own connection. Cases expire CASE_TTL seconds after they are opened, or
+    RESOLVED_RETENTION seconds after they are answered; a background sweeper deletes expired rows.
+    """
+
+    def __init__(self, path, ttl=CASE_TTL, retention=RESOLVED_RETENTION, sweep_interval=60.0):
+        self.path = path; self.ttl = ttl; self.retention = retention; self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._stop = threading.Event(); self._thread = None
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        with self._db() as db: db.executescript(_SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL"); db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def add_many(self, results):
+        """Opens one case per prediction result in a single transaction; returns the new IDs in order."""
+        now = time.time()
+        rows = [(new_case_id(now), now, now + self.ttl, result.get("meter_id"), result.get("anomaly_score"),
+                 result.get("suggested_cause"), result.get("model_version"),
+                 json.dumps({**result["payload"], "suggested_cause": result.get("suggested_cause")}))
+                for result in results]
+        if not rows: return []
+        with self._db() as db:
+            db.executemany("INSERT INTO cases (id, created_at, expires_at, meter_id, anomaly_score, suggested_cause, "
+                           "model_version, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return [row[0] for row in rows]
+
+    def get(self, case_id):
+        row = self._db().execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
+        return _as_dict(row)
+
+    def resolve(self, case_id, response):
+        """Marks an open case as answered. Returns the case, or None if it is unknown, expired or was already answered."""
+        now = time.time()
+        with self._db() as db:
+            row = db.execute("UPDATE cases SET status = ?, resolved_at = ?, expires_at = ? WHERE id = ? AND status = 'open' "
+                             "AND expires_at >= ? RETURNING *", (response, now, now + self.retention, case_id, now)).fetchone()
+        return _as_dict(row)
+
+    def query(self, status=None, since=None, until=None, meter_id=None, limit=100):
+        """Cases newest first, filtered by status, creation time range [since, until) and meter."""
+        clauses, params = [], []
+        if status is not None: clauses.append("status = ?"); params.append(status)
+        if since is not None: clauses.append("created_at >= ?"); params.append(since)
+        if until is not None: clauses.append("created_at < ?"); params.append(until)
+        if meter_id is not None: clauses.append("meter_id = ?"); params.append(meter_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._db().execute(f"SELECT * FROM cases {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_as_dict(row) for row in rows]
+
+    def count(self, status=None):
+        if status is None: return self._db().execute("SELECT COUNT(*) FROM cases").fetchone()[0]
+        return self._db().execute("SELECT COUNT(*) FROM cases WHERE status = ?", (status,)).fetchone()[0]
+
+    def sweep(self, now=None):
+        """Deletes expired cases; returns how many."""
+        with self._db() as db:
+            return db.execute("DELETE FROM cases WHERE expires_at < ?", (now or time.time(),)).rowcount
+
+    def start(self):
+        if self._thread is not None or self.sweep_interval <= 0: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="case-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None: return
+        self._stop.set(); self._thread.join(); self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                removed = self.sweep()
+                if removed: print(f"--- 🧹 Case sweeper removed {removed} expired case(s). ---")
+            except sqlite3.Error as e: print(f"--- ⚠️ Case sweeper failed: {e} ---")
+
+
+def _as_dict(row):
+    if row is None: return None
+    case = dict(zip(_COLUMNS, (row[name] for name in _COLUMNS)))
+    case["payload"] = json.loads(case["payload"])
+    return case
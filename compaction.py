@@ -0,0 +1,249 @@
+"""
+Forest compaction: a smaller CompiledForest for the serving path, chosen under a latency target and
+a maximum AUC/F1 loss against the full forest on held-out readings.
+
+The held-out readings are the dataset rows retraining never fits on (dataset.holdout_mask). They
+are split in two stratified halves: trees are ranked on the selection half, and the loss budget is
+checked (and reported) on the evaluation half only, so neither the fit nor the tree ranking has
+seen the rows the loss is measured on.
+
+The full forest is fitted with unlimited depth, and scoring walks every tree max_depth levels, so
+its latency grows with trees x depth rather than with what accuracy needs. Candidates combine
+two cuts:
+  - depth: every tree is cut at depth d; a node at that depth becomes a leaf that predicts its own
+    class probabilities (the training rows that reached it);
+  - tree subset: trees are ranked by greedy forward selection (each step adds the tree that most
+    lowers the Brier score of the running mean on the selection half) and only the first k are kept.
+For each depth the smallest k within the AUC/F1 budget is a candidate; every candidate's latency is
+measured, and the most accurate one under the target latency wins (the fastest one when none
+meets it). The result is an ordinary CompiledForest, so it is saved, memory-mapped and scored like
+the full one, and the report records size, latency and accuracy of the full forest and of every
+candidate.
+
+Run from the project folder to compact a published version in place (adds forest_compact.npz and
+compaction.json next to its forest.npz). Versions fitted before the holdout existed (the legacy
+import) have seen those rows; pass a file they were never trained on with --all-rows instead:
+    python compaction.py                                  # active version, held-out rows of gridlock_dataset.csv
+    python compaction.py --version v0003 --holdout holdout_2025.csv --all-rows --target-latency-us 100
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from anomaly_rules import ANOMALY_THRESHOLD
+from dataset import Dataset, holdout_mask, open_dataset
+from inference import CompiledForest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join("ai_model", "registry")
+DEPTHS = (4, 6, 8, 10, 12, 16, 20)  # cut depths tried (plus the forest's own depth)
+TARGET_LATENCY_US = 150.0    # predict_proba of a single reading, as /predict scores it
+MAX_AUC_LOSS = 0.002         # allowed drop against the full forest on the holdout
+MAX_F1_LOSS = 0.005          # at ANOMALY_THRESHOLD
+SELECTION_SHARE = 0.5        # of the held-out rows, used to rank trees; the rest checks the budget
+SELECTION_SEED = 0
+LATENCY_REPEATS = 200
+BATCH_ROWS = 1000
+
+
+def held_out_rows(data, all_rows=False):
+    """(X float64, y) of the rows of a Dataset that retraining keeps out of the fit (every row with all_rows)."""
+    if all_rows: return np.asarray(data.X, dtype=np.float64), np.asarray(data.y)
+    mask = holdout_mask(data.y)
+    return np.asarray(data.X[mask], dtype=np.float64), np.asarray(data.y[mask])
+
+
+def roc_auc(y, scores):
+    """Area under the ROC curve (the Mann-Whitney statistic, ties counted as half)."""
+    _, inverse, counts = np.unique(scores, return_inverse=True, return_counts=True)
+    ranks = (np.cumsum(counts) - (counts - 1) / 2.0)[inverse]  # average rank of each tie group
+    positive = y == 1; n_pos = int(positive.sum()); n_neg = len(y) - n_pos
+    if not n_pos or not n_neg: return float("nan")
+    return float((ranks[positive].sum() - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg))
+
+def f1_scores(y, flagged):
+    """F1 of each row of the boolean matrix `flagged` (candidates x readings) against labels y."""
+    positive = y == 1
+    tp = (flagged & positive).sum(axis=-1); fp = (flagged & ~positive).sum(axis=-1); fn = positive.sum() - tp
+    return np.divide(2.0 * tp, 2 * tp + fp + fn, out=np.zeros(np.shape(tp)), where=(2 * tp + fp + fn) > 0)
+
+
+def nodes_by_depth(engine, X, depths):
+    """{d: nodes (n_trees, n_samples) reached after d levels} for each d in depths (leaves stay put)."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    n_samples, n_features = X.shape
+    flat_x = X.ravel(); children = engine.children.ravel()
+    row = np.tile(np.arange(n_samples, dtype=np.intp) * n_features, engine.n_trees)
+    node = np.repeat(engine.roots, n_samples)
+    reached = {}
+    for level in range(max(depths) + 1):
+        if level in depths: reached[level] = node.reshape(engine.n_trees, n_samples).copy()
+        x = flat_x.take(row + engine.feature.take(node))
+        node = children.take(node * 2 + ~(x <= engine.threshold.take(node)))
+    return reached
+
+def greedy_order(P, y):
+    """Greedy forward selection over the rows of P (per-tree scores): each step adds the tree that most
+    lowers the Brier score of the running mean. Returns tree indices in selection order."""
+    order = []; total = np.zeros(P.shape[1]); remaining = np.ones(len(P), dtype=bool)
+    for k in range(1, len(P) + 1):
+        brier = (((total + P) / k - y) ** 2).mean(axis=1)  # every candidate tree at once
+        brier[~remaining] = np.inf
+        tree = int(np.argmin(brier))
+        order.append(tree); remaining[tree] = False; total += P[tree]
+    return order
+
+
+def subforest(engine, trees, depth):
+    """
+    A CompiledForest of the given trees (in that order), cut at `depth`: nodes at that depth become
+    leaves keeping their class probabilities, and nodes below them are dropped.
+    """
+    keep = []; levels = []
+    for root in engine.roots[list(trees)].tolist():
+        frontier = [root]; level = 0
+        while frontier:
+            keep += frontier; levels += [level] * len(frontier)
+            if level == depth: break
+            frontier = [int(child) for node in frontier if engine.children[node, 0] != node for child in engine.children[node]]
+            level += 1
+    old = np.asarray(keep, dtype=np.int64); levels = np.asarray(levels)
+    own = np.arange(len(old), dtype=np.int64)
+    leaf = (engine.children[old, 0] == old) | (levels == depth)
+    index = np.full(engine.n_nodes, -1, dtype=np.int64); index[old] = own
+    children = np.where(leaf[:, np.newaxis], own[:, np.newaxis], index[engine.children[old]])
+    return CompiledForest(np.where(leaf, 0, engine.feature[old]), np.where(leaf, np.inf, engine.threshold[old]),
+                          np.ascontiguousarray(children), np.ascontiguousarray(engine.value[old]),
+                          index[engine.roots[list(trees)]], int(levels.max()), np.asarray(engine.classes_))
+
+
+def size_bytes(engine):
+    return int(sum(getattr(engine, name).nbytes for name in ("feature", "threshold", "children", "value", "roots")))
+
+def measure_latency(engine, X, repeats=LATENCY_REPEATS, batch_rows=BATCH_ROWS):
+    """Median microseconds of predict_proba on a single reading, and per reading on a batch of batch_rows."""
+    single = X[:1]; batch = np.resize(X, (batch_rows, X.shape[1]))
+    engine.predict_proba(batch)  # warm-up: pages in memory-mapped arrays
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter(); engine.predict_proba(single); times.append(time.perf_counter() - start)
+    batch_times = []
+    for _ in range(max(3, repeats // 50)):
+        start = time.perf_counter(); engine.predict_proba(batch); batch_times.append(time.perf_counter() - start)
+    return round(float(np.median(times)) * 1e6, 1), round(float(np.median(batch_times)) / batch_rows * 1e6, 2)
+
+def describe(engine, X, auc, f1):
+    single_us, batch_us = measure_latency(engine, X)
+    return {"trees": engine.n_trees, "max_depth": engine.max_depth, "nodes": engine.n_nodes, "bytes": size_bytes(engine),
+            "auc": round(auc, 6), "f1": round(f1, 6), "latency_us": single_us, "batch_us_per_reading": batch_us}
+
+
+def compact(engine, X, y, target_latency_us=TARGET_LATENCY_US, max_auc_loss=MAX_AUC_LOSS, max_f1_loss=MAX_F1_LOSS,
+            depths=DEPTHS, progress=False):
+    """
+    Returns (compact CompiledForest, report) for `engine`, given readings (X, y) it was not fitted on.
+    A stratified SELECTION_SHARE of them ranks the trees; accuracy, and so the loss budget, is measured
+    on the rest. The report has the budget, the full forest's and every candidate's size, latency and
+    accuracy, and the chosen candidate; "target_met" is False when no candidate within the accuracy
+    budget reaches the target latency (the fastest one is chosen then).
+    """
+    X = np.asarray(X, dtype=np.float64); y = np.asarray(y).astype(np.int64)
+    select = holdout_mask(y, fraction=SELECTION_SHARE, max_rows=len(y), seed=SELECTION_SEED)
+    X_select, y_select, X, y = X[select], y[select], X[~select], y[~select]
+    if not len(y_select) or len(np.unique(y)) < 2: raise ValueError("Too few held-out readings of each label to compact on.")
+    positive = int(np.flatnonzero(engine.classes_ == 1)[0]) if (engine.classes_ == 1).any() else engine.value.shape[1] - 1
+    full_scores = engine.predict_proba(X)[:, positive]
+    full_auc = roc_auc(y, full_scores); full_f1 = float(f1_scores(y, full_scores > ANOMALY_THRESHOLD))
+    full = describe(engine, X, full_auc, full_f1)
+    depths = sorted({d for d in depths if d < engine.max_depth} | {engine.max_depth})
+
+    candidates = []
+    reached_select = nodes_by_depth(engine, X_select, depths)
+    for depth, nodes in nodes_by_depth(engine, X, depths).items():
+        order = greedy_order(engine.value[:, positive].take(reached_select.pop(depth)), y_select)
+        P = engine.value[:, positive].take(nodes)
+        # Running means in selection order: row k-1 is the score of the first k trees, summed tree by
+        # tree like predict_proba does, so it equals the compact forest's score exactly.
+        scores = np.add.accumulate(P[order], axis=0) / np.arange(1, len(order) + 1)[:, np.newaxis]
+        f1 = f1_scores(y, scores > ANOMALY_THRESHOLD)
+        for k in range(1, len(order) + 1):
+            if full_f1 - f1[k - 1] > max_f1_loss: continue
+            auc = roc_auc(y, scores[k - 1])
+            if full_auc - auc > max_auc_loss: continue
+            forest = subforest(engine, order[:k], depth)
+            candidates.append((forest, {**describe(forest, X, auc, float(f1[k - 1])), "cut_depth": depth,
+                                        "auc_loss": round(full_auc - auc, 6), "f1_loss": round(full_f1 - float(f1[k - 1]), 6)}))
+            if progress: print(f"   depth {depth:>3}: {k:>3} trees, {candidates[-1][1]['latency_us']:>8.1f}µs, AUC {auc:.4f}")
+            break
+
+    for _, row in candidates: row["meets_target"] = row["latency_us"] <= target_latency_us
+    fast_enough = [c for c in candidates if c[1]["meets_target"]]
+    if fast_enough: forest, chosen = max(fast_enough, key=lambda c: (c[1]["auc"], c[1]["f1"], -c[1]["nodes"]))
+    else: forest, chosen = min(candidates, key=lambda c: c[1]["latency_us"])
+    report = {"target_latency_us": target_latency_us, "max_auc_loss": max_auc_loss, "max_f1_loss": max_f1_loss,
+              "threshold": ANOMALY_THRESHOLD, "selection_rows": len(y_select),
+              "evaluation_rows": len(y), "evaluation_positives": int((y == 1).sum()),
+              "full": full, "candidates": [row for _, row in candidates], "chosen": chosen, "target_met": bool(fast_enough),
+              "speedup": round(full["latency_us"] / chosen["latency_us"], 2) if chosen["latency_us"] else None,
+              "size_ratio": round(chosen["bytes"] / full["bytes"], 4)}
+    return forest, report
+
+def compact_for_dataset(engine, dataset_path, all_rows=False, **budget):
+    """compact() on the held-out rows of the dataset at dataset_path (a CSV or a converted directory), or on all of them."""
+    data = Dataset(dataset_path) if os.path.isdir(dataset_path) else open_dataset(dataset_path)
+    X, y = held_out_rows(data, all_rows)
+    forest, report = compact(engine, X, y, **budget)
+    report["holdout"] = {"path": os.path.abspath(dataset_path), "rows": "all" if all_rows else "held out of training"}
+    return forest, report
+
+def try_compact(engine, dataset_path, **budget):
+    """compact_for_dataset() for the retraining pipeline: a failure yields (None, {"error": ...}) rather than failing the retrain."""
+    try: return compact_for_dataset(engine, dataset_path, **budget)
+    except Exception as e: return None, {"error": f"{type(e).__name__}: {e}"}
+
+
+def print_report(report):
+    full, chosen = report["full"], report["chosen"]
+    print(f"\n📦 Budget: ≤{report['target_latency_us']}µs per reading, AUC loss ≤{report['max_auc_loss']}, F1 loss ≤{report['max_f1_loss']} "
+          f"on {report['evaluation_rows']:,} held-out readings ({report['evaluation_positives']:,} theft; "
+          f"{report['selection_rows']:,} more ranked the trees)\n")
+    print(f"{'':>8} {'trees':>5} {'depth':>5} {'nodes':>8} {'KiB':>8} {'µs/call':>8} {'µs/row':>7} {'AUC':>8} {'F1':>7}")
+    for name, row in [("full", full)] + [("", row) for row in report["candidates"]]:
+        marker = "  ← chosen" if row is chosen else ""
+        print(f"{name:>8} {row['trees']:>5} {row['max_depth']:>5} {row['nodes']:>8,} {row['bytes'] / 1024:>8.1f} {row['latency_us']:>8.1f} "
+              f"{row['batch_us_per_reading']:>7.2f} {row['auc']:>8.5f} {row['f1']:>7.4f}{marker}")
+    print(f"\n{'✅' if report['target_met'] else '⚠️'} {report['speedup']}x faster, {report['size_ratio']:.1%} of the size"
+          + ("" if report["target_met"] else " (target latency not reached within the accuracy budget)"))
+
+
+def main():
+    from model_registry import ModelRegistry
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registry", default=REGISTRY_DIR)
+    parser.add_argument("--version", help="model version to compact (default: the active one)")
+    parser.add_argument("--holdout", default=os.path.join(HERE, "gridlock_dataset.csv"),
+                        help="labelled CSV (or converted directory) the accuracy loss is measured on")
+    parser.add_argument("--all-rows", action="store_true",
+                        help="use every row of --holdout (a file the model never saw), not only its held-out split")
+    parser.add_argument("--target-latency-us", type=float, default=TARGET_LATENCY_US)
+    parser.add_argument("--max-auc-loss", type=float, default=MAX_AUC_LOSS)
+    parser.add_argument("--max-f1-loss", type=float, default=MAX_F1_LOSS)
+    parser.add_argument("--dry-run", action="store_true", help="print the report without storing the compact forest")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    version = args.version or registry.active_version()
+    if version is None or not registry.exists(version): raise SystemExit(f"❌ No model version {version!r} in {args.registry}.")
+    print(f"▶ Compacting {version} against {args.holdout}")
+    forest, report = compact_for_dataset(registry.load(version).engine, args.holdout, args.all_rows, target_latency_us=args.target_latency_us,
+                                         max_auc_loss=args.max_auc_loss, max_f1_loss=args.max_f1_loss, progress=True)
+    print_report(report)
+    if not args.dry_run:
+        registry.attach_compact(version, forest, report)
+        print(f"\n💾 Stored with {version} in {registry.path(version)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2 @@
+# test_model.py is the standalone model evaluation script (python test_model.py), not a pytest module.
+collect_ignore = ["test_model.py"]
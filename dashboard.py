@@ -1,24 +1,32 @@
 import streamlit as st
 import pandas as pd
 import time
-import json
 import os
 import requests
-from ledger_web3.ledger import verify_ledger 
+from ledger_web3.ledger import verify_ledger
+from feedback_store import FeedbackStore
+from live_feed import LiveFeed
 
 try: from gtts import gTTS; GTTS_ENABLED = True
 except ImportError: print("WARNING: gTTS not found. Voice alerts disabled."); GTTS_ENABLED = False
 
 st.set_page_config(page_title="GRIDLOCK AI", page_icon="⚡", layout="wide")
 LIVE_STATUS_FILE = "live_status.json"
-LEDGER_FILE = "web3_ledger.json"
-FEEDBACK_LOG = "user_feedback_data.csv"
+LEDGER_FILE = "web3_ledger.jsonl"
+FEEDBACK_DIR = "feedback_store"
+PAGE_ROWS = 100
 VOICE_ALERT_FILE = "alert.mp3"
 BACKEND_URL_FEEDBACK = "http://127.0.0.1:8000/feedback_dashboard" 
 BACKEND_URL_RETRAIN = "http://127.0.0.1:8000/retrain" 
+BACKEND_URL_STATUS = "http://127.0.0.1:8000/status"
+BACKEND_URL_STREAM = "http://127.0.0.1:8000/stream"
+BACKEND_URL_LEDGER_PAGE = "http://127.0.0.1:8000/ledger/entries"
+BACKEND_URL_FEEDBACK_PAGE = "http://127.0.0.1:8000/feedback/entries"
+CHART_POINTS = 100
+LIVE_WAIT_TIMEOUT = 1.0     # seconds the page blocks on the feed before re-checking its timers and redrawing the feed status
+PANEL_CHECK_INTERVAL = 5.0  # seconds between data-version checks of the ledger, feedback and retraining panels
 
 if "public_webhook_url" not in st.session_state: st.session_state.public_webhook_url = ""
-if 'chart_data' not in st.session_state: st.session_state.chart_data = pd.DataFrame(columns=["timestamp", "Power"])
 if 'anomaly_in_progress' not in st.session_state: st.session_state.anomaly_in_progress = False
 if 'anomaly_data_payload' not in st.session_state: st.session_state.anomaly_data_payload = None
 if 'anomaly_trigger_score' not in st.session_state: st.session_state.anomaly_trigger_score = 0.75
@@ -28,6 +36,9 @@ if 'current_anomaly_threshold' not in st.session_state: st.session_state.current
 if 'threshold_override_time' not in st.session_state: st.session_state.threshold_override_time = 0 
 if 'suggested_cause' not in st.session_state: st.session_state.suggested_cause = None 
 if 'retraining_status' not in st.session_state: st.session_state.retraining_status = "" 
+if 'retrain_job_id' not in st.session_state: st.session_state.retrain_job_id = None
+if 'ledger_pages' not in st.session_state: st.session_state.ledger_pages = [None]  # `before` cursors of the pages walked, newest first
+if 'feedback_pages' not in st.session_state: st.session_state.feedback_pages = [None]
 
 @st.cache_resource
 def generate_voice_alert():
@@ -42,44 +53,63 @@ def generate_voice_alert():
 def play_voice_alert(audio_bytes):
     if audio_bytes and GTTS_ENABLED: st.audio(audio_bytes, format='audio/mp3', autoplay=True)
 
-@st.cache_data(ttl=1)
+@st.cache_resource
+def live_feed():
+    """One SSE subscription to the backend per dashboard process, shared by every viewer."""
+    return LiveFeed(BACKEND_URL_STREAM, BACKEND_URL_STATUS, LIVE_STATUS_FILE, capacity=CHART_POINTS).start()
+
 def get_live_data():
-    if not os.path.exists(LIVE_STATUS_FILE): return None
-    try:
-        with open(LIVE_STATUS_FILE, "r") as f: return json.load(f)
-    except: return None
-
-@st.cache_data(ttl=5)
-def load_ledger_file():
-    if os.path.exists(LEDGER_FILE):
-        try: return pd.read_json(LEDGER_FILE)
-        except: return pd.DataFrame()
-    return pd.DataFrame()
-
-@st.cache_data(ttl=5)
-def load_feedback_file():
-    if os.path.exists(FEEDBACK_LOG):
-        try: return pd.read_csv(FEEDBACK_LOG)
-        except: return pd.DataFrame()
-    return pd.DataFrame()
+    """Newest reading pushed by the backend (or from the disk snapshot while it is unreachable)."""
+    return live_feed().latest
+
+def ledger_version():
+    try: stat = os.stat(LEDGER_FILE); return (stat.st_size, stat.st_mtime_ns)
+    except OSError: return None
+
+def fetch_page(url, **params):
+    """One newest-first page from a backend listing endpoint: (DataFrame, next cursor or None)."""
+    try: page = requests.get(url, params={"limit": PAGE_ROWS, **params}, timeout=2).json()
+    except Exception: return pd.DataFrame(), None
+    return pd.DataFrame(page.get("entries", [])), page.get("next_cursor")
+
+@st.cache_data(max_entries=32)
+def load_ledger_page(version, before=None, suggested_cause=None):
+    """A ledger page; only the newest page (before=None) depends on `version`, older ones never change."""
+    return fetch_page(BACKEND_URL_LEDGER_PAGE, before=before, suggested_cause=suggested_cause)
+
+@st.cache_resource
+def feedback_store(): return FeedbackStore(FEEDBACK_DIR)
+
+def feedback_version():
+    try: return feedback_store().count()
+    except Exception: return None
+
+@st.cache_data(max_entries=32)
+def load_feedback_page(version, before=None, label=None, suggested_cause=None):
+    return fetch_page(BACKEND_URL_FEEDBACK_PAGE, before=before, label=label, suggested_cause=suggested_cause)
+
+def reset_pages(name): st.session_state[name] = [None]
+
+def page_controls(name, next_cursor):
+    """Newer/Older buttons walking the cursor stack of one table."""
+    pages = st.session_state[name]
+    col_newer, col_older = st.columns(2)
+    if col_newer.button("‹ Newer", key=f"{name}_newer", disabled=len(pages) == 1, use_container_width=True):
+        pages.pop(); st.rerun()
+    if col_older.button("Older ›", key=f"{name}_older", disabled=next_cursor is None, use_container_width=True):
+        pages.append(next_cursor); st.rerun()
 
 def submit_feedback_to_backend(data, response):
-    """Sends feedback to backend, logs locally, clears caches."""
-    log_payload = data.copy() if data else {}
-    log_payload['Label'] = 0 if response == "normal" else 1
-    file_exists = os.path.isfile(FEEDBACK_LOG)
+    """Logs feedback to the shared store and reports every answer to the backend, which counts it
+    (logged=True: the row is already stored) and, for confirmed theft, records it on the ledger."""
     try:
-        with open(FEEDBACK_LOG, "a") as f:
-            if not file_exists: f.write("voltage,current,power,power_factor,suggested_cause,Label\n")
-            f.write(f"{log_payload.get('voltage','N/A')},{log_payload.get('current','N/A')},{log_payload.get('power','N/A')},{log_payload.get('power_factor','N/A')},{log_payload.get('suggested_cause','N/A')},{log_payload.get('Label')}\n")
-        load_feedback_file.clear()
+        feedback_store().append([{**(data or {}), "label": 0 if response == "normal" else 1}], source="dashboard")
     except Exception as e: print(f"Error writing local feedback log: {e}")
 
-    if response == "theft" and data:
+    if data:
         try:
-            payload = {"data": data, "response": response}
+            payload = {"data": data, "response": response, "logged": True}
             requests.post(BACKEND_URL_FEEDBACK, json=payload)
-            load_ledger_file.clear()
         except Exception as e:
             st.error(f"Error submitting feedback to backend: {e}")
 
@@ -88,13 +118,29 @@ def trigger_retraining():
     try:
         response = requests.post(BACKEND_URL_RETRAIN)
         if response.status_code == 200:
+            st.session_state.retrain_job_id = response.json().get("job_id")
             st.session_state.retraining_status = "⏳ Retraining started in background..."
-            load_feedback_file.clear() 
         else:
             st.session_state.retraining_status = f"❌ Error starting retraining: {response.text}"
     except Exception as e:
         st.session_state.retraining_status = f"❌ Connection error during retraining request: {e}"
 
+def refresh_retraining_status():
+    """Polls the backend for the current retraining job and summarises it for the sidebar."""
+    job_id = st.session_state.retrain_job_id
+    if not job_id: return
+    try: job = requests.get(f"{BACKEND_URL_RETRAIN}/{job_id}", timeout=1).json()
+    except Exception: return
+    if job.get("status") in ("queued", "running"):
+        st.session_state.retraining_status = f"⏳ Retraining ({job['mode']}): {job['stage']} ({job['progress'] * 100:.0f}%)"
+    elif job.get("status") == "succeeded":
+        metrics = job.get("metrics") or {}
+        st.session_state.retraining_status = f"✅ Retrained ({metrics.get('mode')}, {metrics.get('training_rows')} rows, {job['timings'].get('total_seconds')}s)"
+        st.session_state.retrain_job_id = None
+    else:
+        st.session_state.retraining_status = f"ℹ️ Retraining {job.get('status')}: {job.get('error') or 'no new feedback'}"
+        st.session_state.retrain_job_id = None
+
 with st.sidebar:
     st.header("Public Proof")
     st.session_state.public_webhook_url = st.text_input("Webhook URL", value=st.session_state.public_webhook_url)
@@ -106,29 +152,38 @@ with st.sidebar:
     st.header("AI Management")
     if st.button("🧠 Retrain AI with Latest Feedback", use_container_width=True):
         trigger_retraining()
-    if st.session_state.retraining_status:
-        st.info(st.session_state.retraining_status)
+    refresh_retraining_status()
+    if st.session_state.retrain_job_id and st.button("✖ Cancel Retraining", use_container_width=True):
+        requests.post(f"{BACKEND_URL_RETRAIN}/{st.session_state.retrain_job_id}/cancel")
+    retraining_placeholder = st.empty()
 
 
 st.title("⚡ GRIDLOCK AI")
 col_live, col_feedback = st.columns([2, 1])
-with col_live: st.subheader("Live Grid Status"); live_placeholder = st.empty()
+with col_live: st.subheader("Live Grid Status"); feed_status_placeholder = st.empty(); live_placeholder = st.empty()
 with col_feedback: st.subheader("Anomaly Response"); feedback_placeholder = st.empty()
 st.subheader("Live Power Chart"); chart_placeholder = st.empty()
 
-audio_bytes = generate_voice_alert()
-live_data = get_live_data()
-run_loop = True
-
-if live_data:
-    df_chart = st.session_state.chart_data
-    now = pd.to_datetime(live_data['timestamp'], unit='s')
-    new_row = pd.DataFrame({"timestamp": [now], "Power": [live_data['payload']['power']]})
-    df_chart = pd.concat([df_chart, new_row], ignore_index=True).tail(100)
-    st.session_state.chart_data = df_chart
-    chart_df_indexed = df_chart.set_index('timestamp')
-    chart_placeholder.line_chart(chart_df_indexed, y="Power")
-
+def render_chart():
+    """Redraws the chart from the feed's fixed-size buffer (at most CHART_POINTS points, no concatenation)."""
+    times, power = live_feed().chart()
+    if not len(times): chart_placeholder.info("Waiting for live data feed..."); return
+    chart_placeholder.line_chart(pd.DataFrame({"Power": power}, index=pd.to_datetime(times, unit="s")), y="Power")
+
+def render_feed_status():
+    """One-line connection state and age of the newest reading. Redrawn on every idle wait: Streamlit only
+    acts on a button click or widget change at the script's next st.* call, so the loop must keep making them."""
+    feed = live_feed(); latest = feed.latest
+    age = f"last reading {max(time.time() - latest.get('timestamp', time.time()), 0):.0f}s ago" if latest else "no readings yet"
+    source = "🟢 Live stream" if feed.connected else "🟠 Backend unreachable, following the status snapshot"
+    feed_status_placeholder.caption(f"{source} · {age}")
+
+def render_live(live_data):
+    """Draws the live metrics and status; returns True when the anomaly state changed and the page must rerun."""
+    if not live_data:
+        with live_placeholder.container(): st.info("Waiting for live data feed...")
+        return False
+    was_in_progress = st.session_state.anomaly_in_progress
     score = live_data.get('anomaly_score', 0)
     if time.time() > st.session_state.threshold_override_time: st.session_state.current_anomaly_threshold = 0.75 
     is_anomaly = bool(score > st.session_state.current_anomaly_threshold)
@@ -158,11 +213,19 @@ if live_data:
                 st.session_state.anomaly_data_payload = None
                 st.session_state.feedback_given = None
                 st.session_state.suggested_cause = None
+    return st.session_state.anomaly_in_progress != was_in_progress
 
-else:
-    chart_placeholder.info("Waiting for live data feed...")
-    with live_placeholder.container(): st.info("Waiting for live data feed...")
-    run_loop = True
+def render_retraining_status():
+    if st.session_state.retraining_status: retraining_placeholder.info(st.session_state.retraining_status)
+
+audio_bytes = generate_voice_alert()
+feed = live_feed()
+feed_version = feed.version
+render_feed_status()
+render_chart()
+render_live(feed.latest)
+render_retraining_status()
+run_loop = True
 
 if st.session_state.anomaly_in_progress:
 
@@ -229,19 +292,59 @@ st.divider()
 col_ledger, col_adaptive = st.columns(2)
 with col_ledger:
     st.subheader("Local Tamper-Proof Ledger")
-    if st.button("Verify Local Ledger"):
-        if verify_ledger(): st.success("✅ VALID")
+    col_verify, col_full = st.columns(2)
+    if col_verify.button("Verify Local Ledger"):
+        if verify_ledger(): st.success("✅ VALID (new entries since last check)")
+        else: st.error("🚨 TAMPERED!")
+    if col_full.button("Full Verify (all entries)"):
+        if verify_ledger(mode="parallel"): st.success("✅ VALID (entire chain)")
         else: st.error("🚨 TAMPERED!")
-    ledger_df = load_ledger_file()
-    if not ledger_df.empty: st.dataframe(ledger_df.iloc[::-1], height=300, use_container_width=True)
-    else: st.info("No confirmed theft events.")
+    st.text_input("Suggested cause", key="ledger_cause", on_change=reset_pages, args=("ledger_pages",))
+    ledger_placeholder = st.empty(); ledger_controls = st.container()
 
 with col_adaptive:
     st.subheader("User Feedback Log")
-    feedback_df = load_feedback_file()
-    if not feedback_df.empty: st.dataframe(feedback_df.iloc[::-1], height=300, use_container_width=True)
-    else: st.info("No user feedback logged.")
-
-if run_loop:
-    time.sleep(3)
-    st.rerun()
+    col_label, col_cause = st.columns(2)
+    col_label.selectbox("Label", ["All", "Normal", "Theft"], key="feedback_label", on_change=reset_pages, args=("feedback_pages",))
+    col_cause.text_input("Suggested cause", key="feedback_cause", on_change=reset_pages, args=("feedback_pages",))
+    feedback_table_placeholder = st.empty(); feedback_controls = st.container()
+
+def render_ledger(version):
+    before = st.session_state.ledger_pages[-1]
+    ledger_df, next_cursor = load_ledger_page(version if before is None else None, before, st.session_state.ledger_cause or None)
+    if not ledger_df.empty: ledger_placeholder.dataframe(ledger_df, height=300, use_container_width=True)
+    else: ledger_placeholder.info("No confirmed theft events.")
+    return next_cursor
+
+def render_feedback_log(version):
+    before = st.session_state.feedback_pages[-1]
+    label = {"Normal": 0, "Theft": 1}.get(st.session_state.feedback_label)
+    feedback_df, next_cursor = load_feedback_page(version if before is None else None, before, label, st.session_state.feedback_cause or None)
+    if not feedback_df.empty: feedback_table_placeholder.dataframe(feedback_df, height=300, use_container_width=True)
+    else: feedback_table_placeholder.info("No user feedback logged.")
+    return next_cursor
+
+panel_versions = {"ledger": ledger_version(), "feedback": feedback_version()}
+with ledger_controls: page_controls("ledger_pages", render_ledger(panel_versions["ledger"]))
+with feedback_controls: page_controls("feedback_pages", render_feedback_log(panel_versions["feedback"]))
+
+# Stay in this script run and redraw in place: the live panels when the feed pushes a reading, the feed
+# status line after every idle wait (so clicks are handled within LIVE_WAIT_TIMEOUT), the newest table
+# pages only when their data version moves. A full rerun happens only when the anomaly state flips.
+next_panel_check = time.monotonic() + PANEL_CHECK_INTERVAL
+while run_loop:
+    version = feed.wait(feed_version, LIVE_WAIT_TIMEOUT)
+    if version != feed_version:
+        feed_version = version
+        render_chart()
+        if render_live(feed.latest): st.rerun()
+    else: render_feed_status()
+    if time.monotonic() >= next_panel_check:
+        next_panel_check = time.monotonic() + PANEL_CHECK_INTERVAL
+        versions = {"ledger": ledger_version(), "feedback": feedback_version()}
+        if versions["ledger"] != panel_versions["ledger"]: render_ledger(versions["ledger"])
+        if versions["feedback"] != panel_versions["feedback"]: render_feedback_log(versions["feedback"])
+        panel_versions = versions
+        if st.session_state.retrain_job_id:
+            refresh_retraining_status(); render_retraining_status()
+            if not st.session_state.retrain_job_id: st.rerun()  # finished: drop the cancel button
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Canonical schema: four float32 feature columns in this order plus an int8 label (0 normal, 1 theft).
+FEATURES = ("voltage", "current", "power", "power_factor")
+LABEL = "label"
+FORMAT_VERSION = 1
+CHUNK_ROWS = 1 << 20
+# Rows of a dataset kept out of training when a retrain is followed by forest compaction, so its loss
+# check measures on readings the model has not seen. Seeded and stratified: every such retrain holds
+# out the same rows. Retrains without compaction fit on every row.
+HOLDOUT_FRACTION = 0.2
+HOLDOUT_MAX_ROWS = 20_000
+HOLDOUT_SEED = 1009
+
+# Column names seen in the wild, compared lowercased with spaces/dashes/underscores removed.
+_ALIASES = {"voltage": "voltage", "v": "voltage", "current": "current", "i": "current", "power": "power", "p": "power",
+            "powerfactor": "power_factor", "pf": "power_factor", "label": LABEL, "theft": LABEL}
+
+
+def canonical_name(column):
+    key = "".join(ch for ch in str(column).lower() if ch not in " -_")
+    return _ALIASES.get(key)
+
+def canonical_columns(columns):
+    """{source column: canonical name} for the columns that map onto the schema; raises if one is missing."""
+    mapping = {}
+    for column in columns:
+        name = canonical_name(column)
+        if name is not None and name not in mapping.values(): mapping[column] = name
+    missing = [name for name in FEATURES + (LABEL,) if name not in mapping.values()]
+    if missing: raise ValueError(f"Dataset is missing column(s) {missing}; found {list(columns)}.")
+    return mapping
+
+def canonical_frame(df):
+    """`df` renamed to the canonical schema, restricted to its columns, non-numeric cells and incomplete rows dropped."""
+    import pandas as pd
+    df = df.rename(columns=canonical_columns(df.columns))[list(FEATURES) + [LABEL]]
+    df = df.apply(pd.to_numeric, errors="coerce").dropna()
+    return df.astype({**{name: "float32" for name in FEATURES}, LABEL: "int8"})
+
+
+def read_csv_chunks(csv_path, chunk_rows=CHUNK_ROWS):
+    """Streams a CSV of any size as canonical (X float32 (n, 4), y int8 (n,)) chunks."""
+    import pandas as pd
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        chunk = canonical_frame(chunk)
+        yield chunk[list(FEATURES)].to_numpy(), chunk[LABEL].to_numpy()
+
+
+class Dataset:
+    """
+    A converted dataset: `X` (n, 4) float32 and `y` (n,) int8, memory-mapped read-only from the
+    raw files in `path` (plain ndarray views, so nothing is copied until pages are touched).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f: self.meta = json.load(f)
+        n = self.meta["rows"]
+        self.X = self._map("X.f32", np.float32, (n, len(FEATURES)))
+        self.y = self._map("y.i8", np.int8, (n,))
+
+    def _map(self, name, dtype, shape):
+        if shape[0] == 0: return np.empty(shape, dtype=dtype)
+        return np.asarray(np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape))
+
+    def __len__(self): return len(self.y)
+
+    def chunks(self, chunk_rows=CHUNK_ROWS):
+        """(X, y) views of consecutive slices, for passes over datasets larger than RAM."""
+        for start in range(0, len(self), chunk_rows): yield self.X[start:start + chunk_rows], self.y[start:start + chunk_rows]
+
+    def by_label(self, label):
+        """Feature rows with the given label (a copy)."""
+        return self.X[self.y == label]
+
+
+def holdout_mask(y, fraction=HOLDOUT_FRACTION, max_rows=HOLDOUT_MAX_ROWS, seed=HOLDOUT_SEED):
+    """Boolean mask of the held-out rows: `fraction` of each label (at most `max_rows` in all), chosen with a fixed seed."""
+    y = np.asarray(y); mask = np.zeros(len(y), dtype=bool)
+    if not len(y): return mask
+    share = min(fraction, max_rows / len(y))
+    rng = np.random.default_rng(seed)
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        mask[rng.choice(rows, int(len(rows) * share), replace=False)] = True
+    return mask
+
+
+def dataset_dir(csv_path): return os.path.splitext(csv_path)[0] + ".mmap"
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return {"source": os.path.basename(csv_path), "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+def convert(csv_path, out_dir=None, chunk_rows=CHUNK_ROWS):
+    """
+    Converts a CSV to the binary layout chunk by chunk (memory use is bounded by `chunk_rows`).
+    The result is built in a temporary directory and renamed into place, meta.json written last.
+    """
+    out_dir = out_dir or dataset_dir(csv_path)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True); os.makedirs(tmp_dir)
+    stamp = _source_stamp(csv_path); rows = 0; positives = 0
+    with open(os.path.join(tmp_dir, "X.f32"), "wb") as fx, open(os.path.join(tmp_dir, "y.i8"), "wb") as fy:
+        for X, y in read_csv_chunks(csv_path, chunk_rows):
+            fx.write(np.ascontiguousarray(X, dtype="<f4").tobytes()); fy.write(y.astype(np.int8).tobytes())
+            rows += len(y); positives += int(y.sum())
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({**stamp, "format_version": FORMAT_VERSION, "rows": rows, "features": list(FEATURES),
+                   "label": LABEL, "positives": positives}, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    try: os.rename(tmp_dir, out_dir)
+    except OSError: shutil.rmtree(tmp_dir, ignore_errors=True)  # another process converted it first
+    return Dataset(out_dir)
+
+def open_dataset(csv_path, out_dir=None):
+    """The converted form of `csv_path`, (re)converting it when missing or older than the CSV."""
+    out_dir = out_dir or dataset_dir(csv_path)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f: meta = json.load(f)
+        if meta.get("format_version") == FORMAT_VERSION and all(meta.get(k) == v for k, v in _source_stamp(csv_path).items()):
+            return Dataset(out_dir)
+    return convert(csv_path, out_dir)
@@ -0,0 +1,160 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+
+class OutboundDispatcher:
+    """
+    In-process queue for outbound side effects (email, webhook, ledger writes).
+    A small worker pool drains it so request handlers never wait on the network.
+    Failed jobs (an exception or a False return) are retried with exponential backoff.
+    """
+
+    def __init__(self, workers=4, capacity=1000, max_attempts=5, backoff=0.5, max_backoff=30.0):
+        self.workers = workers; self.capacity = capacity
+        self.max_attempts = max_attempts; self.backoff = backoff; self.max_backoff = max_backoff
+        self._queue = queue.PriorityQueue()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads = []
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.counters = {"submitted": 0, "succeeded": 0, "failed": 0, "dropped": 0, "retried": 0}
+
+    def start(self):
+        if self._threads: return
+        for n in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"outbound-{n}", daemon=True)
+            t.start(); self._threads.append(t)
+
+    def stop(self, timeout=10.0):
+        """Lets queued jobs finish (retries included, up to `timeout`), then stops the workers."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            for _ in self._threads: self._queue.put((float("inf"), next(self._seq), None))
+            self._cond.notify_all()
+        for t in self._threads: t.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs). Returns False (and drops the job) when the queue is full."""
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.counters["dropped"] += 1
+                print(f"--- 💥 WARNING: Outbound queue full, dropping '{name}' ---")
+                return False
+            self._pending += 1; self.counters["submitted"] += 1
+        job = {"name": name, "fn": fn, "args": args, "kwargs": kwargs, "attempt": 0, "queued_at": time.monotonic()}
+        self._put(job["queued_at"], job)
+        return True
+
+    def _put(self, ready_at, job):
+        """Queues a job and wakes a worker, which may be sleeping until a later retry is due."""
+        with self._cond:
+            self._queue.put((ready_at, next(self._seq), job))
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            ready_at, seq, job = self._queue.get()
+            if job is None: return
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                # Head of the queue is a retry that is not due yet; put it back and wait, unless
+                # something due sooner was queued meanwhile. Puts notify under the same lock, so
+                # a job queued after this check wakes the wait.
+                with self._cond:
+                    self._queue.put((ready_at, seq, job))
+                    with self._queue.mutex: head_seq = self._queue.queue[0][1]
+                    if head_seq == seq: self._cond.wait(delay)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job["attempt"] += 1
+        try:
+            ok = job["fn"](*job["args"], **job["kwargs"]) is not False
+            error = None if ok else "returned False"
+        except Exception as e:
+            ok = False; error = e
+
+        if ok:
+            with self._lock:
+                self._pending -= 1; self.counters["succeeded"] += 1
+                self._latencies.append(time.monotonic() - job["queued_at"])
+            return
+        if job["attempt"] < self.max_attempts:
+            wait = min(self.max_backoff, self.backoff * 2 ** (job["attempt"] - 1))
+            print(f"--- ⚠️ Outbound '{job['name']}' failed ({error}), retry {job['attempt']}/{self.max_attempts - 1} in {wait:.1f}s ---")
+            with self._lock: self.counters["retried"] += 1
+            self._put(time.monotonic() + wait, job)
+            return
+        print(f"--- 💥 ERROR: Outbound '{job['name']}' gave up after {job['attempt']} attempts: {error} ---")
+        with self._lock: self._pending -= 1; self.counters["failed"] += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies); counters = dict(self.counters); depth = self._pending
+
+        def pct(p): return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+        return {
+            "queue_depth": depth, "capacity": self.capacity, "workers": len(self._threads), **counters,
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99), "max": pct(1.0)}
+        }
+
+
+class SMTPMailer:
+    """Keeps one logged-in SMTP session open and reuses it for every message."""
+
+    def __init__(self, host, port, username=None, password=None, timeout=10, idle_check=30):
+        self.host = host; self.port = port; self.username = username; self.password = password
+        self.timeout = timeout; self.idle_check = idle_check
+        self._smtp = None; self._last_used = 0.0
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        import smtplib  # pulls in ssl; deferred until the first email
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if smtp.has_extn("starttls"): smtp.starttls(); smtp.ehlo()
+        if self.username and self.password and smtp.has_extn("auth"): smtp.login(self.username, self.password)
+        self._smtp = smtp
+
+    def _alive(self):
+        if self._smtp is None: return False
+        if time.monotonic() - self._last_used < self.idle_check: return True
+        import smtplib
+        try: return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError): return False
+
+    def send(self, msg):
+        import smtplib
+        with self._lock:
+            if not self._alive(): self.close(); self._connect()
+            try:
+                self._smtp.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server dropped an idle session between our liveness check and the send.
+                self.close(); self._connect(); self._smtp.send_message(msg)
+            self._last_used = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._smtp is None: return
+            try: self._smtp.quit()
+            except Exception: pass
+            self._smtp = None
+
+
+_http_session = None
+
+def http_session():
+    """Shared keep-alive HTTP session, created (and `requests` imported) on first use."""
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
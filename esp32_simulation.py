@@ -1,17 +1,58 @@
 import requests
+import argparse
+import asyncio
 import json
 import time
 import random
 import threading
-import pandas as pd
+import numpy as np
 import os
+from dataset import open_dataset
 
 API_ENDPOINT_URL = "http://127.0.0.1:8000/predict"
 SEND_INTERVAL = 3
 DATA_FILE = "gridlock_dataset.csv" 
 SIMULATION_MODE = "NORMAL" 
-normal_data = pd.DataFrame()
-theft_data = pd.DataFrame()
+normal_data = np.empty((0, 4))
+theft_data = np.empty((0, 4))
+
+PACKET_KEYS = ["voltage", "current", "power", "power_factor"]
+SAMPLE_BLOCK = 4096          # readings drawn per vectorized block
+
+# Load-generation defaults (python esp32_simulation.py --load ...)
+LOAD_METERS = 1000
+LOAD_RATE_PER_METER = 0.5    # readings per second per meter (Poisson arrivals)
+LOAD_DURATION = 30.0
+LOAD_MAX_IN_FLIGHT = 512     # cap on concurrent requests; arrivals beyond it are counted as dropped
+LOAD_THEFT_FRACTION = 0.05   # share of meters that steal power part of the time
+LOAD_THEFT_PERIOD = 60.0     # seconds; a stealing meter is in THEFT for THEFT_DUTY of each period
+LOAD_THEFT_DUTY = 0.3
+
+
+class SampleBlocks:
+    """Real readings per mode, handed out from blocks of indices drawn with one RNG call."""
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.values = {}; self.block = {}; self.pos = {}
+
+    def load(self, normal, theft):
+        self.values = {"NORMAL": np.asarray(normal, dtype=np.float64), "THEFT": np.asarray(theft, dtype=np.float64)}
+        self.block = {}; self.pos = {}
+
+    def draw(self, mode, n, rng=None):
+        """(n, 4) array of readings sampled with replacement, using `rng` when given (else the instance's)."""
+        values = self.values[mode]
+        return values[(rng or self.rng).integers(0, len(values), size=n)]
+
+    def next(self, mode):
+        if mode not in self.values or len(self.values[mode]) == 0: return None
+        if self.pos.get(mode, SAMPLE_BLOCK) >= SAMPLE_BLOCK:
+            self.block[mode] = self.draw(mode, SAMPLE_BLOCK).tolist(); self.pos[mode] = 0
+        row = self.block[mode][self.pos[mode]]; self.pos[mode] += 1
+        return dict(zip(PACKET_KEYS, row))
+
+samples = SampleBlocks()
 
 def load_data():
     """Loads and splits the dataset into NORMAL and THEFT data."""
@@ -26,9 +67,10 @@ def load_data():
         else:
              relative_data_file_path = DATA_FILE
     try:
-        df = pd.read_csv(relative_data_file_path)
-        normal_data = df[df['Label'] == 0]
-        theft_data = df[df['Label'] == 1]
+        dataset = open_dataset(relative_data_file_path)
+        normal_data = dataset.by_label(0)
+        theft_data = dataset.by_label(1)
+        samples.load(normal_data, theft_data)
         if len(normal_data) == 0 or len(theft_data) == 0:
             print("Error: Could not find Label 0 (NORMAL) or Label 1 (THEFT) data in the CSV.")
             return False
@@ -42,22 +84,7 @@ def load_data():
 
 def generate_data_point():
     """Picks a random real data sample based on the current mode."""
-    global SIMULATION_MODE
-    if SIMULATION_MODE == "NORMAL":
-        if normal_data.empty: return None
-        sample = normal_data.sample(1)
-    else:
-        if theft_data.empty: return None
-        sample = theft_data.sample(1)
-    data_packet = {
-        "voltage": sample['Voltage'].iloc[0],
-        "current": sample['Current'].iloc[0],
-        "power": sample['Power'].iloc[0],
-        "power_factor": sample['Power_Factor'].iloc[0]
-    }
-    for key in data_packet:
-        data_packet[key] = float(data_packet[key])
-    return data_packet
+    return samples.next(SIMULATION_MODE)
 
 def mode_switcher():
     """Waits for the user to press ENTER to toggle the mode."""
@@ -74,7 +101,123 @@ def mode_switcher():
         except EOFError: break
         except Exception as e: print(f"Error in mode switcher: {e}"); break
 
-if load_data():
+
+
+class MeterFleet:
+    """
+    N virtual meters. A THEFT_FRACTION of them are thieves that are in THEFT mode for
+    THEFT_DUTY of every THEFT_PERIOD seconds, each with its own phase; all others stay NORMAL.
+    """
+
+    def __init__(self, n_meters, theft_fraction, theft_period, theft_duty, rng):
+        self.n_meters = n_meters; self.theft_period = theft_period; self.theft_duty = theft_duty
+        self.thief = rng.random(n_meters) < theft_fraction
+        self.phase = rng.random(n_meters) * theft_period
+
+    def in_theft(self, meter_ids, t):
+        """Boolean mode of each meter in `meter_ids` at `t` seconds into the run."""
+        position = ((t + self.phase[meter_ids]) % self.theft_period) / self.theft_period
+        return self.thief[meter_ids] & (position < self.theft_duty)
+
+
+def arrival_blocks(rate, rng, block=SAMPLE_BLOCK):
+    """Open-loop Poisson arrival offsets (seconds from start), generated a block at a time."""
+    t = 0.0
+    while True:
+        offsets = t + np.cumsum(rng.exponential(1.0 / rate, size=block))
+        t = float(offsets[-1])
+        yield offsets
+
+
+def percentiles(latencies):
+    if not latencies: return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99, 100])
+    return {name: round(float(v), 2) for name, v in zip(("p50", "p95", "p99", "max"), values)}
+
+
+async def run_load(url=API_ENDPOINT_URL, n_meters=LOAD_METERS, rate_per_meter=LOAD_RATE_PER_METER, duration=LOAD_DURATION,
+                   max_in_flight=LOAD_MAX_IN_FLIGHT, theft_fraction=LOAD_THEFT_FRACTION, theft_period=LOAD_THEFT_PERIOD,
+                   theft_duty=LOAD_THEFT_DUTY, seed=None):
+    """
+    Open-loop load: arrivals follow a Poisson process of rate n_meters * rate_per_meter whatever
+    the server's response times, so a slow server shows up as rising latency instead of a lower
+    send rate. Requests share one pooled HTTP/1.1 client. Returns the run's statistics.
+    """
+    import httpx
+    rng = np.random.default_rng(seed)
+    fleet = MeterFleet(n_meters, theft_fraction, theft_period, theft_duty, rng)
+    total_rate = n_meters * rate_per_meter
+    stats = {"sent": 0, "ok": 0, "anomalies": 0, "dropped": 0, "http_errors": {}, "exceptions": {},
+             "anomalies_by_mode": {"NORMAL": 0, "THEFT": 0}, "sent_by_mode": {"NORMAL": 0, "THEFT": 0}}
+    latencies = []; max_lag = 0.0
+    in_flight = set()
+
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(10.0)) as client:
+
+        async def send(packet, mode):
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=packet)
+                latency = time.perf_counter() - start
+                if response.status_code == 200:
+                    stats["ok"] += 1; latencies.append(latency)
+                    if response.json().get("anomaly"):
+                        stats["anomalies"] += 1; stats["anomalies_by_mode"][mode] += 1
+                else:
+                    code = str(response.status_code); stats["http_errors"][code] = stats["http_errors"].get(code, 0) + 1
+            except Exception as e:
+                name = type(e).__name__; stats["exceptions"][name] = stats["exceptions"].get(name, 0) + 1
+
+        loop_start = time.perf_counter()
+        for offsets in arrival_blocks(total_rate, rng):
+            offsets = offsets[offsets < duration]
+            if len(offsets) == 0: break
+            # Everything one block needs is drawn up front: meters, their modes and the readings.
+            meters = rng.integers(0, n_meters, size=len(offsets))
+            theft = fleet.in_theft(meters, offsets)
+            readings = np.empty((len(offsets), len(PACKET_KEYS)))
+            readings[~theft] = samples.draw("NORMAL", int((~theft).sum()), rng)
+            readings[theft] = samples.draw("THEFT", int(theft.sum()), rng)
+            for offset, meter, is_theft, row in zip(offsets.tolist(), meters.tolist(), theft.tolist(), readings.tolist()):
+                delay = offset - (time.perf_counter() - loop_start)
+                if delay > 0: await asyncio.sleep(delay)
+                else: max_lag = max(max_lag, -delay)
+                if len(in_flight) >= max_in_flight:
+                    stats["dropped"] += 1; continue
+                mode = "THEFT" if is_theft else "NORMAL"
+                packet = dict(zip(PACKET_KEYS, row)); packet["meter_id"] = f"meter-{meter:05d}"
+                stats["sent"] += 1; stats["sent_by_mode"][mode] += 1
+                task = asyncio.create_task(send(packet, mode))
+                in_flight.add(task); task.add_done_callback(in_flight.discard)
+        send_seconds = time.perf_counter() - loop_start
+        if in_flight: await asyncio.wait(set(in_flight))
+        elapsed = time.perf_counter() - loop_start
+
+    errors = sum(stats["http_errors"].values()) + sum(stats["exceptions"].values())
+    return {
+        "meters": n_meters, "thieves": int(fleet.thief.sum()), "duration_s": duration, "elapsed_s": round(elapsed, 3),
+        "target_rps": round(total_rate, 2), "offered_rps": round((stats["sent"] + stats["dropped"]) / send_seconds, 2),
+        "throughput_rps": round(stats["ok"] / elapsed, 2), "error_rate": round(errors / stats["sent"], 4) if stats["sent"] else None,
+        "max_schedule_lag_ms": round(max_lag * 1000, 2), "latency_ms": percentiles(latencies), **stats,
+    }
+
+
+def print_load_report(report):
+    print("\n--- 📊 Load Test Results ---")
+    print(f"Meters: {report['meters']} ({report['thieves']} stealing) | Duration: {report['duration_s']}s (finished in {report['elapsed_s']}s)")
+    print(f"Target: {report['target_rps']} req/s | Offered: {report['offered_rps']} req/s | Throughput: {report['throughput_rps']} req/s")
+    print(f"Sent: {report['sent']} | OK: {report['ok']} | Dropped (in-flight cap): {report['dropped']} | Error rate: {report['error_rate']}")
+    if report["http_errors"] or report["exceptions"]: print(f"HTTP errors: {report['http_errors']} | Exceptions: {report['exceptions']}")
+    lat = report["latency_ms"]
+    print(f"Latency ms: p50 {lat['p50']} | p95 {lat['p95']} | p99 {lat['p99']} | max {lat['max']}")
+    print(f"Anomalies: {report['anomalies']} (NORMAL {report['anomalies_by_mode']['NORMAL']}/{report['sent_by_mode']['NORMAL']}, "
+          f"THEFT {report['anomalies_by_mode']['THEFT']}/{report['sent_by_mode']['THEFT']})")
+    if report["max_schedule_lag_ms"] > 100:
+        print(f"⚠️ The generator fell {report['max_schedule_lag_ms']} ms behind schedule; the client, not the server, may be the bottleneck.")
+
+
+def run_interactive():
     print("--- ⚡ GRIDLOCK AI: High-Fidelity Simulator Started ⚡ ---")
     print(f"Streaming REAL data from {DATA_FILE}")
     print(f"Targeting API: {API_ENDPOINT_URL}")
@@ -116,5 +259,30 @@ if load_data():
             time.sleep(SEND_INTERVAL)
         except KeyboardInterrupt:
             print("\n--- 🛑 Simulation stopped by user ---"); break
-else:
-    print("--- 💥 Script failed to start. Fix data file loading. ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GRIDLOCK AI meter simulator. Interactive single meter by default; --load for fleet load tests.")
+    parser.add_argument("--load", action="store_true", help="run an open-loop load test with many virtual meters")
+    parser.add_argument("--url", default=API_ENDPOINT_URL)
+    parser.add_argument("--meters", type=int, default=LOAD_METERS)
+    parser.add_argument("--rate", type=float, default=LOAD_RATE_PER_METER, help="readings per second per meter")
+    parser.add_argument("--duration", type=float, default=LOAD_DURATION, help="seconds")
+    parser.add_argument("--max-in-flight", type=int, default=LOAD_MAX_IN_FLIGHT)
+    parser.add_argument("--theft-fraction", type=float, default=LOAD_THEFT_FRACTION)
+    parser.add_argument("--seed", type=int, default=None, help="seed for the readings, meters and arrival times")
+    parser.add_argument("--out", help="write the load test results as JSON to this file")
+    args = parser.parse_args()
+    if args.seed is not None: samples.rng = np.random.default_rng(args.seed)
+
+    if not load_data():
+        print("--- 💥 Script failed to start. Fix data file loading. ---")
+    elif args.load:
+        print(f"--- ⚡ Load test: {args.meters} meters x {args.rate}/s for {args.duration}s against {args.url} ---")
+        report = asyncio.run(run_load(args.url, args.meters, args.rate, args.duration, args.max_in_flight,
+                                      args.theft_fraction, seed=args.seed))
+        print_load_report(report)
+        if args.out:
+            with open(args.out, "w") as f: json.dump(report, f, indent=2)
+    else:
+        run_interactive()
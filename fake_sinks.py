@@ -0,0 +1,128 @@
+"""
+Local stand-ins for the SMTP server and the public webhook, for tests and offline runs.
+Both record what they receive and can be told to be slow or to fail the first N calls.
+
+    python fake_sinks.py        # starts both and prints where they listen
+"""
+import json
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line): self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 fake-smtp ready")
+        mail_from, rcpt_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line: return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO": self.reply("250-fake-smtp"); self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "HELO": self.reply("250 fake-smtp")
+            elif verb == "AUTH": self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL": mail_from = command[10:].strip("<> "); rcpt_to = []; self.reply("250 OK")
+            elif verb == "RCPT": rcpt_to.append(command[8:].strip("<> ")); self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b".\n", b""): break
+                    lines.append(data[1:] if data.startswith(b"..") else data)
+                if sink._should_fail():
+                    self.reply("451 4.3.0 Temporary failure (fake)"); continue
+                time.sleep(sink.delay)
+                sink.messages.append({"from": mail_from, "to": rcpt_to, "message": message_from_bytes(b"".join(lines))})
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"): self.reply("250 OK")
+            elif verb == "QUIT": self.reply("221 Bye"); return
+            else: self.reply("502 Command not implemented")
+
+
+class _HTTPHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        sink = self.server.sink
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(sink.delay)
+        if sink._should_fail():
+            self.send_response(503); self.end_headers(); return
+        try: payload = json.loads(body)
+        except ValueError: payload = body.decode(errors="replace")
+        sink.requests.append({"path": self.path, "json": payload})
+        self.send_response(200); self.send_header("Content-Type", "application/json"); self.end_headers()
+        self.wfile.write(b'{"ok": true}')
+
+    def log_message(self, *args): pass
+
+
+class _Sink:
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, fail_first=0):
+        self.host = host; self.port = port; self.delay = delay; self.fail_first = fail_first
+        self._server = None; self._thread = None; self._lock = threading.Lock()
+
+    def _should_fail(self):
+        with self._lock:
+            if self.fail_first > 0: self.fail_first -= 1; return True
+            return False
+
+    def start(self):
+        self._server = self._make_server()
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server: self._server.shutdown(); self._server.server_close(); self._server = None
+
+    def __enter__(self): return self.start()
+    def __exit__(self, *exc): self.stop()
+
+
+class FakeSMTPServer(_Sink):
+    """Accepts any login and keeps every delivered message in `.messages`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs); self.messages = []
+
+    def _make_server(self):
+        server = socketserver.ThreadingTCPServer((self.host, self.port), _SMTPHandler)
+        server.daemon_threads = True
+        return server
+
+
+class FakeHTTPSink(_Sink):
+    """Answers every POST with 200 and keeps the decoded bodies in `.requests`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs); self.requests = []
+
+    @property
+    def url(self): return f"http://{self.host}:{self.port}/"
+
+    def _make_server(self):
+        server = ThreadingHTTPServer((self.host, self.port), _HTTPHandler)
+        server.daemon_threads = True
+        return server
+
+
+if __name__ == "__main__":
+    smtp = FakeSMTPServer(port=2525).start()
+    http = FakeHTTPSink(port=8025).start()
+    print(f"--- 📧 Fake SMTP listening on {smtp.host}:{smtp.port} ---")
+    print(f"--- 🌎 Fake webhook listening on {http.url} ---")
+    print("Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"received: {len(smtp.messages)} emails, {len(http.requests)} webhook posts")
+    except KeyboardInterrupt:
+        smtp.stop(); http.stop()
@@ -0,0 +1,303 @@
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+try: import fcntl
+except ImportError: fcntl = None  # no cross-process locking on this platform; threads are still serialised
+
+FEATURES = ("voltage", "current", "power", "power_factor")
+SOURCES = ("unknown", "email", "dashboard", "import")
+
+# One feedback row. Missing or non-numeric readings are stored as NaN, never as strings.
+RECORD = np.dtype([("seq", "<i8"), ("timestamp", "<f8"),
+                   ("voltage", "<f8"), ("current", "<f8"), ("power", "<f8"), ("power_factor", "<f8"),
+                   ("label", "i1"), ("source", "i1"), ("meter_id", "S32"), ("suggested_cause", "S80")])
+
+SEGMENT_ROWS = 65_536        # the append log is sealed into a segment at this size
+MAX_SEGMENTS = 16            # more sealed segments than this triggers a compaction
+MAX_COMPACTED_ROWS = 1 << 20 # compaction never builds segments larger than this
+SCAN_ROWS = 4096             # rows examined per step when a page filter has to skip rows
+
+
+def _number(value):
+    try: return float(value)
+    except (TypeError, ValueError): return np.nan
+
+def _text(value, size):
+    """UTF-8 bytes of `value`, cut to `size` bytes on a character boundary (never half a character)."""
+    if value is None: return b""
+    return str(value).encode("utf-8")[:size].decode("utf-8", "ignore").encode("utf-8")
+
+
+class FeedbackStore:
+    """
+    Append-only store of labelled feedback in a directory, shared by the API and the dashboard.
+
+    Rows get consecutive sequence numbers and non-decreasing timestamps. New rows go to an append
+    log of fixed-size binary records (`active_<first seq>.rec`), which is sealed into a columnar
+    `.npy` segment (`seg_<first>-<end>.npy`, memory-mapped on read) once it holds SEGMENT_ROWS rows;
+    small segments are merged by compact(). Writers hold an exclusive fcntl lock on `store.lock`,
+    readers a shared one, so several processes can use the same directory.
+    "Not yet trained on" is a sequence cursor: read(start_seq=cursor) returns exactly those rows.
+    The lock file and the append log stay open between appends; the log's first seq, row count and
+    last timestamp are cached and trusted while its size is what this instance last wrote.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._tail = None  # cached append log: {"first", "path", "rows", "timestamp", "file"}
+        with self._locked(exclusive=True): self._recover()
+
+    # -- locking and layout --
+
+    class _Lock:
+        def __init__(self, store, exclusive): self.store = store; self.exclusive = exclusive
+
+        def __enter__(self):
+            store = self.store
+            store._thread_lock.acquire()
+            if fcntl is not None:
+                try:
+                    if store._lock_file is None: store._lock_file = open(os.path.join(store.path, "store.lock"), "ab")
+                    fcntl.flock(store._lock_file.fileno(), fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+                except BaseException: store._thread_lock.release(); raise
+
+        def __exit__(self, *exc):
+            if fcntl is not None: fcntl.flock(self.store._lock_file.fileno(), fcntl.LOCK_UN)
+            self.store._thread_lock.release()
+
+    def _locked(self, exclusive): return self._Lock(self, exclusive)
+
+    def _segments(self):
+        """Sealed segments as sorted [(first_seq, end_seq, path)]."""
+        segments = []
+        for path in glob.glob(os.path.join(self.path, "seg_*.npy")):
+            first, end = os.path.basename(path)[4:-4].split("-")
+            segments.append((int(first), int(end), path))
+        return sorted(segments)
+
+    def _active(self):
+        """(first_seq, path, rows) of the append log; it starts where the last segment ends."""
+        segments = self._segments()
+        first = segments[-1][1] if segments else 0
+        path = os.path.join(self.path, f"active_{first:012d}.rec")
+        rows = os.path.getsize(path) // RECORD.itemsize if os.path.exists(path) else 0
+        return first, path, rows
+
+    def _recover(self):
+        """Drops append logs already covered by a segment (crash while sealing) and torn trailing records."""
+        first, path, rows = self._active()
+        for stale in glob.glob(os.path.join(self.path, "active_*.rec")):
+            if stale != path: os.remove(stale)
+        if os.path.exists(path) and os.path.getsize(path) != rows * RECORD.itemsize:
+            with open(path, "r+b") as f: f.truncate(rows * RECORD.itemsize)
+        for tmp in glob.glob(os.path.join(self.path, "*.tmp")): os.remove(tmp)
+
+    def _read_active(self):
+        _, path, rows = self._active()
+        if not rows: return np.empty(0, RECORD)
+        return np.fromfile(path, dtype=RECORD, count=rows)
+
+    def _map_active(self):
+        _, path, rows = self._active()
+        if not rows: return np.empty(0, RECORD)
+        return np.memmap(path, dtype=RECORD, mode="r", shape=(rows,))
+
+    def _write_segment(self, records):
+        first, end = int(records["seq"][0]), int(records["seq"][-1]) + 1
+        path = os.path.join(self.path, f"seg_{first:012d}-{end:012d}.npy")
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f: np.save(f, records)
+        os.replace(tmp, path)
+        return path
+
+    def _last_timestamp(self, path, rows):
+        """Timestamp of the newest row, given the append log's path and rows; reads one record."""
+        if rows:
+            with open(path, "rb") as f:
+                f.seek((rows - 1) * RECORD.itemsize)
+                return float(np.frombuffer(f.read(RECORD.itemsize), dtype=RECORD)["timestamp"][0])
+        segments = self._segments()
+        if not segments: return 0.0
+        return float(np.load(segments[-1][2], mmap_mode="r")["timestamp"][-1])
+
+    # -- writing --
+
+    def _append_log(self):
+        """
+        The cached append log, re-read from the directory only when its file is no longer the one this
+        instance last wrote (another process appended to, sealed or compacted it). Needs the exclusive lock.
+        """
+        tail = self._tail
+        if tail is not None:
+            stat = os.fstat(tail["file"].fileno())
+            if stat.st_nlink and stat.st_size == tail["rows"] * RECORD.itemsize: return tail
+            self._drop_tail()
+        first, path, rows = self._active()
+        self._tail = {"first": first, "path": path, "rows": rows, "timestamp": self._last_timestamp(path, rows),
+                      "file": open(path, "ab")}
+        return self._tail
+
+    def _drop_tail(self):
+        if self._tail is not None: self._tail["file"].close(); self._tail = None
+
+    def append(self, rows, source="unknown"):
+        """
+        Appends feedback rows (dicts with the four readings, `label` or `response`, and optionally
+        `suggested_cause`, `meter_id`, `source`) in one locked write. Returns their sequence numbers.
+        """
+        rows = list(rows)
+        if not rows: return range(0)
+        records = np.zeros(len(rows), dtype=RECORD)
+        for k, row in enumerate(rows):
+            record = records[k]
+            for name in FEATURES: record[name] = _number(row.get(name))
+            label = row["label"] if "label" in row else (0 if row.get("response") == "normal" else 1)
+            record["label"] = int(label)
+            row_source = row.get("source", source)
+            record["source"] = SOURCES.index(row_source) if row_source in SOURCES else 0
+            record["meter_id"] = _text(row.get("meter_id"), 32)
+            cause = row.get("suggested_cause")
+            record["suggested_cause"] = _text(None if cause == "N/A" else cause, 80)
+        with self._locked(exclusive=True):
+            tail = self._append_log()
+            seq = tail["first"] + tail["rows"]
+            records["seq"] = np.arange(seq, seq + len(records))
+            # Never let the clock run backwards within the store, so time-range reads can bisect.
+            timestamp = records["timestamp"] = max(time.time(), tail["timestamp"])
+            try: tail["file"].write(records.tobytes()); tail["file"].flush()
+            except BaseException: self._drop_tail(); raise
+            tail["rows"] += len(records); tail["timestamp"] = timestamp
+            if tail["rows"] >= SEGMENT_ROWS:
+                self._seal()
+                if len(self._segments()) > MAX_SEGMENTS: self._compact()
+        return range(seq, seq + len(records))
+
+    def _seal(self):
+        self._drop_tail()
+        _, path, rows = self._active()
+        if not rows: return
+        self._write_segment(self._read_active())
+        os.remove(path)
+
+    def compact(self):
+        """Seals the append log and merges neighbouring segments up to MAX_COMPACTED_ROWS rows."""
+        with self._locked(exclusive=True): self._seal(); self._compact()
+
+    def _compact(self):
+        group = []
+        for first, end, path in self._segments() + [(None, None, None)]:
+            if path is not None and sum(e - f for f, e, _ in group) + (end - first) <= MAX_COMPACTED_ROWS:
+                group.append((first, end, path)); continue
+            if len(group) > 1:
+                self._write_segment(np.concatenate([np.load(p) for _, _, p in group]))
+                for _, _, p in group: os.remove(p)
+            group = [(first, end, path)]
+
+    def import_csv(self, csv_path):
+        """One-off import of the legacy user_feedback_data.csv; the file is renamed to `<name>.imported`."""
+        import csv
+        with open(csv_path, newline="") as f: rows = [dict(row, label=_number(row.get("Label"))) for row in csv.DictReader(f)]
+        rows = [row for row in rows if row["label"] in (0, 1)]
+        for start in range(0, len(rows), SEGMENT_ROWS): self.append(rows[start:start + SEGMENT_ROWS], source="import")
+        os.replace(csv_path, f"{csv_path}.imported")
+        return len(rows)
+
+    # -- reading --
+
+    def count(self):
+        """Rows ever appended, i.e. the sequence number the next row will get."""
+        with self._locked(exclusive=False):
+            first, _, rows = self._active()
+            return first + rows
+
+    def read(self, start_seq=0, end_seq=None):
+        """Rows with start_seq <= seq < end_seq, as a structured array in RECORD layout."""
+        parts = []
+        with self._locked(exclusive=False):
+            for first, end, path in self._segments():
+                if end <= start_seq or (end_seq is not None and first >= end_seq): continue
+                segment = np.load(path, mmap_mode="r")
+                parts.append(segment[max(start_seq - first, 0):(None if end_seq is None else max(end_seq - first, 0))])
+            active = self._read_active()
+        if len(active):
+            first = int(active["seq"][0])
+            parts.append(active[max(start_seq - first, 0):(None if end_seq is None else max(end_seq - first, 0))])
+        return np.concatenate(parts) if parts else np.empty(0, RECORD)
+
+    def read_time_range(self, start=None, end=None):
+        """Rows with start <= timestamp < end (either bound may be None)."""
+        lo = -np.inf if start is None else start; hi = np.inf if end is None else end
+        parts = []
+        with self._locked(exclusive=False):
+            chunks = [np.load(path, mmap_mode="r") for _, _, path in self._segments()] + [self._read_active()]
+            for chunk in chunks:
+                if not len(chunk) or chunk["timestamp"][-1] < lo or chunk["timestamp"][0] >= hi: continue
+                times = chunk["timestamp"]
+                parts.append(chunk[np.searchsorted(times, lo, "left"):np.searchsorted(times, hi, "left")])
+        return np.concatenate(parts) if parts else np.empty(0, RECORD)
+
+    def tail(self, n):
+        total = self.count()
+        return self.read(max(total - n, 0))
+
+    def page(self, before=None, limit=50, since=None, until=None, label=None, suggested_cause=None, source=None):
+        """
+        Rows newest first, at most `limit`, with seq < `before` (the cursor returned for the previous
+        page), since <= timestamp < until, and the given label / suggested cause / source. Time bounds
+        are bisected per segment and other filters are evaluated on the memory-mapped columns in
+        SCAN_ROWS steps, so an unfiltered page reads only its own rows. Returns (records, next cursor or None).
+        """
+        matchers = []
+        if label is not None: matchers.append(("label", int(label)))
+        if suggested_cause is not None: matchers.append(("suggested_cause", _text(suggested_cause, 80)))
+        if source is not None: matchers.append(("source", SOURCES.index(source)))
+        parts = []; wanted = limit
+        with self._locked(exclusive=False):
+            first, _, rows = self._active()
+            chunks = [(seg_first, lambda path=path: np.load(path, mmap_mode="r")) for seg_first, _, path in self._segments()]
+            if rows: chunks.append((first, self._map_active))
+            for chunk_first, load in reversed(chunks):
+                if before is not None and chunk_first >= before: continue
+                chunk = load(); times = chunk["timestamp"]
+                hi = len(chunk) if before is None else min(before - chunk_first, len(chunk))
+                lo = 0 if since is None else int(np.searchsorted(times[:hi], since, "left"))
+                if until is not None: hi = min(hi, int(np.searchsorted(times[:hi], until, "left")))
+                step = SCAN_ROWS if matchers else wanted  # unfiltered: the page is the last `wanted` rows
+                for end in range(hi, lo, -step):
+                    block = chunk[max(lo, end - step):end]
+                    if matchers:
+                        mask = np.ones(len(block), dtype=bool)
+                        for name, value in matchers: mask &= block[name] == value
+                        block = block[mask]
+                    block = np.array(block[::-1][:wanted]); parts.append(block); wanted -= len(block)
+                    if not wanted: return np.concatenate(parts), int(block["seq"][-1])
+                if lo > 0: break  # every older row is before `since`
+        return (np.concatenate(parts) if parts else np.empty(0, RECORD)), None
+
+
+def to_dicts(records):
+    """Store rows as JSON-ready dicts (text decoded, NaN readings as None)."""
+    rows = []
+    for record in records:
+        row = {"seq": int(record["seq"]), "timestamp": float(record["timestamp"])}
+        for name in FEATURES: row[name] = None if np.isnan(record[name]) else float(record[name])
+        row.update(label=int(record["label"]), source=SOURCES[record["source"]],
+                   meter_id=record["meter_id"].decode("utf-8", "replace") or None,
+                   suggested_cause=record["suggested_cause"].decode("utf-8", "replace") or None)
+        rows.append(row)
+    return rows
+
+def to_frame(records):
+    """A pandas DataFrame of store rows, with text columns decoded."""
+    import pandas as pd
+    df = pd.DataFrame({name: records[name] for name in RECORD.names})
+    for name in ("meter_id", "suggested_cause"): df[name] = [value.decode("utf-8", "replace") for value in records[name]]
+    df["source"] = [SOURCES[code] for code in records["source"]]
+    return df
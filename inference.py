@@ -0,0 +1,192 @@
+import io
+import struct
+import zipfile
+
+import numpy as np
+
+FEATURES = ['voltage', 'current', 'power', 'power_factor']
+CHUNK_ROWS = 512
+FORMAT_VERSION = 1
+_ARRAYS = ("feature", "threshold", "children", "value", "roots", "classes_")
+_ALIGN = 64  # .npz members start on this boundary so their memory maps are aligned
+
+def _float_keys(x):
+    """Maps float64 values to int64 keys with the same ordering (so we can bisect on them)."""
+    bits = np.ascontiguousarray(x, dtype=np.float64).view(np.int64)
+    return np.where(bits < 0, -(bits & np.int64(0x7FFFFFFFFFFFFFFF)), bits)
+
+def _keys_to_float(keys):
+    bits = np.where(keys < 0, (-keys) | np.int64(-0x8000000000000000), keys)
+    return bits.astype(np.int64).view(np.float64)
+
+def _fold_thresholds(thresholds, mean, scale):
+    """
+    Moves StandardScaler + the float32 cast sklearn applies before tree traversal into the thresholds.
+    For each split, sklearn tests float32((x - mean) / scale) <= t. That test is monotone in x,
+    so there is a largest raw float64 value x* for which it still holds; we find x* exactly by
+    bisecting over the float64 bit patterns, which makes `x <= x*` equivalent for every input.
+    """
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32).astype(np.float64) <= thresholds
+
+    guess = thresholds * scale + mean
+    width = (np.abs(guess) + scale) * 1e-3
+    lo, hi = guess - width, guess + width
+    while not goes_left(lo).all() or goes_left(hi).any():
+        width *= 1e3
+        lo = np.where(goes_left(lo), lo, guess - width)
+        hi = np.where(goes_left(hi), guess + width, hi)
+
+    lo_key, hi_key = _float_keys(lo), _float_keys(hi)
+    while True:
+        open_gap = hi_key - lo_key > 1
+        if not open_gap.any(): break
+        mid_key = lo_key + (hi_key - lo_key) // 2
+        left = goes_left(_keys_to_float(mid_key))
+        lo_key = np.where(open_gap & left, mid_key, lo_key)
+        hi_key = np.where(open_gap & ~left, mid_key, hi_key)
+    return _keys_to_float(lo_key)
+
+def _mmap_npz(path):
+    """Memory-maps every member of an uncompressed .npz (np.load ignores mmap_mode for archives)."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED: raise ValueError(f"{path} is compressed and cannot be memory-mapped.")
+            # Skip the zip local header (30 bytes + name + extra) to reach the .npy data.
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+            major, _ = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if major == 1 else np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(f)
+            if dtype.hasobject: raise ValueError(f"{path} contains object arrays.")
+            name = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if int(np.prod(shape)) == 0: arrays[name] = np.empty(shape, dtype=dtype); continue
+            mapped = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran else "C")
+            # A plain ndarray view of the mapping (skips np.memmap's per-operation subclass handling);
+            # archives not written by save() may be unaligned, and those are copied instead.
+            arrays[name] = np.asarray(mapped) if mapped.flags.aligned else np.array(mapped)
+    return arrays
+
+
+class CompiledForest:
+    """
+    A RandomForestClassifier + StandardScaler flattened into contiguous node arrays.
+    Scoring needs only NumPy and returns the same probabilities as
+    model.predict_proba(scaler.transform(X)), bit for bit.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes):
+        self.feature = feature          # (n_nodes,) int64, 0 for leaves
+        self.threshold = threshold      # (n_nodes,) float64, in raw (unscaled) units, +inf for leaves
+        self.children = children        # (n_nodes, 2) int64 [left, right]; leaves point at themselves
+        self.value = value              # (n_nodes, n_classes) float64 class probabilities of each node
+        self.roots = roots              # (n_trees,) int64 index of each tree's root node
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+
+    @property
+    def n_trees(self): return len(self.roots)
+
+    @property
+    def n_nodes(self): return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        if getattr(model, "n_outputs_", 1) != 1: raise ValueError("Only single-output forests are supported.")
+        n_features = model.n_features_in_
+        mean = np.zeros(n_features); scale = np.ones(n_features)
+        if scaler is not None:
+            if getattr(scaler, "mean_", None) is not None: mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, "scale_", None) is not None: scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0; max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+            threshold = np.full(n, np.inf)
+            split = ~is_leaf
+            if split.any():
+                f = feature[split]
+                threshold[split] = _fold_thresholds(tree.threshold[split], mean[f], scale[f])
+            left = np.where(is_leaf, own, tree.children_left + offset)
+            right = np.where(is_leaf, own, tree.children_right + offset)
+
+            # Same normalisation DecisionTreeClassifier.predict_proba applies to the leaf counts.
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+
+            features.append(feature); thresholds.append(threshold)
+            children.append(np.column_stack([left, right])); values.append(value)
+            roots.append(offset)
+            offset += n; max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.ascontiguousarray(np.concatenate(features)), np.ascontiguousarray(np.concatenate(thresholds)),
+            np.ascontiguousarray(np.concatenate(children)), np.ascontiguousarray(np.concatenate(values)),
+            np.asarray(roots, dtype=np.int64), max_depth, np.asarray(model.classes_)
+        )
+
+    def save(self, path):
+        """Writes the node arrays as an uncompressed .npz, so load() can memory-map them in place."""
+        arrays = {name: np.ascontiguousarray(getattr(self, name)) for name in _ARRAYS}
+        header = np.array([FORMAT_VERSION, self.max_depth], dtype=np.int64)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+            for name, array in {"header": header, **arrays}.items():
+                buffer = io.BytesIO(); np.lib.format.write_array(buffer, array, allow_pickle=False)
+                info = zipfile.ZipInfo(f"{name}.npy", date_time=(1980, 1, 1, 0, 0, 0))
+                # Pad the local header's extra field so the .npy data (its header is already a
+                # multiple of 64 bytes) lands on an aligned offset; unaligned arrays make take() ~10x slower.
+                pad = -(archive.fp.tell() + 30 + len(info.filename)) % _ALIGN
+                if 0 < pad < 4: pad += _ALIGN
+                if pad: info.extra = struct.pack("<HH", 0x6770, pad - 4) + bytes(pad - 4)
+                archive.writestr(info, buffer.getvalue())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Reads a forest written by save(); needs only NumPy. With mmap=True the arrays are
+        read-only views of the file, paged in on first use and shared between processes."""
+        arrays = _mmap_npz(path) if mmap else dict(np.load(path, allow_pickle=False))
+        version, max_depth = (int(v) for v in arrays["header"])
+        if version != FORMAT_VERSION: raise ValueError(f"Unsupported compiled forest format {version} in {path}.")
+        return cls(arrays["feature"], arrays["threshold"], arrays["children"], arrays["value"],
+                   arrays["roots"], max_depth, np.asarray(arrays["classes_"]))
+
+    def apply(self, X):
+        """Returns the leaf reached in every tree, shape (n_trees, n_samples)."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        n_samples, n_features = X.shape
+        flat_x = X.ravel()
+        children = self.children.ravel()
+        # One lane per (tree, sample); `row` is the offset of that sample's features in flat_x.
+        row = np.tile(np.arange(n_samples, dtype=np.intp) * n_features, self.n_trees)
+        node = np.repeat(self.roots, n_samples)
+        for _ in range(self.max_depth):
+            x = flat_x.take(row + self.feature.take(node))
+            go_right = ~(x <= self.threshold.take(node))
+            node = children.take(node * 2 + go_right)
+        return node.reshape(self.n_trees, n_samples)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(FEATURES): raise ValueError(f"Expected an (n, {len(FEATURES)}) array.")
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            for c in range(self.value.shape[1]):
+                # sklearn adds the per-tree probabilities one tree at a time, then divides;
+                # a sequential accumulate keeps the exact same rounding.
+                total = np.add.accumulate(self.value[:, c].take(leaves), axis=0)[-1]
+                proba[start:start + CHUNK_ROWS, c] = total / self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
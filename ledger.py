@@ -1,93 +1,458 @@
 import json
 import os
 import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-LEDGER_FILE = "web3_ledger.json"
+import numpy as np
+
+try: import fcntl
+except ImportError: fcntl = None
+
+LEDGER_FILE = "web3_ledger.jsonl"
+LEGACY_LEDGER_FILE = "web3_ledger.json"
+CHECKPOINT_BLOCK_SIZE = 1024
+INDEX_SCAN_ROWS = 4096  # index rows examined per step when a page filter has to skip entries
+RECENT_ENTRY_IDS = 4096  # entry IDs remembered for idempotent appends (see add_to_ledger)
+GENESIS_HASH = "0000000000000000000000000000000000000000000000000000000000000000"
+
+# One JSON entry per line, appended and fsync'd; the chain head is cached so an append
+# never has to read the file. Every CHECKPOINT_BLOCK_SIZE entries a checkpoint record
+# (Merkle root of the block, last hash, byte range) goes to the checkpoint file next to it.
+# The cache is rebuilt whenever LEDGER_FILE points elsewhere, or when the file grew behind our back
+# (another server process appended; appends across processes are serialised by an fcntl lock).
+# An offset index (one fixed-size row per entry: byte offset, time, cause code) lets pages of
+# entries be read newest first without scanning the file; it is derived data, caught up on load.
+_lock = threading.RLock()
+_state = {"path": None, "file": None, "cp_file": None, "index_file": None, "index_time": 0.0,
+          "last_hash": GENESIS_HASH, "count": 0, "size": 0, "block_hashes": [], "checkpoints": [],
+          "entry_ids": OrderedDict()}  # entry_id -> (entry_hash, timestamp) of recent entries
+# How far verify_ledger(mode="incremental") has already checked, per ledger file.
+_verified = {"path": None, "blocks": 0, "offset": 0, "last_hash": GENESIS_HASH, "root": None}
+
+def checkpoint_file():
+    return f"{os.path.splitext(LEDGER_FILE)[0]}.checkpoints.jsonl"
+
+def index_file():
+    return f"{os.path.splitext(LEDGER_FILE)[0]}.index"
+
+# Times are made non-decreasing (an entry never sorts before its predecessor) so ranges can bisect.
+# `cause` is the CRC32 of the suggested cause, only used to skip entries; matches are re-checked.
+INDEX_RECORD = np.dtype([("offset", "<i8"), ("timestamp", "<f8"), ("cause", "<u4"), ("reserved", "<u4")])
+
+def _hash_entry(entry):
+    body = {k: v for k, v in entry.items() if k != "entry_hash"}
+    return hashlib.sha256(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()
+
+# --- Merkle helpers (RFC 6962 style: leaf/node prefixes, an unpaired node moves up as is) ---
+
+def _leaf(entry_hash): return hashlib.sha256(b"\x00" + bytes.fromhex(entry_hash)).digest()
+
+def _node(left, right): return hashlib.sha256(b"\x01" + left + right).digest()
+
+def _merkle_levels(leaves):
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([_node(level[k], level[k + 1]) if k + 1 < len(level) else level[k] for k in range(0, len(level), 2)])
+    return levels
+
+def merkle_root(entry_hashes):
+    if not entry_hashes: return GENESIS_HASH
+    return _merkle_levels([_leaf(h) for h in entry_hashes])[-1][0].hex()
+
+def _merkle_path(levels, index):
+    path = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level): path.append([level[sibling].hex(), "L" if sibling < index else "R"])
+        index //= 2
+    return path
+
+def _fold_path(digest, path):
+    for sibling_hex, side in path:
+        sibling = bytes.fromhex(sibling_hex)
+        digest = _node(sibling, digest) if side == "L" else _node(digest, sibling)
+    return digest
+
+# --- Storage ---
+
+def _migrate_legacy():
+    """One-time conversion of the old pretty-printed JSON array into the JSON-lines file."""
+    if os.path.exists(LEDGER_FILE) or not os.path.exists(LEGACY_LEDGER_FILE): return
+    try:
+        with open(LEGACY_LEDGER_FILE, "r") as f: entries = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"--- 💥 WARNING: Legacy ledger '{LEGACY_LEDGER_FILE}' unreadable, not migrated: {e} ---"); return
+    if not isinstance(entries, list): entries = []
+    tmp_path = f"{LEDGER_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        for entry in entries: f.write(json.dumps(entry, sort_keys=True) + "\n")
+        f.flush(); os.fsync(f.fileno())
+    os.replace(tmp_path, LEDGER_FILE)
+    os.replace(LEGACY_LEDGER_FILE, f"{LEGACY_LEDGER_FILE}.migrated")
+    print(f"--- ✅ Migrated {len(entries)} ledger entries to {LEDGER_FILE} ---")
+
+def _write_checkpoint(end_offset):
+    hashes = _state["block_hashes"]; block = len(_state["checkpoints"])
+    start_offset = _state["checkpoints"][-1]["end_offset"] if block else 0
+    record = {"block": block, "first_index": block * CHECKPOINT_BLOCK_SIZE, "count": len(hashes),
+              "merkle_root": merkle_root(hashes), "last_hash": hashes[-1],
+              "start_offset": start_offset, "end_offset": end_offset}
+    f = _state["cp_file"]
+    f.write((json.dumps(record, sort_keys=True) + "\n").encode('utf-8'))
+    f.flush(); os.fsync(f.fileno())
+    _state["checkpoints"].append(record); _state["block_hashes"] = []
+
+def _ensure_loaded():
+    """Opens the ledger and rebuilds the cached head from the last checkpoint onwards (O(block size))."""
+    if _state["path"] == LEDGER_FILE and _state["file"] is not None:
+        if os.fstat(_state["file"].fileno()).st_size == _state["size"]: return
+        _state["path"] = None  # appended to by another process: rebuild the head
+    with _process_lock(): _rebuild()
+
+def _rebuild():
+    for key in ("file", "cp_file", "index_file"):
+        if _state[key] is not None: _state[key].close(); _state[key] = None
+    _migrate_legacy()
+
+    checkpoints = []
+    if os.path.exists(checkpoint_file()):
+        with open(checkpoint_file(), "rb") as f: checkpoints = [json.loads(line) for line in f if line.endswith(b"\n")]
+    ledger_size = os.path.getsize(LEDGER_FILE) if os.path.exists(LEDGER_FILE) else 0
+    valid = len(checkpoints)
+    while valid and checkpoints[valid - 1]["end_offset"] > ledger_size: valid -= 1
+    if valid < len(checkpoints) or (checkpoints and not os.path.exists(LEDGER_FILE)):
+        # Checkpoints past the end of the ledger (e.g. the ledger was restored from an older copy).
+        checkpoints = checkpoints[:valid]
+        tmp_cp = f"{checkpoint_file()}.tmp"
+        with open(tmp_cp, "wb") as f:
+            for record in checkpoints: f.write((json.dumps(record, sort_keys=True) + "\n").encode('utf-8'))
+        os.replace(tmp_cp, checkpoint_file())
+
+    offset = checkpoints[-1]["end_offset"] if checkpoints else 0
+    last_hash = checkpoints[-1]["last_hash"] if checkpoints else GENESIS_HASH
+    _state.update(path=LEDGER_FILE, checkpoints=checkpoints, block_hashes=[], last_hash=last_hash, entry_ids=OrderedDict(),
+                  count=len(checkpoints) * CHECKPOINT_BLOCK_SIZE, size=offset,
+                  cp_file=open(checkpoint_file(), "ab"))
+    if os.path.exists(LEDGER_FILE):
+        with open(LEDGER_FILE, "rb+") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Torn write from a crash: cut the file back to the last complete line.
+                    f.truncate(_state["size"])
+                    print(f"--- ⚠️ Truncated torn final ledger line ({len(line)} bytes) ---")
+                    break
+                _state["size"] += len(line)
+                if not line.strip(): continue
+                entry = json.loads(line); entry_hash = entry["entry_hash"]
+                if entry.get("entry_id") is not None: _remember_id(entry["entry_id"], entry_hash, entry.get("timestamp"))
+                _state["block_hashes"].append(entry_hash); _state["last_hash"] = entry_hash; _state["count"] += 1
+                if len(_state["block_hashes"]) == CHECKPOINT_BLOCK_SIZE: _write_checkpoint(_state["size"])
+    _state["file"] = open(LEDGER_FILE, "ab")
+    _sync_index()
+
+def _entry_cause(entry):
+    """Suggested cause of a ledger entry (stored on the result or on its sensor payload)."""
+    result = entry.get("payload")
+    if not isinstance(result, dict): return None
+    payload = result.get("payload")
+    return result.get("suggested_cause") or (payload.get("suggested_cause") if isinstance(payload, dict) else None)
+
+def _cause_code(cause): return 0 if cause is None else zlib.crc32(str(cause).encode("utf-8"))
+
+def _index_row(offset, entry, previous_time):
+    try: timestamp = datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError): timestamp = previous_time
+    return np.array([(offset, max(timestamp, previous_time), _cause_code(_entry_cause(entry)), 0)], dtype=INDEX_RECORD)
+
+def _sync_index():
+    """Cuts the index back to the ledger's entry count, then indexes any entries it lacks (crash, migration)."""
+    path = index_file()
+    if not os.path.exists(path): open(path, "wb").close()
+    with open(path, "r+b") as f:
+        rows = min(os.fstat(f.fileno()).st_size // INDEX_RECORD.itemsize, _state["count"])
+        f.truncate(rows * INDEX_RECORD.itemsize)
+        start, previous_time = 0, 0.0
+        if rows:
+            f.seek((rows - 1) * INDEX_RECORD.itemsize)
+            last = np.frombuffer(f.read(INDEX_RECORD.itemsize), dtype=INDEX_RECORD)[0]
+            with open(LEDGER_FILE, "rb") as ledger:
+                ledger.seek(int(last["offset"])); start = int(last["offset"]) + len(ledger.readline())
+            previous_time = float(last["timestamp"])
+        if rows < _state["count"]:
+            f.seek(rows * INDEX_RECORD.itemsize)
+            with open(LEDGER_FILE, "rb") as ledger:
+                ledger.seek(start); offset = start
+                for line in ledger:
+                    if offset >= _state["size"]: break
+                    if line.strip():
+                        row = _index_row(offset, json.loads(line), previous_time)
+                        f.write(row.tobytes()); previous_time = float(row["timestamp"][0])
+                    offset += len(line)
+            print(f"--- ✅ Indexed {_state['count'] - rows} ledger entries ---")
+    _state["index_time"] = previous_time
+    _state["index_file"] = open(path, "ab")
+
+_held = {"fd": None, "depth": 0}
+
+class _process_lock:
+    """Exclusive fcntl lock on <ledger>.lock, re-entrant within this process (callers hold _lock).
+    A no-op without fcntl."""
+
+    def __enter__(self):
+        if fcntl is None: return
+        if _held["depth"] == 0:
+            _held["fd"] = os.open(f"{LEDGER_FILE}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(_held["fd"], fcntl.LOCK_EX)
+        _held["depth"] += 1
+
+    def __exit__(self, *exc):
+        if fcntl is None: return
+        _held["depth"] -= 1
+        if _held["depth"] == 0: os.close(_held["fd"]); _held["fd"] = None
 
 def get_last_hash():
     """Helper function to get the hash of the last block in the chain."""
-    if not os.path.exists(LEDGER_FILE):
-        return "0000000000000000000000000000000000000000000000000000000000000000"
-    
-    try:
-        with open(LEDGER_FILE, "r") as f:
-            ledger = json.load(f)
-        if not ledger: 
-            return "0000000000000000000000000000000000000000000000000000000000000000"
-        return ledger[-1]['entry_hash']
-    except (json.JSONDecodeError, IndexError, FileNotFoundError):
-        return "0000000000000000000000000000000000000000000000000000000000000000"
-
-def add_to_ledger(data_payload):
+    with _lock:
+        try: _ensure_loaded()
+        except (OSError, ValueError, KeyError): return GENESIS_HASH
+        return _state["last_hash"]
+
+def ledger_size():
+    with _lock:
+        _ensure_loaded()
+        return _state["count"]
+
+def _remember_id(entry_id, entry_hash, timestamp):
+    ids = _state["entry_ids"]
+    ids[entry_id] = (entry_hash, timestamp); ids.move_to_end(entry_id)
+    while len(ids) > RECENT_ENTRY_IDS: ids.popitem(last=False)
+
+def add_to_ledger(data_payload, entry_id=None):
     """
-    Creates a new, hashed entry for the local ledger.
+    Appends a new, hashed entry to the local ledger.
     Returns the new hash so it can be sent to the public.
+    With an `entry_id` the append is idempotent: if an entry with that ID is already in the ledger
+    (e.g. a retry after an fsync error, when the line may have reached the file anyway), nothing
+    is written and that entry's hash and timestamp are returned. A failed write resets the cached
+    head, and the rebuild re-reads every entry since the last checkpoint, so a line that did reach
+    the file is always found again.
     """
-    if not os.path.exists(LEDGER_FILE):
-        ledger = []
-    else:
+    with _lock, _process_lock():
         try:
-            with open(LEDGER_FILE, "r") as f:
-                ledger = json.load(f)
-            if not isinstance(ledger, list):
-                ledger = []
-        except (json.JSONDecodeError, FileNotFoundError):
-            ledger = []
-
-    new_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "previous_hash": get_last_hash(),
-        "payload": data_payload
-    }
-    
-    entry_string = json.dumps(new_entry, sort_keys=True).encode('utf-8')
-    entry_hash = hashlib.sha256(entry_string).hexdigest()
-    
-    new_entry["entry_hash"] = entry_hash
-    
-    ledger.append(new_entry)
-    
-    try:
-        with open(LEDGER_FILE, "w") as f:
-            json.dump(ledger, f, indent=4)
-        
-        return entry_hash, new_entry["timestamp"]
-    except Exception as e:
-        print(f"Error writing to ledger file: {e}")
-        return None, None
-
-def verify_ledger():
+            _ensure_loaded()
+            if entry_id is not None and entry_id in _state["entry_ids"]: return _state["entry_ids"][entry_id]
+            new_entry = {
+                "timestamp": datetime.now().isoformat(),
+                "previous_hash": _state["last_hash"],
+                "payload": data_payload
+            }
+            if entry_id is not None: new_entry["entry_id"] = entry_id
+            new_entry["entry_hash"] = _hash_entry(new_entry)
+
+            line = (json.dumps(new_entry, sort_keys=True) + "\n").encode('utf-8')
+            f = _state["file"]
+            f.write(line); f.flush(); os.fsync(f.fileno())
+        except Exception as e:
+            print(f"Error writing to ledger file: {e}")
+            _state["path"] = None
+            return None, None
+
+        offset = _state["size"]
+        _state["last_hash"] = new_entry["entry_hash"]; _state["count"] += 1; _state["size"] += len(line)
+        if entry_id is not None: _remember_id(entry_id, new_entry["entry_hash"], new_entry["timestamp"])
+        try:
+            row = _index_row(offset, new_entry, _state["index_time"])
+            _state["index_file"].write(row.tobytes()); _state["index_file"].flush()
+            _state["index_time"] = float(row["timestamp"][0])
+        except Exception as e: print(f"Error writing ledger index (rebuilt on next load): {e}"); _state["path"] = None
+        _state["block_hashes"].append(new_entry["entry_hash"])
+        if len(_state["block_hashes"]) == CHECKPOINT_BLOCK_SIZE:
+            try: _write_checkpoint(_state["size"])
+            except Exception as e: print(f"Error writing ledger checkpoint (rebuilt on next load): {e}"); _state["path"] = None
+        return new_entry["entry_hash"], new_entry["timestamp"]
+
+def iter_ledger():
+    """Yields every entry in chain order without loading the whole file."""
+    with _lock: _migrate_legacy()
+    if not os.path.exists(LEDGER_FILE): return
+    with open(LEDGER_FILE, "r") as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+def read_ledger():
+    return list(iter_ledger())
+
+def _read_index():
+    """The offset index, memory-mapped; rows are only appended once their entry is on disk."""
+    with _lock: _ensure_loaded(); path = index_file()
+    rows = os.path.getsize(path) // INDEX_RECORD.itemsize
+    if not rows: return np.empty(0, dtype=INDEX_RECORD)
+    return np.memmap(path, dtype=INDEX_RECORD, mode="r", shape=(rows,))
+
+def ledger_page(before=None, limit=50, since=None, until=None, suggested_cause=None):
     """
-    Verifies the integrity of the entire local hash chain.
-    Returns True if valid, False if tampered.
+    Entries newest first, at most `limit`, with chain index < `before` (the cursor returned for the
+    previous page) and optionally since <= time < until (Unix timestamps) and a suggested cause.
+    Each entry carries its chain `index` (usable with get_inclusion_proof). Time bounds are bisected
+    on the index, so an unfiltered page reads only its own lines. Returns (entries, next cursor or None).
     """
-    if not os.path.exists(LEDGER_FILE):
-        return True 
+    index = _read_index()
+    times = index["timestamp"]
+    hi = len(index) if before is None else max(0, min(before, len(index)))
+    lo = 0 if since is None else int(np.searchsorted(times[:hi], since, "left"))
+    if until is not None: hi = min(hi, int(np.searchsorted(times[:hi], until, "left")))
+    code = None if suggested_cause is None else _cause_code(suggested_cause)
+    entries = []
+    with open(LEDGER_FILE, "rb") as f:
+        for end in range(hi, lo, -INDEX_SCAN_ROWS):
+            positions = np.arange(max(lo, end - INDEX_SCAN_ROWS), end)
+            if code is not None: positions = positions[index["cause"][positions[0]:end] == code]
+            for position in positions[::-1].tolist():
+                f.seek(int(index["offset"][position])); entry = json.loads(f.readline())
+                if suggested_cause is not None and _entry_cause(entry) != suggested_cause: continue
+                entries.append({"index": position, **entry})
+                if len(entries) == limit: return entries, position
+    return entries, None
+
+# --- Verification ---
 
+def _verify_range(path, start, end, previous_hash=None):
+    """
+    Re-hashes the entries stored in bytes [start, end) of the ledger.
+    Returns (ok, first previous_hash, last entry_hash, Merkle root, entry count).
+    """
+    hashes = []; first_previous = None; current = previous_hash
     try:
-        with open(LEDGER_FILE, "r") as f:
-            ledger = json.load(f)
-    except Exception:
-        return False 
-
-    if not isinstance(ledger, list) or not ledger:
-        return True 
-
-    current_previous_hash = "0000000000000000000000000000000000000000000000000000000000000000"
-
-    for entry in ledger:
-        if entry['previous_hash'] != current_previous_hash:
-            return False 
-        
-        entry_hash = entry.pop('entry_hash')
-        
-        entry_string = json.dumps(entry, sort_keys=True).encode('utf-8')
-        recalculated_hash = hashlib.sha256(entry_string).hexdigest()
-        
-        if recalculated_hash != entry_hash:
-            return False 
-        
-        current_previous_hash = entry_hash
+        with open(path, "rb") as f:
+            f.seek(start)
+            for line in f.read(end - start).splitlines():
+                if not line.strip(): continue
+                entry = json.loads(line)
+                if first_previous is None: first_previous = entry['previous_hash']
+                if current is not None and entry['previous_hash'] != current: return False, None, None, None, 0
+                if _hash_entry(entry) != entry['entry_hash']: return False, None, None, None, 0
+                current = entry['entry_hash']; hashes.append(current)
+    except (ValueError, KeyError, OSError):
+        return False, None, None, None, 0
+    return True, first_previous, current, merkle_root(hashes), len(hashes)
+
+def _snapshot():
+    with _lock:
+        _ensure_loaded()
+        return LEDGER_FILE, list(_state["checkpoints"]), _state["size"]
+
+def _block_roots():
+    """Sealed block roots plus the root of the unsealed tail, the tail hashes and the entry count, read atomically."""
+    with _lock:
+        _ensure_loaded()
+        checkpoints = list(_state["checkpoints"]); tail_hashes = list(_state["block_hashes"])
+        count = _state["count"]; path = LEDGER_FILE
+    roots = [r["merkle_root"] for r in checkpoints] + ([merkle_root(tail_hashes)] if tail_hashes else [])
+    return path, checkpoints, tail_hashes, roots, count
 
+def _check_blocks(path, checkpoints, size, verified):
+    """Sequentially verifies every block after `verified`, then the unsealed tail; updates `verified`."""
+    for record in checkpoints[verified["blocks"]:]:
+        if record["start_offset"] != verified["offset"]: return False
+        ok, _, last_hash, root, count = _verify_range(path, record["start_offset"], record["end_offset"], verified["last_hash"])
+        if not ok or count != record["count"] or root != record["merkle_root"] or last_hash != record["last_hash"]: return False
+        verified.update(blocks=verified["blocks"] + 1, offset=record["end_offset"], last_hash=last_hash, root=root)
+    ok, _, _, _, count = _verify_range(path, verified["offset"], size, verified["last_hash"])
+    return ok and count < CHECKPOINT_BLOCK_SIZE
+
+def _verify_parallel(path, checkpoints, size, workers=None):
+    # Same layout check as _check_blocks: the blocks must tile the file from byte 0 with no gap or overlap,
+    # otherwise entries outside every range (or in two of them) would go unchecked.
+    offset = 0
+    for record in checkpoints:
+        if record["start_offset"] != offset: return False
+        offset = record["end_offset"]
+    ranges = [(r["start_offset"], r["end_offset"]) for r in checkpoints] + [(checkpoints[-1]["end_offset"] if checkpoints else 0, size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_verify_range, [path] * len(ranges), [s for s, _ in ranges], [e for _, e in ranges]))
+    previous = GENESIS_HASH
+    for k, (ok, first_previous, last_hash, root, count) in enumerate(results):
+        if not ok: return False
+        if count == 0: continue
+        if first_previous != previous: return False
+        if k < len(checkpoints):
+            record = checkpoints[k]
+            if count != record["count"] or root != record["merkle_root"] or last_hash != record["last_hash"]: return False
+        elif count >= CHECKPOINT_BLOCK_SIZE: return False
+        previous = last_hash
     return True
+
+def verify_ledger(mode="incremental", workers=None):
+    """
+    Verifies the integrity of the local hash chain and its Merkle checkpoints.
+    Returns True if valid, False if tampered.
+      mode="incremental": only re-hashes entries after the last checkpoint already verified by this process.
+      mode="full":        re-hashes everything from genesis.
+      mode="parallel":    like "full", with the blocks hashed across a process pool.
+    """
+    try: path, checkpoints, size = _snapshot()
+    except (OSError, ValueError, KeyError): return False
+    if size == 0: return True
+    if mode == "parallel" and len(checkpoints) > 1:
+        ok = _verify_parallel(path, checkpoints, size, workers)
+        if ok and checkpoints:
+            _verified.update(path=path, blocks=len(checkpoints), offset=checkpoints[-1]["end_offset"],
+                             last_hash=checkpoints[-1]["last_hash"], root=checkpoints[-1]["merkle_root"])
+        return ok
+
+    fresh = {"path": path, "blocks": 0, "offset": 0, "last_hash": GENESIS_HASH, "root": None}
+    state = dict(_verified) if mode == "incremental" and _verified["path"] == path else fresh
+    if state["blocks"] > len(checkpoints) or (state["blocks"] and checkpoints[state["blocks"] - 1]["merkle_root"] != state["root"]):
+        state = fresh  # The checkpoint file changed under us; start over.
+    ok = _check_blocks(path, checkpoints, size, state)
+    if ok: _verified.update(state)
+    else: _verified.update(path=None)
+    return ok
+
+# --- Inclusion proofs ---
+
+def _block_hashes(path, record_start, record_end):
+    with open(path, "rb") as f:
+        f.seek(record_start)
+        return [json.loads(line)["entry_hash"] for line in f.read(record_end - record_start).splitlines() if line.strip()]
+
+def get_inclusion_proof(index):
+    """
+    O(log n) proof that entry `index` is in the ledger: a Merkle path from the entry to its
+    block root, then from the block root to the ledger root (the root over all block roots,
+    the unsealed tail block included). Returns None if the index is out of range.
+    """
+    path, checkpoints, tail_hashes, block_roots, count = _block_roots()
+    if not 0 <= index < count: return None
+    block, position = divmod(index, CHECKPOINT_BLOCK_SIZE)
+    if block < len(checkpoints):
+        hashes = _block_hashes(path, checkpoints[block]["start_offset"], checkpoints[block]["end_offset"])
+    else:
+        hashes = tail_hashes
+
+    entry_levels = _merkle_levels([_leaf(h) for h in hashes])
+    root_levels = _merkle_levels([bytes.fromhex(r) for r in block_roots])
+    return {
+        "index": index, "entry_hash": hashes[position], "block": block, "block_root": block_roots[block],
+        "entry_path": _merkle_path(entry_levels, position), "block_path": _merkle_path(root_levels, block),
+        "root": root_levels[-1][0].hex(), "size": count
+    }
+
+def ledger_root():
+    """Root over all block roots; publish this and any single entry can later be proven against it."""
+    block_roots = _block_roots()[3]
+    if not block_roots: return GENESIS_HASH
+    return _merkle_levels([bytes.fromhex(r) for r in block_roots])[-1][0].hex()
+
+def verify_inclusion_proof(entry, proof, root=None):
+    """Checks a proof from get_inclusion_proof against the entry itself and a trusted root."""
+    if _hash_entry(entry) != proof["entry_hash"] or entry.get("entry_hash", proof["entry_hash"]) != proof["entry_hash"]: return False
+    block_root = _fold_path(_leaf(proof["entry_hash"]), proof["entry_path"])
+    if block_root.hex() != proof["block_root"]: return False
+    return _fold_path(block_root, proof["block_path"]).hex() == (root or proof["root"])
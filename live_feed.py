@@ -0,0 +1,115 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+
+
+class LiveFeed:
+    """
+    Client side of the backend's /stream Server-Sent Events feed, shared by every dashboard viewer.
+
+    One background thread holds the SSE connection (resuming with Last-Event-ID after a drop) and
+    appends each reading's (timestamp, power) to a preallocated ring of `capacity` points, so the
+    chart never allocates or concatenates per reading. Every reading bumps `version`; viewers block
+    in wait() until it moves instead of polling. While the backend is unreachable the feed falls back
+    to the periodic live_status.json snapshot, re-reading it only when its mtime changes.
+    """
+
+    def __init__(self, stream_url, status_url, snapshot_path=None, capacity=100, read_timeout=30.0, retry_delay=1.0):
+        self.stream_url = stream_url; self.status_url = status_url; self.snapshot_path = snapshot_path
+        self.capacity = capacity; self.read_timeout = read_timeout; self.retry_delay = retry_delay
+        self._times = np.full(capacity, np.nan); self._power = np.full(capacity, np.nan)
+        self._count = 0
+        self.latest = None; self.cursor = None; self.version = 0; self.connected = False
+        self._snapshot_mtime = None
+        self._changed = threading.Condition()
+        self._stop = threading.Event(); self._thread = None
+
+    # -- consuming --
+
+    def _push(self, entry):
+        seq = entry.get("seq")
+        with self._changed:
+            if seq is not None and self.cursor is not None and seq <= self.cursor: return
+            slot = self._count % self.capacity
+            self._times[slot] = entry.get("timestamp", time.time())
+            self._power[slot] = entry.get("payload", {}).get("power", np.nan)
+            self._count += 1
+            self.latest = entry
+            if seq is not None: self.cursor = seq
+            self.version += 1
+            self._changed.notify_all()
+
+    def _start_cursor(self):
+        """
+        Where to (re)connect: after the last reading seen, or, for a fresh feed or a backend that
+        restarted (its sequence numbers went backwards), far enough back to fill the chart.
+        """
+        last_seq = requests.get(self.status_url, timeout=2).json().get("last_seq", 0)
+        with self._changed:
+            if self.cursor is not None and self.cursor <= last_seq: return self.cursor
+            self.cursor = None
+        return max(last_seq - self.capacity, 0)
+
+    def _stream(self):
+        cursor = self._start_cursor()
+        headers = {"Accept": "text/event-stream", "Last-Event-ID": str(cursor)}
+        with requests.get(self.stream_url, params={"since": cursor}, headers=headers, stream=True,
+                          timeout=(2, self.read_timeout)) as response:
+            response.raise_for_status()
+            self.connected = True
+            data = []
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if self._stop.is_set(): return
+                if line.startswith("data:"): data.append(line[5:].lstrip())
+                elif not line and data:  # a blank line ends the event; ids and keep-alive comments are ignored
+                    self._push(json.loads("\n".join(data))); data = []
+
+    def _read_snapshot(self):
+        if not self.snapshot_path: return
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+            if mtime == self._snapshot_mtime: return
+            with open(self.snapshot_path) as f: entry = json.load(f)
+            self._snapshot_mtime = mtime
+        except (OSError, ValueError): return
+        if entry: self._push(entry)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try: self._stream()
+            except (requests.RequestException, ValueError): pass
+            self.connected = False
+            self._read_snapshot()
+            self._stop.wait(self.retry_delay)
+
+    def start(self):
+        if self._thread is not None: return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the feed; the thread exits at the next event, keep-alive or read timeout."""
+        self._stop.set()
+        with self._changed: self._changed.notify_all()
+        self._thread = None
+
+    # -- reading --
+
+    def wait(self, version, timeout):
+        """Blocks until the feed is past `version` or `timeout` passes; returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version or self._stop.is_set(), timeout)
+            return self.version
+
+    def chart(self):
+        """(timestamps, power) of the buffered points, oldest first (a copy of at most `capacity` points)."""
+        with self._changed:
+            n = min(self._count, self.capacity)
+            order = np.arange(self._count - n, self._count) % self.capacity
+            return self._times[order], self._power[order]
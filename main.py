@@ -1,28 +1,58 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, Request, BackgroundTasks
+import argparse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.requests import ClientDisconnect
 from pydantic import BaseModel
-import joblib
+from typing import List, Optional, Union
+import asyncio
+import functools
 import numpy as np
-import pandas as pd 
 import time
 import json
 import os
-import requests
-from ledger_web3.ledger import add_to_ledger
-import smtplib
+import threading
+import uuid
+from ledger_web3.ledger import add_to_ledger, ledger_size, ledger_page
+from inference import CompiledForest
+from model_registry import ModelRegistry, ModelBundle, ActiveVersionWatcher, MODEL_FILE, SCALER_FILE
+from dispatch import OutboundDispatcher, SMTPMailer, http_session
+from status_ring import StatusRing, SharedStatusRing, SnapshotWriter
+from retrain_jobs import RetrainJobManager
+from metrics import MetricsRegistry, SlowRequestProfiler
+from micro_batch import MicroBatcher
+from meter_window import MeterWindowStore
+from feedback_store import FeedbackStore, SOURCES, to_dicts
+from case_store import CaseStore
+from alerts import AlertAggregator
+from prediction_cache import PredictionCache
+from anomaly_rules import WINDOW_MIN_READINGS, is_anomaly, round_score, suggest_anomaly_cause
 from email.message import EmailMessage
 from datetime import datetime
 
-from sklearn.model_selection import train_test_split 
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-
 PUBLIC_WEBHOOK_URL = "https://webhook.site/f6e88887-23de-4e00-8973-b72a9de4fc72" 
 
 LIVE_STATUS_FILE = "live_status.json"
-FEEDBACK_LOG = "user_feedback_data.csv"
+FEEDBACK_LOG = "user_feedback_data.csv"   # legacy CSV log, imported into the feedback store once
+FEEDBACK_DIR = "feedback_store"
+CASES_DB = "anomaly_cases.db"
+CASE_TTL = 7 * 24 * 3600       # seconds an unanswered anomaly case (and its email links) stays valid
+CASE_SWEEP_INTERVAL = 60.0
+MAX_PAGE_SIZE = 500  # rows per page on /ledger/entries and /feedback/entries
+
+# Alert aggregation per (meter, suggested cause): the first anomaly of an incident is emailed at once,
+# later ones are summarised in digests sent when the coalescing window closes (the window doubles after
+# each digest, up to ALERT_MAX_WINDOW). Every email spends a token from the incident's bucket and the global one.
+ALERT_WINDOW = 60.0
+ALERT_MAX_WINDOW = 3600.0
+ALERT_QUIET_PERIOD = 300.0      # seconds without anomalies that close an incident
+ALERT_BURST = 3; ALERT_REFILL_SECONDS = 600.0
+ALERT_GLOBAL_BURST = 30; ALERT_GLOBAL_REFILL_SECONDS = 20.0
+ALERT_MAX_INCIDENTS = 10_000
 MODEL_PATH = "ai_model/gridlock_model.pkl"
 SCALER_PATH = "ai_model/scaler.pkl"
+REGISTRY_DIR = "ai_model/registry"
 ORIGINAL_DATASET = "gridlock_dataset.csv" 
 
 SENDER_EMAIL = "nithila.ramasamy2024@vitstudent.ac.in" 
@@ -31,168 +61,377 @@ RECEIVER_EMAIL = "gridlockai.alerts@gmail.com"
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 
-HIGH_CURRENT_THRESHOLD = 15.0; LOW_PF_THRESHOLD = 0.70; VOLTAGE_SAG_THRESHOLD = 210.0
+OUTBOUND_WORKERS = 4
+OUTBOUND_QUEUE_CAPACITY = 1000
+OUTBOUND_MAX_ATTEMPTS = 5
+
+RETRAIN_N_JOBS = -1  # cores used by the training process
+# Every retrain also stores a compacted forest (fewer, shallower trees; see compaction.py) with the
+# new version, chosen under COMPACTION_TARGET_LATENCY_US and the AUC/F1 loss budget, measured on the
+# original dataset's rows that retraining keeps out of the fit while this is on (dataset.holdout_mask);
+# with it off, retrains fit on every row.
+# Serving uses it instead of the full forest with GRIDLOCK_COMPACT_MODEL=1.
+COMPACT_ON_RETRAIN = True
+COMPACTION_TARGET_LATENCY_US = 150.0  # per single-reading call
+COMPACTION_MAX_AUC_LOSS = 0.002
+COMPACTION_MAX_F1_LOSS = 0.005
+SERVE_COMPACT_MODEL = os.environ.get("GRIDLOCK_COMPACT_MODEL", "0") == "1"
+
+# Multi-worker serving (python main.py --workers N). Each worker process memory-maps the active
+# version's forest.npz (one shared copy in the page cache) and follows the registry's ACTIVE pointer,
+# so an activation or retrain done through any worker reaches all of them within MODEL_WATCH_INTERVAL.
+# The live status ring moves to a shared memory-mapped file and retraining jobs are serialised and
+# recorded across workers; feedback, cases and the ledger are already file-locked/SQLite.
+# Meter windows, alert aggregation and /metrics stay per worker.
+SERVER_WORKERS = int(os.environ.get("GRIDLOCK_WORKERS", "1"))
+MODEL_WATCH_INTERVAL = 1.0
+SHARED_STATUS_RING = "live_status.ring"
+RETRAIN_LOCK = os.path.join(REGISTRY_DIR, "retrain.lock")
+RETRAIN_JOBS_DIR = os.path.join(REGISTRY_DIR, "jobs")
+
+STATUS_RING_SIZE = 2000
+LIVE_STATUS_SNAPSHOT_INTERVAL = 1.0  # seconds between live_status.json snapshots, 0 disables them
+STREAM_POLL_INTERVAL = 0.1
+STREAM_KEEPALIVE_INTERVAL = 15.0
+SHUTDOWN_GRACE = 5.0  # seconds shutdown waits for open connections; dashboard /stream feeds never close on their own
+
+INGEST_BATCH_WINDOW = 0.002   # seconds; streamed readings arriving this close together are scored in one call
+INGEST_MAX_BATCH = 512
+INGEST_MAX_IN_FLIGHT = 1000   # per connection; reading from the client pauses beyond this
+
+SLOW_REQUEST_PROFILING = False  # sample the stacks of requests slower than SLOW_REQUEST_THRESHOLD
+SLOW_REQUEST_THRESHOLD = 0.25   # seconds
+
+# Per-meter sliding windows (readings that carry a meter_id). Arrays are allocated zeroed and only
+# touched as meters appear; at full capacity they take ~350 MB per million meters, plus the meter ID index.
+METER_WINDOW_CAPACITY = int(os.environ.get("GRIDLOCK_METER_WINDOWS", "1000000"))  # meters tracked before the idlest is evicted
+METER_WINDOW_SIZE = 16
+PREDICTION_CACHE_SIZE = int(os.environ.get("GRIDLOCK_PREDICTION_CACHE", "0"))  # cached scores; 0 disables the cache
+# Quantisation step per feature (voltage V, current A, power W, power factor) for cache keys; set it to
+# the meters' reporting resolution. A cached score is the model's score for a reading at most half a
+# step away on each feature, and exact for readings already on the grid (see PredictionCache).
+PREDICTION_CACHE_RESOLUTION = (0.1, 0.001, 0.1, 0.001)
+MAX_BATCH_SIZE = 10000
+
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.histogram("gridlock_request_seconds", "Handler latency per endpoint.", ["endpoint"])
+STAGE_SECONDS = metrics.histogram("gridlock_stage_seconds", "Latency of processing stages (inference includes the scaler, which is folded into the compiled forest).", ["stage"])
+PREDICTIONS = metrics.counter("gridlock_predictions", "Readings scored.", ["endpoint"])
+ANOMALIES = metrics.counter("gridlock_anomalies", "Readings flagged as anomalies.")
+FEEDBACK = metrics.counter("gridlock_feedback", "User feedback received.", ["source", "response"])
+INGEST_BATCH_SIZE = metrics.histogram("gridlock_ingest_batch_size", "Readings per micro-batch on the streaming ingestion channels.",
+                                      buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+RETRAINS = metrics.counter("gridlock_retrains", "Retraining runs that reached a final status.", ["mode", "status"])
+profiler = SlowRequestProfiler(threshold=SLOW_REQUEST_THRESHOLD)
+
+def observe_stage(stage):
+    return lambda seconds: STAGE_SECONDS.observe(seconds, stage)
+
+def instrumented(endpoint):
+    """Times a (sync) endpoint into gridlock_request_seconds and makes it visible to the slow-request profiler."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter(); token = profiler.begin(endpoint)
+            try: return fn(*args, **kwargs)
+            finally:
+                profiler.end(token)
+                REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+        return wrapper
+    return decorator
+
+mailer = SMTPMailer(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD)
+dispatcher = OutboundDispatcher(workers=OUTBOUND_WORKERS, capacity=OUTBOUND_QUEUE_CAPACITY, max_attempts=OUTBOUND_MAX_ATTEMPTS)
+live_ring = SharedStatusRing(SHARED_STATUS_RING, STATUS_RING_SIZE) if SERVER_WORKERS > 1 else StatusRing(STATUS_RING_SIZE)
+meter_windows = MeterWindowStore(METER_WINDOW_CAPACITY, METER_WINDOW_SIZE)
+feedback_store = FeedbackStore(FEEDBACK_DIR)
+if os.path.exists(FEEDBACK_LOG) and feedback_store.count() == 0:
+    print(f"--- Imported {feedback_store.import_csv(FEEDBACK_LOG)} rows from {FEEDBACK_LOG} into {FEEDBACK_DIR}/ ---")
+case_store = CaseStore(CASES_DB, ttl=CASE_TTL, sweep_interval=CASE_SWEEP_INTERVAL)
+snapshot_writer = SnapshotWriter(live_ring, LIVE_STATUS_FILE, LIVE_STATUS_SNAPSHOT_INTERVAL, observe=observe_stage("live_status_snapshot"))
+
+@asynccontextmanager
+async def lifespan(app):
+    dispatcher.start(); snapshot_writer.start(); case_store.start(); alert_aggregator.start()
+    if SERVER_WORKERS > 1: version_watcher.start()
+    if SLOW_REQUEST_PROFILING: profiler.start()
+    yield
+    profiler.stop()
+    print("--- Flushing outbound queue... ---")
+    version_watcher.stop(); retrain_jobs.shutdown(); alert_aggregator.stop(); case_store.stop(); snapshot_writer.stop(); dispatcher.stop(); mailer.close()
 
 app = FastAPI(
     title="GRIDLOCK AI API (v2.12 - Retraining)",
     description="Real-time AI Anomaly Detection with Retraining, Cause Suggestion, Web3 Proof, Adaptive Learning, and Email Alerts.",
-    version="2.12.0"
+    version="2.12.0",
+    lifespan=lifespan
 )
 
-model = None
-scaler = None
+registry = ModelRegistry(REGISTRY_DIR)
+# The active ModelBundle (model + scaler + compiled engine). Requests read this reference once and
+# use that bundle throughout, so a swap is a single assignment and never mixes two versions.
+bundle = None
+_activation_lock = threading.Lock()
 
 def load_models():
-    """Loads model and scaler from files into global variables."""
-    global model, scaler
+    """Loads the active registry version (importing MODEL_PATH/SCALER_PATH on first run) and compiles it."""
+    global bundle
     try:
-        model = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        print("--- ✅ AI Model and Scaler loaded successfully ---")
+        registry.bootstrap(MODEL_PATH, SCALER_PATH)
+        version = registry.active_version()
+        if version is None:
+            print(f"--- 💥 CRITICAL ERROR: No active model in {REGISTRY_DIR} and none at {MODEL_PATH} or {SCALER_PATH} ---")
+            bundle = None; return False
+        bundle = registry.load(version, compact=SERVE_COMPACT_MODEL)
+        print(f"--- ✅ AI Model and Scaler {version} loaded successfully ({bundle.engine.n_trees} trees, {bundle.engine.n_nodes} nodes compiled) ---")
         return True
-    except FileNotFoundError:
-        print(f"--- 💥 CRITICAL ERROR: Could not find model at: {MODEL_PATH} or {SCALER_PATH} ---")
-        model = None; scaler = None; return False
     except Exception as e:
         print(f"--- 💥 CRITICAL ERROR: Error loading model: {e} ---")
-        model = None; scaler = None; return False
+        bundle = None; return False
 
 models_loaded = load_models() 
 
-if not PUBLIC_WEBHOOK_URL.startswith("https"): print("--- 💥 WARNING: PUBLIC_WEBHOOK_URL is not set. ---")
+if not PUBLIC_WEBHOOK_URL.startswith("http"): print("--- 💥 WARNING: PUBLIC_WEBHOOK_URL is not set. ---")
 
-class SensorReading(BaseModel): voltage: float; current: float; power: float; power_factor: float
-class FeedbackData(BaseModel): data: dict; response: str
+SENSOR_KEYS = ["voltage", "current", "power", "power_factor"]
+class SensorReading(BaseModel): voltage: float; current: float; power: float; power_factor: float; meter_id: Optional[str] = None
+class FeedbackData(BaseModel): data: dict; response: str; logged: bool = False  # logged: already in the feedback store
+class SensorBatch(BaseModel):
+    """Columnar form of a batch: one list per feature, all of the same length."""
+    voltage: List[float]; current: List[float]; power: List[float]; power_factor: List[float]; meter_id: Optional[List[Optional[str]]] = None
 
 def send_real_email(subject, body, to_email):
-     if not SENDER_EMAIL or not SENDER_PASSWORD or SENDER_EMAIL == "your_gmail_address@gmail.com":
+    """Queues an email on the outbound dispatcher; returns False if it could not be queued."""
+    if not SENDER_EMAIL or not SENDER_PASSWORD or SENDER_EMAIL == "your_gmail_address@gmail.com":
         print("--- 📧 Email not configured. Skipping send_real_email. ---")
         return False
-     try:
-        msg = EmailMessage(); msg["From"] = SENDER_EMAIL; msg["To"] = to_email; msg["Subject"] = subject
-        msg.set_content(body)
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as smtp:
-            smtp.starttls(); smtp.login(SENDER_EMAIL, SENDER_PASSWORD); smtp.send_message(msg)
-        print(f"--- 📧 REAL Email sent successfully to {to_email} ---")
-        return True
-     except Exception as e:
-        print(f"--- 💥 ERROR: Failed to send REAL email: {e} ---"); return False
-
-def post_to_public_ledger(public_hash, timestamp):
-    if not PUBLIC_WEBHOOK_URL.startswith("https"): return
-    try:
-        payload = {"proof_type": "GRIDLOCK_ANOMALY_HASH", "timestamp": timestamp, "hash": public_hash}
-        requests.post(PUBLIC_WEBHOOK_URL, json=payload, timeout=3)
-        print(f"--- 🌎 Public proof posted to Webhook ---")
-    except Exception as e: print(f"--- 💥 ERROR: Could not post public proof: {e} ---")
+    msg = EmailMessage(); msg["From"] = SENDER_EMAIL; msg["To"] = to_email; msg["Subject"] = subject
+    msg.set_content(body)
+    return dispatcher.submit("email", deliver_email, msg)
 
+def deliver_email(msg):
+    """Runs on a dispatcher worker; raises on failure so the job is retried."""
+    with STAGE_SECONDS.time("email_send"): mailer.send(msg)
+    print(f"--- 📧 REAL Email sent successfully to {msg['To']} ---")
 
-def log_user_feedback(data_payload, response_type):
+def post_to_public_ledger(public_hash, timestamp):
+    """Runs on a dispatcher worker; raises on failure so the job is retried."""
+    if not PUBLIC_WEBHOOK_URL.startswith("http"): return
+    payload = {"proof_type": "GRIDLOCK_ANOMALY_HASH", "timestamp": timestamp, "hash": public_hash}
+    with STAGE_SECONDS.time("webhook_post"): http_session().post(PUBLIC_WEBHOOK_URL, json=payload, timeout=3).raise_for_status()
+    print(f"--- 🌎 Public proof posted to Webhook ---")
+
+def record_confirmed_theft(result, entry_id):
+    """Runs on a dispatcher worker: appends the ledger entry, then queues the public proof separately
+    so a webhook retry never writes a second ledger entry. `entry_id` makes the append idempotent, so
+    a retry after a write error that still reached the file does not add a duplicate."""
+    with STAGE_SECONDS.time("ledger_append"): public_hash, timestamp = add_to_ledger(result, entry_id=entry_id)
+    if not public_hash: return False
+    dispatcher.submit("webhook", post_to_public_ledger, public_hash, timestamp)
+
+
+def log_user_feedback(data_payload, response_type, source="unknown"):
     print(f"--- ✅ Logging Feedback: '{response_type}' ---")
-    suggested_cause = data_payload.get('suggested_cause', 'N/A')
-    log_payload = {
-        'voltage': data_payload.get('voltage', 'N/A'),
-        'current': data_payload.get('current', 'N/A'),
-        'power': data_payload.get('power', 'N/A'),
-        'power_factor': data_payload.get('power_factor', 'N/A')
-    }
-    log_payload['Label'] = 0 if response_type == "normal" else 1
-    file_exists = os.path.isfile(FEEDBACK_LOG)
+    start = time.perf_counter()
     try:
-        with open(FEEDBACK_LOG, "a") as f:
-            if not file_exists:
-                f.write("voltage,current,power,power_factor,suggested_cause,Label\n")
-            f.write(f"{log_payload['voltage']},{log_payload['current']},{log_payload['power']},{log_payload['power_factor']},{suggested_cause},{log_payload['Label']}\n")
-        print(f"--- Feedback saved to {FEEDBACK_LOG} ---"); return True
+        feedback_store.append([{**data_payload, "label": 0 if response_type == "normal" else 1}], source=source)
+        STAGE_SECONDS.observe(time.perf_counter() - start, "feedback_log")
+        print(f"--- Feedback saved to {feedback_store.path}/ ---"); return True
     except Exception as e: print(f"--- 💥 ERROR: Could not write feedback log: {e} ---"); return False
 
 
-def suggest_anomaly_cause(data_payload):
-    v = data_payload.get('voltage', 230); i = data_payload.get('current', 0); pf = data_payload.get('power_factor', 1.0)
-    if i > HIGH_CURRENT_THRESHOLD:
-        return "High Current & Voltage Sag (Possible Short Circuit / Major Fault)" if v < VOLTAGE_SAG_THRESHOLD else "Sustained High Current (Possible Theft or Overload)"
-    elif pf < LOW_PF_THRESHOLD: return "Low Power Factor (Possible Industrial Motor Issue / Faulty Appliance)"
-    elif v < VOLTAGE_SAG_THRESHOLD: return "Significant Voltage Sag (Possible Grid Fault / Brownout)"
-    else: return "Unusual Pattern Detected (Check System)"
-
-def perform_retraining():
-    """Loads data, combines, retrains model/scaler, saves, and reloads."""
-    global model, scaler 
-    print("\n--- 🔄 Starting AI Retraining Process... ---")
+def install_bundle(new_bundle, activate=True):
+    """Makes an already loaded and compiled bundle the active version, on disk (unless activate=False,
+    i.e. following another worker's activation) and in memory."""
+    global bundle
+    with _activation_lock:
+        if activate: registry.set_active(new_bundle.version)
+        previous, bundle = bundle, new_bundle
+    print(f"--- ✅ AI Model and Scaler {new_bundle.version} active (was {previous.version if previous else None}). ---")
+    return previous
+
+def activate_version(version):
+    """Switches to a published version (rollback or roll-forward). Loading and compiling happen before
+    the swap, so predictions keep using the current bundle until the new one is ready."""
+    if bundle is not None and bundle.version == version: return bundle
+    install_bundle(registry.load(version, compact=SERVE_COMPACT_MODEL))
+
+def follow_active_version(version):
+    """Called by the version watcher when another worker process activated `version`."""
+    install_bundle(registry.load(version, compact=SERVE_COMPACT_MODEL), activate=False)
+
+version_watcher = ActiveVersionWatcher(registry, lambda: bundle.version if bundle is not None else None,
+                                       follow_active_version, MODEL_WATCH_INTERVAL)
+
+def retrain_meta(info, new_state, parent):
+    return {"source": "retrain", "parent": parent, "mode": info["mode"], "training_rows": info["training_rows"],
+            "metrics": info, "retrain_state": new_state}
+
+def install_retrained_artifacts(result):
+    """Called by the retrain job manager when a job succeeds: publish the job's temp artifacts as a
+    new version, load and compile it, and only then swap it in."""
+    version = registry.publish(retrain_meta(result["info"], result["state"], result.get("parent")),
+                               model_file=result["model_tmp"], scaler_file=result["scaler_tmp"], forest_file=result.get("forest_tmp"),
+                               compact_file=result.get("compact_tmp"), compaction_report=result.get("compaction"))
+    install_bundle(registry.load(version, compact=SERVE_COMPACT_MODEL))
+    registry.prune()
+    print(f"--- ✅ Retraining Complete! ({version}, {result['info']['mode']}, {result['info']['fit_seconds']}s fit) ---")
+
+def retrain_job_spec():
+    """What a retraining job builds on: the active version and the retraining state stored with it.
+    Read from the registry rather than this process's bundle, which may lag another worker's swap."""
+    version = registry.active_version()
+    spec = {"dataset_path": ORIGINAL_DATASET, "feedback_path": feedback_store.path, "work_dir": REGISTRY_DIR,
+            "model_path": "", "scaler_path": "", "state": None, "parent": None, "compaction": compaction_budget()}
+    if version is not None:
+        spec.update(model_path=registry.path(version, MODEL_FILE), scaler_path=registry.path(version, SCALER_FILE),
+                    state=registry.meta(version).get("retrain_state"), parent=version)
+    return spec
+
+def compaction_budget():
+    """Keyword arguments for compaction.compact(), or None when retrains are not compacted."""
+    if not COMPACT_ON_RETRAIN: return None
+    return {"target_latency_us": COMPACTION_TARGET_LATENCY_US, "max_auc_loss": COMPACTION_MAX_AUC_LOSS, "max_f1_loss": COMPACTION_MAX_F1_LOSS}
+
+def perform_retraining(mode="auto"):
+    """
+    Retrains and hot-swaps the model in this process. mode="auto" grows the forest with a few extra
+    trees fitted on feedback rows not trained on yet, and falls back to a full refit on the retraining
+    schedule; "full" and "incremental" force one or the other. The API runs this through
+    retrain_jobs instead, in a separate process.
+    """
+    print(f"\n--- 🔄 Starting AI Retraining Process ({mode})... ---")
     try:
         if not os.path.exists(ORIGINAL_DATASET):
             print(f"--- 💥 ERROR: Original dataset '{ORIGINAL_DATASET}' not found. Cannot retrain. ---")
             return
-        df_original = pd.read_csv(ORIGINAL_DATASET)
-        print(f"- Loaded {len(df_original)} samples from original dataset.")
-
-        if not os.path.exists(FEEDBACK_LOG):
-            print(f"--- ℹ️ INFO: Feedback log '{FEEDBACK_LOG}' not found. Training only on original data. ---")
-            df_feedback = pd.DataFrame()
-        else:
-            df_feedback = pd.read_csv(FEEDBACK_LOG)
-            feedback_cols = ['voltage', 'current', 'power', 'power_factor', 'Label']
-            df_feedback = df_feedback[feedback_cols]
-            print(f"- Loaded {len(df_feedback)} samples from feedback log.")
-
-        df_combined = pd.concat([df_original, df_feedback], ignore_index=True)
-        df_combined = df_combined.drop_duplicates()
-        print(f"- Combined dataset size: {len(df_combined)} samples.")
-
-        features = ['voltage', 'current', 'power', 'power_factor']
-        X = df_combined[features]
-        y = df_combined['Label']
-
-        new_scaler = StandardScaler()
-        X_scaled = new_scaler.fit_transform(X) 
-        print("- Scaler retrained.")
-
-        new_model = RandomForestClassifier(n_estimators=100, random_state=42) 
-        new_model.fit(X_scaled, y)
-        print("- Model retrained.")
-
-        joblib.dump(new_model, MODEL_PATH)
-        joblib.dump(new_scaler, SCALER_PATH)
-        print(f"- New model saved to: {MODEL_PATH}")
-        print(f"- New scaler saved to: {SCALER_PATH}")
-
-        model = new_model
-        scaler = new_scaler
-        print("--- ✅ AI Model and Scaler reloaded into memory. ---")
+        current = bundle
+        model, scaler, state = (current.model, current.scaler, current.meta.get("retrain_state")) if current else (None, None, None)
+        import retraining  # pandas + sklearn: only needed when training in this process
+        outcome = retraining.retrain(model, scaler, ORIGINAL_DATASET, feedback_store.path, mode=mode, state=state,
+                                     holdout=compaction_budget() is not None)
+        if outcome is None:
+            print("--- ℹ️ INFO: No new feedback since the last retrain and no full refit due. Nothing to do. ---")
+            return
+        new_model, new_scaler, info, new_state = outcome
+        RETRAINS.inc(info["mode"], "succeeded")
+        print(f"- Model retrained ({info['mode']}, {info['training_rows']} rows, {info['new_feedback_rows']} new feedback rows) in {info['fit_seconds']}s.")
+
+        new_engine = CompiledForest.from_sklearn(new_model, new_scaler)
+        print("- Model compiled.")
+        compact = report = None
+        if compaction_budget() is not None:
+            import compaction
+            compact, report = compaction.try_compact(new_engine, ORIGINAL_DATASET, **compaction_budget())
+            if compact is None: print(f"- ⚠️ Compaction failed: {report['error']}")
+            else: print(f"- Compacted to {compact.n_trees} trees of depth ≤{compact.max_depth} ({report['speedup']}x faster).")
+
+        meta = retrain_meta(info, new_state, current.version if current else None)
+        version = registry.publish(meta, model=new_model, scaler=new_scaler, engine=new_engine, compact=compact, compaction_report=report)
+        print(f"- New model and scaler published as {version} in {REGISTRY_DIR}")
+
+        serving = compact if SERVE_COMPACT_MODEL and compact is not None else new_engine
+        install_bundle(ModelBundle(version, new_model, new_scaler, serving, registry.meta(version), compact=serving is compact))
+        registry.prune()
         print("--- ✅ Retraining Complete! ---")
+        return info
 
     except Exception as e:
         print(f"--- 💥 ERROR during retraining: {e} ---")
 
-@app.post("/predict")
-def predict(data: SensorReading):
-    global model, scaler 
-    if not model or not scaler: raise HTTPException(status_code=503, detail="Model not loaded.")
-
-    try:
-        v, i, p, pf = data.voltage, data.current, data.power, data.power_factor
-        features = np.array([[v, i, p, pf]])
-        features_scaled = scaler.transform(features)
-        prob_anomaly = model.predict_proba(features_scaled)[0, 1]
-        is_anomaly = bool(prob_anomaly > 0.75)
-
-        data_payload = {"voltage": v, "current": i, "power": p, "power_factor": pf}
-
-        suggested_cause = None
-        if is_anomaly:
-            suggested_cause = suggest_anomaly_cause(data_payload)
-
-        result = {
-            "timestamp": time.time(), "payload": data_payload,
-            "anomaly_score": round(float(prob_anomaly), 4), "anomaly": is_anomaly,
-            "suggested_cause": suggested_cause
-        }
-
-        with open(LIVE_STATUS_FILE, "w") as f: json.dump(result, f)
-
-        if is_anomaly:
-            anomaly_id = f"data_{int(time.time())}"
-            email_body = f"""
+def record_retrain_job(job):
+    RETRAINS.inc(job["mode"], job["status"])
+    if job["timings"].get("total_seconds") is not None: STAGE_SECONDS.observe(job["timings"]["total_seconds"], "retrain_job")
+
+retrain_jobs = RetrainJobManager(install_retrained_artifacts, retrain_job_spec, n_jobs=RETRAIN_N_JOBS, on_finish=record_retrain_job,
+                                 lock_path=RETRAIN_LOCK if SERVER_WORKERS > 1 else None,
+                                 record_dir=RETRAIN_JOBS_DIR if SERVER_WORKERS > 1 else None)
+
+metrics.gauge("gridlock_ledger_entries", "Entries in the ledger.", ledger_size)
+metrics.gauge("gridlock_outbound_queue_depth", "Outbound jobs waiting or in flight.", lambda: dispatcher.stats()["queue_depth"])
+metrics.gauge("gridlock_outbound_jobs", "Outbound jobs by outcome since startup.",
+              lambda: {(outcome,): n for outcome, n in dispatcher.counters.items()}, ["outcome"])
+metrics.gauge("gridlock_alert_events", "Anomalies fed to the alert aggregator and what became of them, since startup.",
+              lambda: {(outcome,): n for outcome, n in alert_aggregator.counters.items()}, ["outcome"])
+metrics.gauge("gridlock_open_cases", "Anomaly cases awaiting feedback.", lambda: case_store.count("open"))
+metrics.gauge("gridlock_tracked_meters", "Meters with a sliding window in memory.", lambda: len(meter_windows))
+metrics.gauge("gridlock_meter_window_evictions", "Idle meters evicted from the window store since startup.", lambda: meter_windows.evictions)
+metrics.gauge("gridlock_status_last_seq", "Sequence number of the newest reading in the live status ring.", lambda: live_ring.last_seq)
+metrics.gauge("gridlock_model_trees", "Trees in the active model, labelled with its registry version.",
+              lambda: {(bundle.version,): bundle.engine.n_trees} if bundle else None, ["version"])
+metrics.gauge("gridlock_retrain_jobs_active", "Retraining jobs queued or running.",
+              lambda: sum(job["status"] in ("queued", "running") for job in retrain_jobs.list()))
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_RESOLUTION) if PREDICTION_CACHE_SIZE > 0 else None
+
+metrics.gauge("gridlock_prediction_cache_events", "Prediction cache hits, misses, evictions and invalidations since startup.",
+              lambda: {(event,): n for event, n in prediction_cache.counters.items()} if prediction_cache else None, ["event"])
+metrics.gauge("gridlock_prediction_cache_entries", "Scores in the prediction cache.", lambda: len(prediction_cache) if prediction_cache else None)
+
+def score_features(features, current=None):
+    """Scores an (n, 4) array of raw [voltage, current, power, power_factor] rows in one pass
+    (through the prediction cache when it is enabled; entries are keyed to the model version)."""
+    current = current or bundle
+    if prediction_cache is None: return current.predict_proba(features)[:, 1]
+    return prediction_cache.score(features, current.version, lambda X: current.predict_proba(X)[:, 1])
+
+def window_features(stats, k, sustained_score):
+    """Row k of MeterWindowStore.update_many() output as a JSON-friendly dict."""
+    def named(values): return {name: round(float(x), 4) for name, x in zip(SENSOR_KEYS, values)}
+    return {"n": int(stats["n"][k]), "mean": named(stats["mean"][k]), "std": named(stats["std"][k]),
+            "delta": named(stats["delta"][k]), "sustained_score": float(round_score(sustained_score))}
+
+def score_with_windows(features, meter_ids, current):
+    """
+    Scores every row; rows with a meter ID also update that meter's window, and the window mean is
+    scored by the same forest (the "sustained" score), in the same call. Returns (scores, windows),
+    windows[k] being None for rows without a meter ID.
+    """
+    n = len(features)
+    tracked = [k for k, meter_id in enumerate(meter_ids) if meter_id is not None] if meter_ids else []
+    if not tracked: return score_features(features, current), [None] * n
+    start = time.perf_counter()
+    stats = meter_windows.update_many([meter_ids[k] for k in tracked], features[tracked])
+    STAGE_SECONDS.observe(time.perf_counter() - start, "meter_window")
+    probs = score_features(np.vstack([features, stats["mean"]]), current)
+    windows = [None] * n
+    for j, k in enumerate(tracked): windows[k] = window_features(stats, j, probs[n + j])
+    return probs[:n], windows
+
+def build_result(v, i, p, pf, prob_anomaly, timestamp, meter_id=None, window=None):
+    """`anomaly_score` is the score behind `anomaly`: the reading's own, or its meter's window score when
+    that is higher and the window is full enough to count (`reading_score` then keeps the reading's own)."""
+    data_payload = {"voltage": v, "current": i, "power": p, "power_factor": pf}
+    score = float(prob_anomaly)
+    # Readings that look normal one by one can still add up to a meter whose recent average doesn't.
+    window_counts = window is not None and window["n"] >= WINDOW_MIN_READINGS
+    if window_counts: score = max(score, window["sustained_score"])
+    score = float(round_score(score))
+    anomaly = bool(is_anomaly(score))
+    sustained = window_counts and bool(is_anomaly(window["sustained_score"]))
+    suggested_cause = suggest_anomaly_cause(data_payload, window) if anomaly else None
+    result = {
+        "timestamp": timestamp, "payload": data_payload,
+        "anomaly_score": score, "anomaly": anomaly,
+        "suggested_cause": suggested_cause
+    }
+    if meter_id is not None:
+        result["meter_id"] = meter_id; result["window"] = window; result["sustained_anomaly"] = sustained
+        result["reading_score"] = float(round_score(prob_anomaly))
+    return result
+
+def open_cases(results):
+    """Opens an anomaly case for each result (one insert for all of them) and tags the results with its ID."""
+    if not results: return
+    with STAGE_SECONDS.time("case_insert"):
+        for result, case_id in zip(results, case_store.add_many(results)): result["case_id"] = case_id
+
+def send_anomaly_alert(result):
+    """Emails the first alert of an incident; the feedback links point at the anomaly's case."""
+    anomaly_id = result["case_id"]
+    data_payload = result["payload"]; suggested_cause = result["suggested_cause"]
+    v, i, p, pf = data_payload["voltage"], data_payload["current"], data_payload["power"], data_payload["power_factor"]
+    email_body = f"""
 Dear User, An anomaly was detected.
 Score: {result['anomaly_score']:.4f}, Suggested Cause: {suggested_cause}
 Data: V={v:.1f}, A={i:.1f}, W={p:.1f}, PF={pf:.2f}
@@ -201,11 +440,61 @@ Was this you? Click a link:
 --> Theft: http://127.0.0.1:8000/feedback?id={anomaly_id}&response=theft
 - Gridlock AI
 """
-            send_real_email("GRIDLOCK AI: ANOMALY DETECTED!", email_body, RECEIVER_EMAIL)
+    send_real_email("GRIDLOCK AI: ANOMALY DETECTED!", email_body, RECEIVER_EMAIL)
+
+def send_anomaly_digest(summary):
+    """Emails a summary of the anomalies coalesced since the incident's last email."""
+    meter = summary["meter_id"] or "unidentified meter"
+    lines = []
+    for result in summary["samples"]:
+        d = result["payload"]
+        lines.append(f"- {datetime.fromtimestamp(result['timestamp']).strftime('%H:%M:%S')} score {result['anomaly_score']:.4f}: "
+                     f"V={d['voltage']:.1f}, A={d['current']:.1f}, W={d['power']:.1f}, PF={d['power_factor']:.2f} "
+                     f"(feedback: http://127.0.0.1:8000/feedback?id={result['case_id']}&response=theft)")
+    state = "has ended" if summary["final"] else "is ongoing"
+    email_body = f"""
+Dear User, the anomaly on {meter} {state}.
+Suggested Cause: {summary['suggested_cause']}
+{summary['readings']} more anomalous readings since the last email ({summary['incident_readings']} over {summary['incident_seconds']:.0f}s in total), max score {summary['max_score']:.4f}.
+Latest readings:
+{chr(10).join(lines)}
+All cases: http://127.0.0.1:8000/cases?status=open
+- Gridlock AI
+"""
+    send_real_email(f"GRIDLOCK AI: {summary['readings']} anomalies on {meter}", email_body, RECEIVER_EMAIL)
+
+alert_aggregator = AlertAggregator(send_anomaly_alert, send_anomaly_digest, window=ALERT_WINDOW, max_window=ALERT_MAX_WINDOW,
+                                   quiet_period=ALERT_QUIET_PERIOD, burst=ALERT_BURST, refill_seconds=ALERT_REFILL_SECONDS,
+                                   global_burst=ALERT_GLOBAL_BURST, global_refill_seconds=ALERT_GLOBAL_REFILL_SECONDS,
+                                   max_keys=ALERT_MAX_INCIDENTS)
+
+def handle_anomaly(result):
+    """Hands an anomaly to the alert aggregator, which decides whether it is emailed now or in a digest."""
+    alert_aggregator.record(result)
+
+@app.post("/predict")
+@instrumented("predict")
+def predict(data: SensorReading):
+    current = bundle
+    if current is None: raise HTTPException(status_code=503, detail="Model not loaded.")
 
-            temp_data_for_feedback = data_payload.copy()
-            temp_data_for_feedback['suggested_cause'] = suggested_cause
-            with open(f"{anomaly_id}.json", "w") as f: json.dump(temp_data_for_feedback, f)
+    try:
+        v, i, p, pf = data.voltage, data.current, data.power, data.power_factor
+        t0 = time.perf_counter()
+        probs, windows = score_with_windows(np.array([[v, i, p, pf]]), [data.meter_id], current)
+        t1 = time.perf_counter()
+        result = build_result(v, i, p, pf, probs[0], time.time(), data.meter_id, windows[0])
+        result["model_version"] = current.version
+        if result["anomaly"]: open_cases([result])
+        t2 = time.perf_counter()
+        live_ring.append(result)
+        t3 = time.perf_counter()
+        STAGE_SECONDS.observe(t1 - t0, "inference"); STAGE_SECONDS.observe(t2 - t1, "build_result")
+        STAGE_SECONDS.observe(t3 - t2, "status_ring"); PREDICTIONS.inc("predict")
+
+        if result["anomaly"]:
+            ANOMALIES.inc()
+            with STAGE_SECONDS.time("anomaly_handling"): handle_anomaly(result)
 
         return result
 
@@ -214,22 +503,216 @@ Was this you? Click a link:
         raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
 
 
+def process_readings(features, current, endpoint, meter_ids=None):
+    """Scores an (n, 4) array with one forest call, records the results in the live ring and
+    raises alerts for the anomalies. Shared by /predict_batch and the streaming channels."""
+    t0 = time.perf_counter()
+    probs, windows = score_with_windows(features, meter_ids, current)
+    t1 = time.perf_counter()
+    now = time.time()
+    meter_ids = meter_ids or [None] * len(features)
+    results = [build_result(v, i, p, pf, prob, now, meter_id, window)
+               for (v, i, p, pf), prob, meter_id, window in zip(features.tolist(), probs.tolist(), meter_ids, windows)]
+    for result in results: result["model_version"] = current.version
+    anomalies = [result for result in results if result["anomaly"]]
+    open_cases(anomalies)
+    t2 = time.perf_counter()
+    live_ring.extend(results)
+    t3 = time.perf_counter()
+    STAGE_SECONDS.observe(t1 - t0, "inference_batch"); STAGE_SECONDS.observe(t2 - t1, "build_result_batch")
+    STAGE_SECONDS.observe(t3 - t2, "status_ring_batch"); PREDICTIONS.inc(endpoint, amount=len(results))
+
+    for result in anomalies:
+        ANOMALIES.inc()
+        with STAGE_SECONDS.time("anomaly_handling"): handle_anomaly(result)
+    return results
+
+@app.post("/predict_batch")
+@instrumented("predict_batch")
+def predict_batch(batch: Union[List[SensorReading], SensorBatch]):
+    """Scores many readings with a single scaler/forest call.
+
+    Accepts either a JSON array of readings or the columnar form
+    {"voltage": [...], "current": [...], "power": [...], "power_factor": [...]}.
+    """
+    current = bundle
+    if current is None: raise HTTPException(status_code=503, detail="Model not loaded.")
+
+    if isinstance(batch, SensorBatch):
+        columns = [batch.voltage, batch.current, batch.power, batch.power_factor]
+        if len({len(c) for c in columns}) != 1:
+            raise HTTPException(status_code=422, detail="Columnar batch fields must all have the same length.")
+        if batch.meter_id is not None and len(batch.meter_id) != len(batch.voltage):
+            raise HTTPException(status_code=422, detail="meter_id must have one entry per reading.")
+        features = np.column_stack(columns).astype(float)
+        meter_ids = batch.meter_id
+    else:
+        features = np.array([[r.voltage, r.current, r.power, r.power_factor] for r in batch], dtype=float).reshape(-1, 4)
+        meter_ids = [r.meter_id for r in batch]
+    if len(features) == 0: return {"count": 0, "anomalies": 0, "results": []}
+    if len(features) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large (max {MAX_BATCH_SIZE} readings).")
+
+    try:
+        results = process_readings(features, current, "predict_batch", meter_ids)
+        return {"count": len(results), "anomalies": sum(r["anomaly"] for r in results), "model_version": current.version, "results": results}
+
+    except Exception as e:
+        print(f"Error during batch prediction: {e}")
+        raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+
+
+def score_ingest_batch(features, meter_ids):
+    current = bundle
+    if current is None: raise RuntimeError("Model not loaded.")
+    return process_readings(features, current, "ingest", meter_ids)
+
+ingest_batcher = MicroBatcher(score_ingest_batch, window=INGEST_BATCH_WINDOW, max_batch=INGEST_MAX_BATCH,
+                              observe_batch=INGEST_BATCH_SIZE.observe)
+
+def submit_reading(text):
+    """Parses one streamed SensorReading (JSON, optionally with an "id" echoed back in the reply) and
+    queues it for the next micro-batch. Returns (id, future), or an error reply for bad input."""
+    message = None
+    try:
+        message = json.loads(text)
+        reading = SensorReading.model_validate(message)
+    except (ValueError, TypeError) as e:
+        message_id = message.get("id") if isinstance(message, dict) else None
+        return {"id": message_id, "error": f"Invalid reading: {e}"}
+    return message.get("id"), ingest_batcher.submit([reading.voltage, reading.current, reading.power, reading.power_factor], reading.meter_id)
+
+async def resolve_reading(item):
+    if isinstance(item, dict): return item
+    message_id, future = item
+    try: result = await future
+    except Exception as e: return {"id": message_id, "error": f"Prediction error: {e}"}
+    return {"id": message_id, **result} if message_id is not None else result
+
+@app.websocket("/ws/ingest")
+async def ingest_websocket(websocket: WebSocket):
+    """
+    Long-lived ingestion channel: send one SensorReading JSON text message per reading, receive one
+    result message per reading, in the same order. Readings from all connections that arrive within
+    INGEST_BATCH_WINDOW are scored together.
+    """
+    await websocket.accept()
+    pending = asyncio.Queue(INGEST_MAX_IN_FLIGHT)
+
+    async def send_results():
+        while True:
+            await websocket.send_text(json.dumps(await resolve_reading(await pending.get())))
+
+    sender = asyncio.create_task(send_results())
+    try:
+        while True:
+            await pending.put(submit_reading(await websocket.receive_text()))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose body generator keeps reading the request. Starlette's own version
+    listens for disconnects on older ASGI servers, which would swallow the request body."""
+    async def __call__(self, scope, receive, send):
+        try: await self.stream_response(send)
+        except OSError: raise ClientDisconnect()
+
+@app.post("/ingest")
+async def ingest_ndjson(request: Request):
+    """
+    Same as /ws/ingest over plain HTTP: POST newline-delimited SensorReading JSON (a chunked body can
+    stay open for as long as the meter streams) and read one NDJSON result line per reading back.
+    """
+    pending = asyncio.Queue(INGEST_MAX_IN_FLIGHT)
+
+    async def read_lines():
+        buffer = b""
+        try:
+            async for chunk in request.stream():
+                *lines, buffer = (buffer + chunk).split(b"\n")
+                for line in lines:
+                    if line.strip(): await pending.put(submit_reading(line))
+            if buffer.strip(): await pending.put(submit_reading(buffer))
+        except Exception as e:
+            print(f"--- 💥 ERROR: Ingestion stream ended early: {e} ---")
+        await pending.put(None)
+
+    async def results():
+        reader = asyncio.create_task(read_lines())
+        try:
+            while (item := await pending.get()) is not None:
+                yield json.dumps(await resolve_reading(item)) + "\n"
+        finally:
+            reader.cancel()
+
+    return DuplexStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.get("/meters/{meter_id}/window")
+def meter_window(meter_id: str):
+    """The readings currently in a meter's sliding window (oldest first) and its rolling features."""
+    readings = meter_windows.snapshot(meter_id)
+    if readings is None: raise HTTPException(status_code=404, detail="Unknown meter (or evicted).")
+    mean = readings.mean(axis=0); std = readings.std(axis=0)
+    return {"meter_id": meter_id, "n": len(readings), "readings": readings.round(4).tolist(),
+            "mean": dict(zip(SENSOR_KEYS, mean.round(4).tolist())), "std": dict(zip(SENSOR_KEYS, std.round(4).tolist()))}
+
+@app.get("/status")
+def live_status(since: Optional[int] = None, limit: int = 500):
+    """Newest reading, or every reading after sequence number `since` (oldest first)."""
+    if since is None:
+        latest = live_ring.latest()
+        readings = [latest] if latest else []
+    else:
+        readings = live_ring.since(since, limit=max(1, min(limit, STATUS_RING_SIZE)))
+    missed = since is not None and since + 1 < live_ring.first_seq
+    return {"last_seq": live_ring.last_seq, "missed": missed, "readings": readings}
+
+
+@app.get("/stream")
+async def stream_status(request: Request, since: Optional[int] = None):
+    """Server-Sent Events feed of every reading; resumes from `since` or the Last-Event-ID header."""
+    last_event_id = request.headers.get("last-event-id")
+    cursor = since if since is not None else int(last_event_id) if last_event_id and last_event_id.isdigit() else live_ring.last_seq
+
+    async def events():
+        nonlocal cursor
+        idle = 0.0
+        while not await request.is_disconnected():
+            entries = live_ring.since(cursor)
+            for entry in entries:
+                cursor = entry["seq"]
+                yield f"id: {cursor}\ndata: {json.dumps(entry)}\n\n"
+            if entries: idle = 0.0; continue
+            if idle >= STREAM_KEEPALIVE_INTERVAL: idle = 0.0; yield ": keep-alive\n\n"
+            await asyncio.sleep(STREAM_POLL_INTERVAL); idle += STREAM_POLL_INTERVAL
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.get("/feedback")
+@instrumented("feedback")
 def handle_email_feedback(id: str, response: str):
     if response not in ["normal", "theft"]: raise HTTPException(status_code=400, detail="Invalid response.")
-    data_file = f"{id}.json";
-    if not os.path.exists(data_file): raise HTTPException(status_code=404, detail="Data ID not found.")
+    case = case_store.resolve(id, response)
+    if case is None:
+        existing = case_store.get(id)
+        if existing is None or existing["status"] == "open":  # expired, not yet swept
+            raise HTTPException(status_code=404, detail="Data ID not found.")
+        raise HTTPException(status_code=409, detail="Feedback for this anomaly was already recorded.")
 
     try:
-        with open(data_file, "r") as f: data_payload_with_cause = json.load(f)
+        data_payload_with_cause = {**case["payload"], "meter_id": case["meter_id"]}
         data_payload = {k: v for k, v in data_payload_with_cause.items() if k != 'suggested_cause'}
-        log_user_feedback(data_payload_with_cause, response) 
+        log_user_feedback(data_payload_with_cause, response, source="email")
+        FEEDBACK.inc("email", response)
 
         if response == "theft":
             print("--- ⚖️ EMAIL CONFIRMED THEFT - Triggering Web3/Follow-up ---")
             dummy_result = {"timestamp": time.time(), "payload": data_payload_with_cause, "anomaly_score": "N/A (Email Confirmed)"}
-            public_hash, timestamp = add_to_ledger(dummy_result)
-            if public_hash: post_to_public_ledger(public_hash, timestamp)
+            dispatcher.submit("ledger", record_confirmed_theft, dummy_result, f"case:{id}")
             follow_up_subject = "ACTION REQUIRED: Gridlock AI Theft/Fault Confirmed"
             follow_up_body = f"""
 Dear User, You confirmed the anomaly was NOT you.
@@ -240,7 +723,6 @@ RECOMMENDATION: Contact electrician. Evidence secured.
 """
             send_real_email(follow_up_subject, follow_up_body, RECEIVER_EMAIL)
 
-        os.remove(data_file)
         return {"status": "success", "message": f"Feedback '{response}' logged. Close tab."}
     except Exception as e:
         error_message = f"Error processing feedback: {id}: {str(e)}"; print(f"--- 💥 ERROR: {error_message} ---")
@@ -252,26 +734,134 @@ async def handle_dashboard_feedback(feedback: FeedbackData):
      try:
         data_payload = feedback.data 
         response_type = feedback.response
-        log_user_feedback(data_payload, response_type) 
+        if not feedback.logged: log_user_feedback(data_payload, response_type, source="dashboard")
+        FEEDBACK.inc("dashboard", response_type)
         if response_type == "theft":
             print("--- ⚖️ DASHBOARD CONFIRMED THEFT - Triggering Web3 ---")
             dummy_result = {"timestamp": time.time(), "payload": data_payload, "anomaly_score": "N/A (Dashboard Confirmed)"}
-            public_hash, timestamp = add_to_ledger(dummy_result)
-            if public_hash: post_to_public_ledger(public_hash, timestamp)
+            dispatcher.submit("ledger", record_confirmed_theft, dummy_result, f"dashboard:{uuid.uuid4().hex}")
 
         return {"status": "success", "message": "Feedback logged."}
 
      except Exception as e: raise HTTPException(status_code=500, detail=f"Error processing feedback: {e}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Counters, stage/endpoint latency histograms and gauges in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/slow_requests")
+def slow_requests():
+    """Sampled stacks of recent requests slower than SLOW_REQUEST_THRESHOLD (needs SLOW_REQUEST_PROFILING)."""
+    return {"enabled": profiler.enabled, "threshold_s": profiler.threshold, "requests": list(profiler.captured)}
+
+@app.get("/cases")
+def list_cases(status: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               meter_id: Optional[str] = None, limit: int = 100):
+    """Anomaly cases, newest first; `since`/`until` are Unix timestamps on the creation time."""
+    if status is not None and status not in ("open", "normal", "theft"):
+        raise HTTPException(status_code=400, detail="status must be one of open, normal, theft.")
+    limit = max(1, min(limit, 1000))
+    cases = case_store.query(status=status, since=since, until=until, meter_id=meter_id, limit=limit)
+    return {"count": len(cases), "cases": cases}
+
+@app.get("/cases/{case_id}")
+def get_case(case_id: str):
+    case = case_store.get(case_id)
+    if case is None: raise HTTPException(status_code=404, detail="Unknown case.")
+    return case
+
+@app.get("/ledger/entries")
+def list_ledger_entries(before: Optional[int] = None, limit: int = 50, since: Optional[float] = None,
+                        until: Optional[float] = None, suggested_cause: Optional[str] = None):
+    """Ledger entries newest first; pass `next_cursor` back as `before` for the next page. `since`/`until` are Unix timestamps."""
+    entries, next_cursor = ledger_page(before=before, limit=max(1, min(limit, MAX_PAGE_SIZE)), since=since, until=until,
+                                       suggested_cause=suggested_cause)
+    return {"count": len(entries), "next_cursor": next_cursor, "entries": entries}
+
+@app.get("/feedback/entries")
+def list_feedback_entries(before: Optional[int] = None, limit: int = 50, since: Optional[float] = None, until: Optional[float] = None,
+                          label: Optional[int] = None, suggested_cause: Optional[str] = None, source: Optional[str] = None):
+    """Feedback rows newest first; pass `next_cursor` back as `before` for the next page. `since`/`until` are Unix timestamps."""
+    if label is not None and label not in (0, 1): raise HTTPException(status_code=400, detail="label must be 0 (normal) or 1 (theft).")
+    if source is not None and source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(SOURCES)}.")
+    records, next_cursor = feedback_store.page(before=before, limit=max(1, min(limit, MAX_PAGE_SIZE)), since=since, until=until,
+                                               label=label, suggested_cause=suggested_cause, source=source)
+    return {"count": len(records), "next_cursor": next_cursor, "entries": to_dicts(records)}
+
+@app.get("/outbound")
+def outbound_status():
+    """Queue depth, outcome counters and end-to-end latency of the outbound dispatcher, plus alert aggregation counters."""
+    return {**dispatcher.stats(), "alerts": alert_aggregator.stats()}
+
 @app.post("/retrain")
-async def trigger_retraining(background_tasks: BackgroundTasks):
-    """Triggers the AI retraining process in the background."""
+def trigger_retraining(mode: str = "auto"):
+    """Starts a retraining job in a separate process (or joins the one already queued/running)."""
+    if mode not in ("auto", "full", "incremental"): raise HTTPException(status_code=400, detail="Invalid mode.")
     print("--- Received request to retrain AI model. ---")
-    background_tasks.add_task(perform_retraining)
-    return {"status": "success", "message": "AI retraining process started in the background."}
+    job, coalesced = retrain_jobs.submit(mode)
+    message = f"Joined retraining job {job['job_id']} ({job['status']})." if coalesced else f"AI retraining job {job['job_id']} started."
+    return {"status": "success", "message": message, "job_id": job["job_id"], "coalesced": coalesced}
+
+@app.get("/retrain")
+def list_retraining_jobs():
+    return {"jobs": retrain_jobs.list()}
+
+@app.get("/retrain/{job_id}")
+def retraining_job_status(job_id: str):
+    """Status, stage/progress, timings and resulting metrics of a retraining job."""
+    job = retrain_jobs.get(job_id)
+    if job is None: raise HTTPException(status_code=404, detail="Unknown job ID.")
+    return job
+
+@app.post("/retrain/{job_id}/cancel")
+def cancel_retraining_job(job_id: str):
+    job = retrain_jobs.cancel(job_id)
+    if job is None:
+        if retrain_jobs.get(job_id) is not None: raise HTTPException(status_code=409, detail="The job belongs to another worker process.")
+        raise HTTPException(status_code=404, detail="Unknown job ID.")
+    return job
+
+@app.get("/models")
+def list_models():
+    """Published model versions (oldest first) and the one currently serving."""
+    versions = [{k: v for k, v in meta.items() if k != "retrain_state"} for meta in registry.versions()]
+    return {"active": bundle.version if bundle else None, "versions": versions}
+
+@app.get("/models/{version}/compaction")
+def model_compaction(version: str):
+    """Size, latency and accuracy of the version's full forest and of the compaction candidates."""
+    if not registry.exists(version): raise HTTPException(status_code=404, detail="Unknown model version.")
+    report = registry.compaction_report(version)
+    if report is None: raise HTTPException(status_code=404, detail="This version has no compacted forest.")
+    return {"version": version, "serving_compact": SERVE_COMPACT_MODEL, **report}
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str):
+    """Rolls back (or forward) to a published version. Predictions keep being served by the
+    current version while the requested one is loaded and compiled."""
+    if not registry.exists(version): raise HTTPException(status_code=404, detail="Unknown model version.")
+    previous = bundle.version if bundle else None
+    try:
+        activate_version(version)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load {version}: {e}")
+    return {"status": "success", "active": version, "previous": previous}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GRIDLOCK AI API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="worker processes (default: $GRIDLOCK_WORKERS or 1)")
+    args = parser.parse_args()
     if not models_loaded: print("--- 💥 SERVER CANNOT START: Model/Scaler failed initial load. ---")
+    elif args.workers > 1:
+        # The registry is bootstrapped (above, at import) before the workers start, so they only load it.
+        print(f"--- Server starting with {args.workers} workers... ---")
+        os.environ["GRIDLOCK_WORKERS"] = str(args.workers)
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)), timeout_graceful_shutdown=SHUTDOWN_GRACE)
     else:
         print("--- Server starting... ---")
-        uvicorn.run(app, host="127.0.0.1", port=8000)
+        uvicorn.run(app, host=args.host, port=args.port, timeout_graceful_shutdown=SHUTDOWN_GRACE)
@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+N_FEATURES = 4
+
+
+class MeterWindowStore:
+    """
+    Sliding window of the last `window` readings per meter, for up to `capacity` meters.
+    All state lives in preallocated arrays indexed by a slot per meter (allocated zeroed, so pages
+    are only touched as meters show up, and slots are handed out in order, so building an empty
+    store costs nothing per slot); the least recently seen meter gives up its slot when a
+    new one arrives and the store is full. Running sums make mean/std/delta O(1) per reading; they
+    are recomputed from the buffer each time a meter's ring wraps, so rounding error can't build up.
+    """
+
+    def __init__(self, capacity=1_000_000, window=16):
+        self.capacity = capacity; self.window = window
+        self._buffer = np.zeros((capacity, window, N_FEATURES), dtype=np.float32)
+        self._sum = np.zeros((capacity, N_FEATURES)); self._sumsq = np.zeros((capacity, N_FEATURES))
+        self._last = np.zeros((capacity, N_FEATURES), dtype=np.float32)
+        self._count = np.zeros(capacity, dtype=np.int32); self._head = np.zeros(capacity, dtype=np.int32)
+        self._slots = OrderedDict()   # meter_id -> slot, least recently seen first
+        self._used = 0   # slots [0, _used) have been handed out; eviction reuses them once all have
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self): return len(self._slots)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self._buffer, self._sum, self._sumsq, self._last, self._count, self._head))
+
+    def _slot(self, meter_id):
+        slot = self._slots.get(meter_id)
+        if slot is not None:
+            self._slots.move_to_end(meter_id); return slot
+        if self._used < self.capacity: slot = self._used; self._used += 1
+        else:
+            _, slot = self._slots.popitem(last=False); self.evictions += 1
+            self._sum[slot] = 0.0; self._sumsq[slot] = 0.0; self._count[slot] = 0; self._head[slot] = 0
+        self._slots[meter_id] = slot
+        return slot
+
+    def _push(self, slot, x):
+        """Adds one reading (float32 row) to a slot's ring; returns the delta to the previous reading."""
+        count = self._count[slot]; head = self._head[slot]
+        delta = x - self._last[slot] if count else np.zeros(N_FEATURES, dtype=np.float32)
+        x64 = x.astype(np.float64)
+        if count == self.window:
+            old = self._buffer[slot, head].astype(np.float64)
+            self._sum[slot] -= old; self._sumsq[slot] -= old * old
+        else:
+            self._count[slot] = count + 1
+        self._buffer[slot, head] = x; self._last[slot] = x
+        self._sum[slot] += x64; self._sumsq[slot] += x64 * x64
+        head = (head + 1) % self.window; self._head[slot] = head
+        if head == 0:
+            values = self._buffer[slot].astype(np.float64)
+            self._sum[slot] = values.sum(axis=0); self._sumsq[slot] = (values * values).sum(axis=0)
+        return delta
+
+    def update_many(self, meter_ids, X):
+        """
+        Adds readings X (n, 4) for `meter_ids` in order and returns the window features as of each
+        reading: {"n": (n,), "mean": (n, 4), "std": (n, 4), "delta": (n, 4)}.
+        """
+        X = np.asarray(X, dtype=np.float32).reshape(-1, N_FEATURES)
+        n = len(X)
+        counts = np.empty(n, dtype=np.int32); sums = np.empty((n, N_FEATURES)); sumsqs = np.empty((n, N_FEATURES))
+        deltas = np.empty((n, N_FEATURES), dtype=np.float32)
+        with self._lock:
+            for k, (meter_id, x) in enumerate(zip(meter_ids, X)):
+                slot = self._slot(meter_id)
+                deltas[k] = self._push(slot, x)
+                counts[k] = self._count[slot]; sums[k] = self._sum[slot]; sumsqs[k] = self._sumsq[slot]
+        mean = sums / counts[:, None]
+        std = np.sqrt(np.maximum(sumsqs / counts[:, None] - mean * mean, 0.0))
+        return {"n": counts, "mean": mean, "std": std, "delta": deltas.astype(np.float64)}
+
+    def snapshot(self, meter_id):
+        """The readings currently in a meter's window, oldest first (None for an unknown meter)."""
+        with self._lock:
+            slot = self._slots.get(meter_id)
+            if slot is None: return None
+            count = int(self._count[slot]); head = int(self._head[slot])
+            order = [(head - count + k) % self.window for k in range(count)]
+            return self._buffer[slot, order].astype(np.float64)
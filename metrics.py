@@ -0,0 +1,221 @@
+import collections
+import contextlib
+import math
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+
+# Seconds; roughly x2.5 steps from 25us to 10s.
+LATENCY_BUCKETS = (0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Sharded:
+    """
+    Base for counters and histograms: every thread updates its own shard (a plain dict), so the
+    hot path takes no lock and cannot lose increments; a scrape merges the shards.
+    Label values are passed positionally, in the order of `labelnames`.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name; self.documentation = documentation; self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try: return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock: self._shards.append(shard)
+            return shard
+
+    def _snapshots(self):
+        with self._lock: shards = list(self._shards)
+        return [list(shard.items()) for shard in shards]
+
+    @property
+    def family(self): return self.name
+
+    def _labels(self, values, extra=()): return _format_labels(self.labelnames, values, extra)
+
+
+class Counter(_Sharded):
+    """Registered without the suffix; samples, HELP and TYPE all use the `<name>_total` family name."""
+    kind = "counter"
+
+    @property
+    def family(self): return f"{self.name}_total"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self):
+        totals = collections.defaultdict(float)
+        for items in self._snapshots():
+            for labels, value in items: totals[labels] += value
+        return dict(totals)
+
+    def render(self):
+        return [f"{self.family}{self._labels(labels)} {_number(value)}" for labels, value in sorted(self.values().items())]
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None: counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1  # last slot before the sum is +Inf
+        counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try: yield
+        finally: self.observe(time.perf_counter() - start, *labels)
+
+    def values(self):
+        merged = {}
+        for items in self._snapshots():
+            for labels, counts in items:
+                counts = list(counts)
+                total = merged.get(labels)
+                merged[labels] = counts if total is None else [a + b for a, b in zip(total, counts)]
+        return merged
+
+    def render(self):
+        lines = []
+        for labels, counts in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(labels, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read at scrape time: `fn()` returns a number, or {label tuple: number} when there are labels."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.name = name; self.documentation = documentation; self.fn = fn; self.labelnames = tuple(labelnames)
+
+    @property
+    def family(self): return self.name
+
+    def render(self):
+        try: value = self.fn()
+        except Exception: return []
+        if value is None: return []
+        if not self.labelnames: return [f"{self.name} {_number(value)}"]
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_number(v)}" for labels, v in sorted(value.items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric); return metric
+
+    def counter(self, name, documentation, labelnames=()): return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, fn, labelnames=()): return self.register(Gauge(name, documentation, fn, labelnames))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.family} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.family} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class SlowRequestProfiler:
+    """
+    Optional sampling profiler for slow requests. Tracked requests only register their thread
+    (two dict operations); a background thread samples the stacks of those that have been running
+    longer than `threshold` seconds every `interval` seconds. Requests that end up slower than the
+    threshold keep their collapsed stacks (most frequent first) in a bounded list.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.005, keep=50, max_depth=40):
+        self.threshold = threshold; self.interval = interval; self.max_depth = max_depth
+        self.enabled = False
+        self.captured = collections.deque(maxlen=keep)
+        self._active = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None: return
+        self.enabled = True; self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.enabled = False; self._stop.set()
+        if self._thread is not None: self._thread.join(5); self._thread = None
+
+    def begin(self, name):
+        """Registers the calling thread as serving `name`; returns a token for end() (None when disabled)."""
+        if not self.enabled: return None
+        entry = {"ident": threading.get_ident(), "name": name, "start": time.perf_counter(), "samples": collections.Counter()}
+        self._active[entry["ident"]] = entry
+        return entry
+
+    def end(self, entry):
+        if entry is None: return
+        self._active.pop(entry["ident"], None)
+        duration = time.perf_counter() - entry["start"]
+        if duration >= self.threshold:
+            self.captured.append({"request": entry["name"], "duration_ms": round(duration * 1000, 2), "finished_at": time.time(),
+                                  "samples": sum(entry["samples"].values()),
+                                  "stacks": [{"stack": stack, "samples": n} for stack, n in entry["samples"].most_common(10)]})
+
+    @contextlib.contextmanager
+    def track(self, name):
+        entry = self.begin(name)
+        try: yield
+        finally: self.end(entry)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._active: continue
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for ident, entry in list(self._active.items()):
+                frame = frames.get(ident)
+                if frame is None or now - entry["start"] < self.threshold: continue
+                stack = traceback.extract_stack(frame, limit=self.max_depth)
+                entry["samples"][";".join(f"{f.name} ({f.filename.rsplit('/', 1)[-1]}:{f.lineno})" for f in stack)] += 1
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _escape(value): return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _escape_help(text): return str(text).replace("\\", "\\\\").replace("\n", "\\n")
+
+def _number(value):
+    if value == math.inf: return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15: return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
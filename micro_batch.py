@@ -0,0 +1,48 @@
+import asyncio
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Groups readings submitted within `window` seconds of each other (up to `max_batch`) into one
+    `process(rows, keys)` call, run in a worker thread so the event loop keeps receiving. `process`
+    gets an (n, 4) array plus the keys given to submit() and returns one result per row. Batches are
+    processed one after another, in submission order, so results come back in the order readings arrived.
+    """
+
+    def __init__(self, process, window=0.002, max_batch=512, observe_batch=None):
+        self.process = process; self.window = window; self.max_batch = max_batch
+        self.observe_batch = observe_batch  # optional callback, gets the size of every batch
+        self._loop = None; self._pending = []; self._timer = None; self._previous = None
+
+    def submit(self, row, key=None):
+        """Queues one [voltage, current, power, power_factor] row (and an optional key, e.g. the meter
+        ID); returns a future for its result."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new event loop (server restart, test client): nothing from the old one carries over.
+            self._loop = loop; self._pending = []; self._timer = None; self._previous = None
+        future = loop.create_future()
+        self._pending.append((row, key, future))
+        if len(self._pending) >= self.max_batch: self._flush()
+        elif self._timer is None: self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None: self._timer.cancel(); self._timer = None
+        batch, self._pending = self._pending, []
+        if batch: self._previous = asyncio.ensure_future(self._run(batch, self._previous))
+
+    async def _run(self, batch, previous):
+        if previous is not None: await previous
+        if self.observe_batch: self.observe_batch(len(batch))
+        try:
+            rows = np.array([row for row, _, _ in batch], dtype=np.float64)
+            results = await asyncio.to_thread(self.process, rows, [key for _, key, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done(): future.set_exception(e)
+            return
+        for (_, _, future), result in zip(batch, results):
+            if not future.done(): future.set_result(result)
@@ -0,0 +1,274 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from inference import CompiledForest
+
+MODEL_FILE = "model.pkl"
+SCALER_FILE = "scaler.pkl"
+FOREST_FILE = "forest.npz"   # compiled node arrays; all the serving path needs
+COMPACT_FOREST_FILE = "forest_compact.npz"  # optional pruned/depth-limited forest (see compaction.py)
+COMPACTION_FILE = "compaction.json"         # its size/latency/accuracy report
+META_FILE = "meta.json"
+ACTIVE_FILE = "ACTIVE"
+LOADED_FILE = "LOADED"  # touched by every load(); its mtime tells prune() which versions a process may still be opening
+MAX_VERSIONS = 20
+PRUNE_GRACE = 60.0      # seconds after its last load() during which a version is never pruned
+# Batches from this size are scored by sklearn, which beats the NumPy forest on large batches. bench_inference.py
+# prints the crossover; for the 100-tree model it has measured 700-1000 rows depending on the machine, and the
+# cutover sits at the top of that range so that no mid-size batch gets slower.
+SKLEARN_BATCH_ROWS = 1000
+
+
+class ModelBundle:
+    """
+    One immutable model version: model, scaler and their compiled form, always swapped together.
+    Serving scores through predict_proba(); the sklearn objects are unpickled by `loader` on first access.
+    `compact` marks an engine that is the version's compacted forest rather than the model itself.
+    """
+
+    def __init__(self, version, model, scaler, engine, meta, loader=None, compact=False):
+        self.version = version; self.engine = engine; self.meta = meta; self.compact = compact
+        self._model = model; self._scaler = scaler; self._loader = loader
+        self._lock = threading.Lock(); self._warming = None
+
+    def _load_sklearn(self):
+        with self._lock:
+            if self._model is None and self._loader is not None: self._model, self._scaler = self._loader()
+        return self._model, self._scaler
+
+    @property
+    def model(self): return self._load_sklearn()[0]
+
+    @property
+    def scaler(self): return self._load_sklearn()[1]
+
+    def predict_proba(self, X):
+        """
+        The engine's probabilities. Batches of SKLEARN_BATCH_ROWS or more go to the sklearn model, which
+        gives the same numbers bit for bit and is faster there; until it has been unpickled (in the
+        background, on the first large batch) they stay on the engine. A compacted engine is a different
+        model, so it always scores its own batches.
+        """
+        if len(X) >= SKLEARN_BATCH_ROWS and not self.compact:
+            model, scaler = self._model, self._scaler
+            if model is not None and scaler is not None: return model.predict_proba(scaler.transform(X))
+            self._warm_sklearn()
+        return self.engine.predict_proba(X)
+
+    def _warm_sklearn(self):
+        with self._lock:
+            if self._warming is not None or self._loader is None: return
+            self._warming = threading.Thread(target=self._warm, name=f"load-{self.version}", daemon=True)
+        self._warming.start()
+
+    def _warm(self):
+        try: self._load_sklearn()
+        except Exception as e: print(f"--- ⚠️ WARNING: Could not load sklearn model {self.version}; large batches stay on the compiled forest: {e} ---")
+
+
+def _joblib():
+    import joblib  # unpickling the sklearn objects imports sklearn; keep it off the startup path
+    return joblib
+
+
+class ModelRegistry:
+    """
+    Versioned model artifacts under `root`:
+        root/v0001/{model.pkl, scaler.pkl, forest.npz, meta.json}  [+ forest_compact.npz, compaction.json]
+        root/ACTIVE   <- name of the active version, replaced atomically
+    Versions are never modified after they are published, so activating an older one is a rollback;
+    the only later additions are derived artifacts (a compiled or compacted forest), never the model,
+    and the LOADED stamp. Versions are numbered, and listed in numeric order.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, version, name=""): return os.path.join(self.root, version, name)
+
+    def _numbered(self): return [d for d in os.listdir(self.root) if d.startswith("v") and d[1:].isdigit()]
+
+    def versions(self):
+        names = sorted((d for d in self._numbered() if os.path.exists(self.path(d, META_FILE))), key=lambda d: int(d[1:]))
+        return [self.meta(v) for v in names]
+
+    def meta(self, version):
+        with open(self.path(version, META_FILE), "r") as f: return json.load(f)
+
+    def exists(self, version): return os.path.exists(self.path(version, META_FILE))
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE), "r") as f: version = f.read().strip()
+            return version if self.exists(version) else None
+        except FileNotFoundError: return None
+
+    def _next_version(self):
+        return f"v{max((int(d[1:]) for d in self._numbered()), default=0) + 1:04d}"
+
+    def publish(self, meta, model=None, scaler=None, model_file=None, scaler_file=None, engine=None, forest_file=None,
+                compact=None, compact_file=None, compaction_report=None):
+        """
+        Stores a new version from in-memory objects or from finished artifact files (moved, not copied).
+        The compiled forest is optional here; load() builds it on first use if it is missing.
+        A compacted forest (`compact` or `compact_file`) is stored with its report when given.
+        The meta file is written last, so a half-written version is never listed.
+        """
+        with self._lock:
+            while True:
+                version = self._next_version()
+                # mkdir is the claim: another process publishing at the same moment gets the next number.
+                try: os.makedirs(self.path(version)); break
+                except FileExistsError: continue
+        if model_file: os.replace(model_file, self.path(version, MODEL_FILE))
+        else: _joblib().dump(model, self.path(version, MODEL_FILE))
+        if scaler_file: os.replace(scaler_file, self.path(version, SCALER_FILE))
+        else: _joblib().dump(scaler, self.path(version, SCALER_FILE))
+        if forest_file: os.replace(forest_file, self.path(version, FOREST_FILE))
+        elif engine is not None: engine.save(self.path(version, FOREST_FILE))
+        if compaction_report is not None:
+            if compact is not None or compact_file: self._write_compact(version, compact, compact_file, compaction_report)
+            meta = {**meta, "compaction": compaction_summary(compaction_report)}
+        meta = {**meta, "version": version, "created_at": meta.get("created_at", time.time())}
+        tmp_path = self.path(version, META_FILE + ".tmp")
+        with open(tmp_path, "w") as f: json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self.path(version, META_FILE))
+        return version
+
+    def _write_compact(self, version, compact, compact_file, report):
+        """Report first, forest last: a version with forest_compact.npz always has its report."""
+        self._write_json(self.path(version, COMPACTION_FILE), report)
+        forest_path = self.path(version, COMPACT_FOREST_FILE)
+        if compact_file: os.replace(compact_file, forest_path); return
+        tmp_path = f"{forest_path}.{os.getpid()}.tmp"
+        compact.save(tmp_path); os.replace(tmp_path, forest_path)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f: json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def attach_compact(self, version, compact, report):
+        """Adds (or replaces) the compacted forest of an already published version, and its summary in meta.json."""
+        if not self.exists(version): raise KeyError(version)
+        self._write_compact(version, compact, None, report)
+        self._write_json(self.path(version, META_FILE), {**self.meta(version), "compaction": compaction_summary(report)})
+
+    def compaction_report(self, version):
+        try:
+            with open(self.path(version, COMPACTION_FILE), "r") as f: return json.load(f)
+        except FileNotFoundError: return None
+
+    def load_sklearn(self, version):
+        joblib = _joblib()
+        return joblib.load(self.path(version, MODEL_FILE)), joblib.load(self.path(version, SCALER_FILE))
+
+    def load(self, version, compact=False):
+        """
+        Memory-maps the version's compiled forest; versions published without one are compiled once here.
+        With compact=True the bundle serves the version's compacted forest instead, if it has one.
+        The version's LOADED stamp is touched first, so prune() leaves it alone while it is being opened.
+        """
+        self._stamp_loaded(version)
+        compact_path = self.path(version, COMPACT_FOREST_FILE)
+        if compact and os.path.exists(compact_path):
+            return ModelBundle(version, None, None, CompiledForest.load(compact_path), self.meta(version),
+                               loader=lambda: self.load_sklearn(version), compact=True)
+        forest_path = self.path(version, FOREST_FILE)
+        if not os.path.exists(forest_path):
+            model, scaler = self.load_sklearn(version)
+            engine = CompiledForest.from_sklearn(model, scaler)
+            tmp_path = f"{forest_path}.{os.getpid()}.tmp"
+            engine.save(tmp_path); os.replace(tmp_path, forest_path)
+            return ModelBundle(version, model, scaler, CompiledForest.load(forest_path), self.meta(version))
+        return ModelBundle(version, None, None, CompiledForest.load(forest_path), self.meta(version),
+                           loader=lambda: self.load_sklearn(version))
+
+    def _stamp_loaded(self, version):
+        try:
+            with open(self.path(version, LOADED_FILE), "a"): pass
+            os.utime(self.path(version, LOADED_FILE))
+        except OSError: pass  # missing or read-only version: load() reports it
+
+    def _loaded_since(self, version, since):
+        try: return os.stat(self.path(version, LOADED_FILE)).st_mtime >= since
+        except FileNotFoundError: return False
+
+    def set_active(self, version):
+        if not self.exists(version): raise KeyError(version)
+        tmp_path = os.path.join(self.root, f"{ACTIVE_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f: f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    def prune(self, keep=MAX_VERSIONS, grace=PRUNE_GRACE):
+        """
+        Deletes the oldest versions beyond `keep`, never the active one nor one loaded in the last `grace`
+        seconds: another worker may be activating it (its files are opened after it was chosen) or still
+        read its sklearn files lazily. Spared versions go in a later prune.
+        """
+        active = self.active_version(); since = time.time() - grace
+        names = [m["version"] for m in self.versions()]
+        for version in names[:max(0, len(names) - keep)]:
+            if version != active and not self._loaded_since(version, since): shutil.rmtree(self.path(version), ignore_errors=True)
+
+    def bootstrap(self, model_path, scaler_path):
+        """Imports the pre-registry model files as the first version when the registry is empty."""
+        if self.versions() or not (os.path.exists(model_path) and os.path.exists(scaler_path)): return None
+        model_tmp = os.path.join(self.root, "bootstrap.model.tmp"); scaler_tmp = os.path.join(self.root, "bootstrap.scaler.tmp")
+        shutil.copyfile(model_path, model_tmp); shutil.copyfile(scaler_path, scaler_tmp)
+        version = self.publish({"source": "legacy", "mode": None, "training_rows": None},
+                               model_file=model_tmp, scaler_file=scaler_tmp)
+        self.set_active(version)
+        print(f"--- ✅ Imported {model_path} into the model registry as {version} ---")
+        return version
+
+
+def compaction_summary(report):
+    """The few numbers of a compaction report kept in meta.json (the full report is compaction.json)."""
+    if "error" in report: return {"error": report["error"]}
+    chosen = report["chosen"]
+    return {"trees": chosen["trees"], "max_depth": chosen["max_depth"], "nodes": chosen["nodes"], "latency_us": chosen["latency_us"],
+            "auc_loss": chosen["auc_loss"], "f1_loss": chosen["f1_loss"], "speedup": report["speedup"], "target_met": report["target_met"]}
+
+
+class ActiveVersionWatcher:
+    """
+    Polls the registry's ACTIVE pointer and calls `on_change(version)` when it names a version other
+    than `current()`. Lets every worker process of a multi-worker server follow activations and
+    retrains done by any of them; the forest files are memory-mapped, so all workers share one copy
+    of each version in the page cache.
+    """
+
+    def __init__(self, registry, current, on_change, interval=1.0):
+        self.registry = registry; self.current = current; self.on_change = on_change; self.interval = interval
+        self._stop = threading.Event(); self._thread = None; self._stamp = None
+
+    def check(self):
+        try: stat = os.stat(os.path.join(self.registry.root, ACTIVE_FILE))
+        except FileNotFoundError: return
+        stamp = (stat.st_mtime_ns, stat.st_ino)
+        if stamp == self._stamp: return
+        version = self.registry.active_version()
+        if version is not None and version != self.current(): self.on_change(version)
+        self._stamp = stamp
+
+    def start(self):
+        if self._thread is not None or self.interval <= 0: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="active-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None: return
+        self._stop.set(); self._thread.join(); self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try: self.check()
+            except Exception as e: print(f"--- 💥 ERROR: Could not follow the active model version: {e} ---")
@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    Memoises model scores for readings quantised to a sensor resolution.
+
+    Feature j of a reading is rounded to the nearest multiple of resolution[j], and a miss scores
+    that rounded reading (the bucket centre), so every reading in a bucket gets exactly the score of
+    its centre whether it was cached or not. Error bound: the score returned for x is the model's
+    score for an x' with |x'_j - x_j| <= resolution[j] / 2 on every feature. A tree ensemble is
+    piecewise constant, so the score is exact unless a split threshold falls between x_j and x'_j.
+    With the resolution equal to the meters' own reporting resolution the error is zero: a reading
+    already on the grid is its own bucket centre (n / 10**k, the same float its decimal text parses to).
+
+    Entries belong to the model version they were computed with: the first lookup under another
+    version drops them all. At most `capacity` entries are kept, least recently used evicted first.
+    """
+
+    def __init__(self, capacity, resolution):
+        self.capacity = capacity
+        self.resolution = np.asarray(resolution, dtype=np.float64)
+        self._steps = 1.0 / self.resolution  # 10, 100, ... exactly for decimal resolutions
+        self.version = None
+        self._entries = OrderedDict()  # quantised row bytes -> score, least recently used first
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def quantize(self, X):
+        """Bucket centres of the rows of X (adding 0.0 turns -0.0 into 0.0, so equal buckets have equal bytes)."""
+        return np.ascontiguousarray(np.rint(np.asarray(X, dtype=np.float64) * self._steps) / self._steps + 0.0)
+
+    def score(self, X, version, compute):
+        """Scores of the rows of X under model `version`; misses are scored by compute(centres) in one call."""
+        centres = self.quantize(X)
+        keys = centres.view(np.dtype((np.void, centres.itemsize * centres.shape[1]))).ravel().tolist()
+        scores = np.empty(len(keys)); missing = {}  # key -> rows of X in that bucket
+        with self._lock:
+            if version != self.version:
+                if self._entries: self.counters["invalidations"] += 1
+                self._entries.clear(); self.version = version
+            for k, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None: missing.setdefault(key, []).append(k); continue
+                self._entries.move_to_end(key); scores[k] = value
+            # Readings sharing a bucket with an earlier miss in the same batch count as hits.
+            self.counters["misses"] += len(missing); self.counters["hits"] += len(keys) - len(missing)
+        if not missing: return scores
+        computed = np.asarray(compute(centres[[rows[0] for rows in missing.values()]]), dtype=np.float64)
+        for rows, value in zip(missing.values(), computed): scores[rows] = value
+        with self._lock:
+            if version != self.version: return scores  # the model changed meanwhile: don't cache stale scores
+            for key, value in zip(missing, computed.tolist()): self._entries[key] = value
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False); self.counters["evictions"] += 1
+        return scores
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+    def __len__(self): return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {"entries": len(self._entries), "capacity": self.capacity, "version": self.version,
+                    "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None, **self.counters}
@@ -0,0 +1,271 @@
+import contextlib
+import glob
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+try: import fcntl
+except ImportError: fcntl = None
+
+# Fraction of the job done when each stage starts (fits don't report finer progress).
+STAGES = {"queued": 0.0, "starting": 0.05, "loading": 0.1, "fitting": 0.2, "saving": 0.85, "compacting": 0.9, "installing": 0.95, "done": 1.0}
+ACTIVE = ("queued", "running")
+HISTORY_SIZE = 50
+
+
+def _temp_paths(spec):
+    return tuple(os.path.join(spec["work_dir"], f"job_{spec['job_id']}.{kind}.tmp") for kind in ("model", "scaler", "forest", "compact"))
+
+def _child_main(spec):
+    """Runs in the training process: fit, dump artifacts to temp files, report back as JSON lines on stdout."""
+    def emit(kind, payload): print(json.dumps([kind, payload]), flush=True)
+    try:
+        emit("stage", "loading")
+        import joblib
+        import retraining
+        from inference import CompiledForest
+        model = scaler = None
+        if spec["mode"] != "full" and os.path.exists(spec["model_path"]) and os.path.exists(spec["scaler_path"]):
+            model = joblib.load(spec["model_path"]); scaler = joblib.load(spec["scaler_path"])
+
+        emit("stage", "fitting")
+        with contextlib.redirect_stdout(sys.stderr):
+            outcome = retraining.retrain(model, scaler, spec["dataset_path"], spec["feedback_path"],
+                                         mode=spec["mode"], state=spec.get("state"), n_jobs=spec["n_jobs"],
+                                         holdout=spec.get("compaction") is not None)
+        if outcome is None:
+            emit("result", {"skipped": True}); return
+        new_model, new_scaler, info, new_state = outcome
+
+        emit("stage", "saving")
+        model_tmp, scaler_tmp, forest_tmp, compact_tmp = _temp_paths(spec)
+        joblib.dump(new_model, model_tmp); joblib.dump(new_scaler, scaler_tmp)
+        engine = CompiledForest.from_sklearn(new_model, new_scaler); engine.save(forest_tmp)
+
+        report = None
+        if spec.get("compaction") is not None:
+            emit("stage", "compacting")
+            import compaction
+            compact, report = compaction.try_compact(engine, spec["dataset_path"], **spec["compaction"])
+            if compact is not None: compact.save(compact_tmp)
+        emit("result", {"skipped": False, "model_tmp": model_tmp, "scaler_tmp": scaler_tmp, "forest_tmp": forest_tmp,
+                        "compact_tmp": compact_tmp if os.path.exists(compact_tmp) else None, "compaction": report,
+                        "info": info, "state": new_state,
+                        "parent": spec.get("parent")})
+    except Exception as e:
+        emit("error", f"{type(e).__name__}: {e}")
+
+
+class RetrainJobManager:
+    """
+    Runs retraining fits one at a time in a separate process (sklearn n_jobs spread over cores),
+    so they never compete with /predict for the GIL. Requests that arrive while a job is queued
+    or running are coalesced into it; at most one more job waits behind the running one.
+    `job_spec()` is called when a job starts and returns model_path, scaler_path, state (the
+    model to build on), dataset_path, feedback_path and work_dir (where temp artifacts go).
+    `install(result)` is called in this process only when a job succeeds.
+
+    With several server processes, pass `lock_path` (jobs of all processes then run one at a time,
+    each taking its spec only once the previous one is installed) and `record_dir` (every job is
+    also written there as <job_id>.json, so any process can report on it).
+    """
+
+    def __init__(self, install, job_spec, n_jobs=-1, on_finish=None, lock_path=None, record_dir=None):
+        self.install = install
+        self.lock_path = lock_path; self.record_dir = record_dir
+        if record_dir: os.makedirs(record_dir, exist_ok=True)
+        self.on_finish = on_finish  # optional callback, gets each job once it reaches a final status
+        self.job_spec = job_spec
+        self.n_jobs = n_jobs
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = None; self._pending = None
+        self._process = None
+
+    def submit(self, mode="auto"):
+        """Returns (job, coalesced)."""
+        with self._lock:
+            for job_id in (self._pending, self._running):
+                job = self.jobs.get(job_id)
+                # A queued/running full refit already covers any request; otherwise the mode must match.
+                if job and job["status"] in ACTIVE and (job["mode"] == mode or job["mode"] == "full"):
+                    job["coalesced_requests"] += 1
+                    return job, True
+            pending = self.jobs.get(self._pending)
+            if pending and pending["status"] == "queued":
+                # Upgrade the waiting job instead of queueing a second one.
+                if mode == "full": pending["mode"] = "full"
+                pending["coalesced_requests"] += 1
+                return pending, True
+
+            job = {"job_id": uuid.uuid4().hex[:12], "mode": mode, "status": "queued", "stage": "queued", "progress": 0.0,
+                   "coalesced_requests": 0, "error": None, "metrics": None,
+                   "timings": {"queued_at": time.time(), "started_at": None, "finished_at": None, "stages": {}}}
+            self.jobs[job["job_id"]] = job
+            self._record(job)
+            while len(self.jobs) > HISTORY_SIZE:
+                oldest = next(iter(self.jobs))
+                if self.jobs[oldest]["status"] in ACTIVE: break
+                self.jobs.pop(oldest)
+            if self._running is None:
+                self._start(job)
+            else:
+                self._pending = job["job_id"]
+            return job, False
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None or not self.record_dir or not job_id.isalnum(): return job
+        try:
+            with open(os.path.join(self.record_dir, f"{job_id}.json")) as f: return json.load(f)
+        except (OSError, ValueError): return None
+
+    def list(self):
+        if not self.record_dir: return list(reversed(self.jobs.values()))
+        jobs = []
+        for path in glob.glob(os.path.join(self.record_dir, "*.json")):
+            try:
+                with open(path) as f: jobs.append(json.load(f))
+            except (OSError, ValueError): continue
+        return sorted(jobs, key=lambda job: job["timings"]["queued_at"], reverse=True)[:HISTORY_SIZE]
+
+    def _record(self, job):
+        """Writes the job to record_dir (atomically) and drops the oldest finished records beyond HISTORY_SIZE."""
+        if not self.record_dir: return
+        path = os.path.join(self.record_dir, f"{job['job_id']}.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f: json.dump(job, f)
+            os.replace(tmp_path, path)
+            if job["status"] not in ACTIVE:
+                records = sorted(glob.glob(os.path.join(self.record_dir, "*.json")), key=os.path.getmtime)
+                for old in records[:max(0, len(records) - HISTORY_SIZE)]: os.remove(old)
+        except OSError as e: print(f"--- ⚠️ Could not record retraining job {job['job_id']}: {e} ---")
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["status"] not in ACTIVE: return job
+            if job["status"] == "queued":
+                self._finish(job, "cancelled")
+                if self._pending == job_id: self._pending = None
+                return job
+            job["cancel_requested"] = True
+            process = self._process
+        if process is not None and process.poll() is None: process.terminate()
+        return job
+
+    def _start(self, job):
+        self._running = job["job_id"]
+        job["status"] = "running"; job["timings"]["started_at"] = time.time()
+        self._set_stage(job, "starting")
+        threading.Thread(target=self._supervise, args=(job,), name=f"retrain-{job['job_id']}", daemon=True).start()
+
+    def _set_stage(self, job, stage):
+        job["stage"] = stage; job["progress"] = STAGES[stage]
+        job["timings"]["stages"][stage] = round(time.time() - job["timings"]["started_at"], 3)
+        self._record(job)
+
+    def _finish(self, job, status, error=None):
+        job["status"] = status; job["error"] = error
+        job["timings"]["finished_at"] = time.time()
+        if job["timings"]["started_at"]:
+            job["timings"]["total_seconds"] = round(job["timings"]["finished_at"] - job["timings"]["started_at"], 3)
+        self._record(job)
+        if self.on_finish:
+            try: self.on_finish(job)
+            except Exception as e: print(f"--- 💥 ERROR: Retraining job callback failed: {e} ---")
+
+    def _supervise(self, job):
+        """Runs one job; whatever happens to it, the manager is freed for the next one afterwards."""
+        lock_fd = None
+        try:
+            if self.lock_path and fcntl is not None:
+                # Waits for jobs of other server processes; released (with the fd) once this one is installed.
+                lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            self._run_job(job)
+        except Exception as e:
+            if job["status"] in ACTIVE: self._finish(job, "failed", f"{type(e).__name__}: {e}")
+            print(f"--- 💥 ERROR: Retraining job {job['job_id']} failed: {e} ---")
+        finally:
+            if lock_fd is not None: os.close(lock_fd)
+            with self._lock:
+                self._running = None; self._process = None
+                next_job = self.jobs.get(self._pending); self._pending = None
+                if next_job and next_job["status"] == "queued": self._start(next_job)
+
+    def _run_job(self, job):
+        result = error = None
+        try:
+            spec = {**self.job_spec(), "job_id": job["job_id"], "mode": job["mode"], "n_jobs": self.n_jobs}
+        except Exception as e:
+            spec = None; error = f"could not prepare job: {e}"
+        try: result, error = self._run_process(job, spec, error)
+        except Exception:
+            # An unexpected message or a bug while supervising: stop the child and drop its artifacts.
+            with self._lock: process = self._process
+            if process is not None and process.poll() is None: process.terminate()
+            self._cleanup(spec)
+            raise
+
+        if job.get("cancel_requested"):
+            self._cleanup(spec); self._finish(job, "cancelled")
+        elif error:
+            self._cleanup(spec); self._finish(job, "failed", error)
+            print(f"--- 💥 ERROR: Retraining job {job['job_id']} failed: {error} ---")
+        elif result.get("skipped"):
+            self._set_stage(job, "done"); self._finish(job, "skipped")
+            print(f"--- ℹ️ INFO: Retraining job {job['job_id']}: nothing to do. ---")
+        else:
+            try:
+                self._set_stage(job, "installing")
+                self.install(result)
+                job["metrics"] = result.get("info")
+                self._set_stage(job, "done"); self._finish(job, "succeeded")
+            except Exception as e:
+                self._cleanup(spec); self._finish(job, "failed", f"install failed: {e}")
+                print(f"--- 💥 ERROR: Retraining job {job['job_id']} could not be installed: {e} ---")
+
+    def _run_process(self, job, spec, error):
+        """Runs the training process for `spec` and follows its messages; returns (result, error)."""
+        result = None
+        if spec is not None:
+            # A fresh interpreter rather than multiprocessing, so nothing of the server (or its __main__) is re-imported.
+            here = os.path.dirname(os.path.abspath(__file__))
+            env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [here, os.environ.get("PYTHONPATH")]))}
+            process = subprocess.Popen([sys.executable, "-m", "retrain_jobs", json.dumps(spec)],
+                                       stdout=subprocess.PIPE, text=True, env=env)
+            with self._lock: self._process = process
+            for line in process.stdout:
+                # Anything but a [kind, payload] pair (stray output of a library) is not a message.
+                try: kind, payload = json.loads(line)
+                except (ValueError, TypeError): continue
+                if kind == "stage":
+                    if isinstance(payload, str) and payload in STAGES: self._set_stage(job, payload)
+                elif kind == "result": result = payload if isinstance(payload, dict) else None
+                else: error = str(payload)
+            process.wait()
+            if result is None and error is None:
+                error = "cancelled" if job.get("cancel_requested") else f"training process exited with code {process.returncode}"
+        return result, error
+
+    @staticmethod
+    def _cleanup(spec):
+        """Removes temp artifacts a failed or cancelled job may have left behind."""
+        if spec is None: return
+        for path in _temp_paths(spec):
+            if os.path.exists(path): os.remove(path)
+
+    def shutdown(self):
+        with self._lock: process = self._process
+        if process is not None and process.poll() is None: process.terminate(); process.wait(5)
+
+
+if __name__ == "__main__":
+    _child_main(json.loads(sys.argv[1]))
@@ -0,0 +1,151 @@
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dataset import holdout_mask, open_dataset
+from feedback_store import FeedbackStore
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+FEATURES = ['voltage', 'current', 'power', 'power_factor']
+LABEL = 'Label'
+
+RETRAIN_STATE_PATH = "ai_model/retrain_state.json"
+FULL_N_ESTIMATORS = 100
+TREES_PER_INCREMENT = 10         # new trees fitted per incremental round
+MAX_TREES = FULL_N_ESTIMATORS    # oldest trees are dropped beyond this, or beyond the size of a larger starting forest
+ANCHOR_ROWS_PER_NEW_ROW = 4      # original rows sampled alongside each new feedback row
+MIN_ANCHOR_ROWS = 200
+FULL_REFIT_EVERY = 10            # incremental rounds between scheduled full refits
+FULL_REFIT_MAX_AGE = 24 * 3600   # seconds
+
+def load_state(path=RETRAIN_STATE_PATH):
+    if not os.path.exists(path): return {"feedback_rows_used": 0, "incremental_rounds": 0, "last_full_refit": None}
+    with open(path, "r") as f: return json.load(f)
+
+def save_state(state, path=RETRAIN_STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f: json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_original(dataset_path):
+    """Original dataset in the canonical schema, memory-mapped; the CSV is only converted once per file version."""
+    return open_dataset(dataset_path)
+
+def drop_duplicates(X, y):
+    """Rows of (X, y) with exact repeats removed, first occurrences kept in order."""
+    _, first = np.unique(np.column_stack([X, y]), axis=0, return_index=True)
+    keep = np.sort(first)
+    return X[keep], y[keep]
+
+def load_feedback(feedback_path, skip_rows=0, n_rows=None):
+    """Feedback store rows after the first `skip_rows` (those were already trained on); rows with a missing reading are dropped."""
+    records = FeedbackStore(feedback_path).read(skip_rows, None if n_rows is None else skip_rows + n_rows)
+    # Typed even when empty, so concatenating it onto the original data keeps an integer label column.
+    df = pd.DataFrame({**{col: records[col].astype("float64") for col in FEATURES}, LABEL: records["label"].astype("int64")})
+    return df.dropna()
+
+def count_feedback_rows(feedback_path): return FeedbackStore(feedback_path).count()
+
+def choose_mode(state, new_rows, model_available):
+    """'full' when no model exists or a scheduled refit is due, 'incremental' when there is new feedback, else None."""
+    if not model_available or state.get("last_full_refit") is None: return "full"
+    if state.get("incremental_rounds", 0) >= FULL_REFIT_EVERY: return "full"
+    if time.time() - state["last_full_refit"] > FULL_REFIT_MAX_AGE: return "full"
+    return "incremental" if new_rows > 0 else None
+
+def full_refit(dataset_path, feedback_path, n_feedback_rows=None, n_jobs=None, holdout=False):
+    """Refits scaler and forest on the original dataset plus all feedback. With holdout=True (the new forest
+    will be compacted) the dataset's held-out rows are left out of the fit, see dataset.holdout_mask."""
+    original = load_original(dataset_path)
+    train = ~holdout_mask(original.y) if holdout else np.ones(len(original), dtype=bool)
+    df_feedback = load_feedback(feedback_path, n_rows=n_feedback_rows)
+    print(f"- Loaded {train.sum()} samples from original dataset ({len(original) - train.sum()} held out) and {len(df_feedback)} from feedback log.")
+    X, y = drop_duplicates(np.vstack([original.X[train], df_feedback[FEATURES].to_numpy(np.float32)]),
+                           np.concatenate([original.y[train], df_feedback[LABEL].to_numpy(np.int8)]))
+    print(f"- Combined dataset size: {len(y)} samples.")
+
+    new_scaler = StandardScaler()
+    X_scaled = new_scaler.fit_transform(X)
+    new_model = RandomForestClassifier(n_estimators=FULL_N_ESTIMATORS, random_state=42, oob_score=True, n_jobs=n_jobs)
+    new_model.fit(X_scaled, y)
+    new_model.n_jobs = None
+    del new_model.oob_decision_function_  # per-row scores, only needed for oob_score_
+    return new_model, new_scaler, {"mode": "full", "training_rows": len(y), "new_feedback_rows": len(df_feedback),
+                                   "holdout_rows": int(len(original) - train.sum()), "oob_accuracy": round(float(new_model.oob_score_), 4)}
+
+def incremental_update(model, scaler, dataset_path, df_new, round_seed, n_jobs=None, holdout=False):
+    """
+    Fits TREES_PER_INCREMENT extra trees on the new feedback rows plus a stratified sample of the
+    original data (so the new trees see both classes and the usual operating range), appends them
+    with warm_start and drops the oldest trees beyond MAX_TREES (or beyond the starting forest's size,
+    if that is larger: a round never shrinks the model). The scaler is kept as is.
+    With holdout=True the sample never includes the dataset's held-out rows.
+    """
+    original = load_original(dataset_path)
+    n_anchor = min(len(original), max(MIN_ANCHOR_ROWS, ANCHOR_ROWS_PER_NEW_ROW * len(df_new)))
+    rng = np.random.default_rng(round_seed)
+    held_out = holdout_mask(original.y) if holdout else np.zeros(len(original), dtype=bool)
+    groups = [np.flatnonzero((original.y == label) & ~held_out) for label in np.unique(original.y)]
+    anchor = np.sort(np.concatenate([rng.choice(idx, max(1, int(n_anchor * len(idx) / len(original))), replace=False) for idx in groups]))
+    X_train = np.vstack([original.X[anchor], df_new[FEATURES].to_numpy(np.float32)])
+    y_train = np.concatenate([original.y[anchor], df_new[LABEL].to_numpy(np.int8)])
+
+    # A shallow copy with its own tree list: warm_start then only grows the extra trees
+    # and the live model is left untouched.
+    new_model = copy.copy(model)
+    new_model.estimators_ = list(model.estimators_)
+    new_model.set_params(warm_start=True, random_state=round_seed, oob_score=False, n_jobs=n_jobs,
+                         n_estimators=len(model.estimators_) + TREES_PER_INCREMENT)
+    new_model.fit(scaler.transform(X_train), y_train)
+
+    max_trees = max(MAX_TREES, len(model.estimators_))
+    if len(new_model.estimators_) > max_trees:
+        new_model.estimators_ = new_model.estimators_[-max_trees:]
+    new_model.n_estimators = len(new_model.estimators_)
+    new_model.warm_start = False; new_model.n_jobs = None
+    return new_model, scaler, {"mode": "incremental", "training_rows": len(y_train), "new_feedback_rows": len(df_new),
+                               "trees_added": TREES_PER_INCREMENT, "trees": new_model.n_estimators}
+
+def feedback_accuracy(model, scaler, feedback_path):
+    """Share of logged feedback labels the model reproduces (None without feedback)."""
+    df = load_feedback(feedback_path)
+    if df.empty: return None
+    predicted = model.predict(scaler.transform(df[FEATURES].to_numpy()))
+    return round(float((predicted == df[LABEL].to_numpy()).mean()), 4)
+
+def retrain(model, scaler, dataset_path, feedback_path, mode="auto", state=None, state_path=RETRAIN_STATE_PATH, n_jobs=None,
+            holdout=False):
+    """
+    Returns (new_model, new_scaler, info, new_state), or None when there is nothing to do.
+    `state` is the retraining state that belongs to `model` (read from `state_path` if not given).
+    `holdout` keeps the dataset's held-out rows out of the fit; pass it only when the result will be compacted.
+    The caller persists the model first and then the state, so a crash in between only
+    means the same feedback rows get trained on again.
+    """
+    if state is None: state = load_state(state_path)
+    total_rows = count_feedback_rows(feedback_path)
+    used = min(state.get("feedback_rows_used", 0), total_rows)
+    model_available = model is not None and scaler is not None
+    if mode == "auto": mode = choose_mode(state, total_rows - used, model_available)
+    if mode == "incremental" and not model_available: mode = "full"
+    if mode is None: return None
+
+    start = time.perf_counter()
+    if mode == "full":
+        new_model, new_scaler, info = full_refit(dataset_path, feedback_path, total_rows, n_jobs=n_jobs, holdout=holdout)
+        new_state = {**state, "feedback_rows_used": total_rows, "incremental_rounds": 0, "last_full_refit": time.time()}
+    else:
+        df_new = load_feedback(feedback_path, skip_rows=used, n_rows=total_rows - used)
+        if df_new.empty: return None
+        rounds = state.get("incremental_rounds", 0) + 1
+        new_model, new_scaler, info = incremental_update(model, scaler, dataset_path, df_new, round_seed=42 + rounds, n_jobs=n_jobs,
+                                                         holdout=holdout)
+        new_state = {**state, "feedback_rows_used": total_rows, "incremental_rounds": rounds}
+    info["fit_seconds"] = round(time.perf_counter() - start, 3)
+    info["feedback_accuracy"] = feedback_accuracy(new_model, new_scaler, feedback_path)
+    new_state["last_retrain"] = time.time()
+    return new_model, new_scaler, info, new_state
@@ -0,0 +1,194 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+try: import fcntl
+except ImportError: fcntl = None
+
+
+class StatusRing:
+    """
+    Fixed-size ring of the most recent prediction results.
+    Every result gets a monotonically increasing sequence number, so readers can ask for
+    "everything after seq N" and know whether they fell behind the ring.
+    """
+
+    def __init__(self, capacity=2000):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def last_seq(self): return self._last_seq
+
+    @property
+    def first_seq(self): return max(1, self._last_seq - self.capacity + 1)
+
+    def append(self, result):
+        with self._lock:
+            self._last_seq += 1
+            self._slots[self._last_seq % self.capacity] = (self._last_seq, result)
+            return self._last_seq
+
+    def extend(self, results):
+        with self._lock:
+            for result in results:
+                self._last_seq += 1
+                self._slots[self._last_seq % self.capacity] = (self._last_seq, result)
+            return self._last_seq
+
+    def since(self, seq, limit=None):
+        """Entries with a sequence number greater than `seq`, oldest first, as {"seq": n, **result}."""
+        with self._lock:
+            last = self._last_seq
+            start = max(seq + 1, last - self.capacity + 1, 1)
+            if limit is not None: last = min(last, start + limit - 1)
+            entries = [self._slots[n % self.capacity] for n in range(start, last + 1)]
+        return [{"seq": n, **result} for n, result in entries]
+
+    def latest(self):
+        with self._lock:
+            if not self._last_seq: return None
+            n, result = self._slots[self._last_seq % self.capacity]
+        return {"seq": n, **result}
+
+
+class SharedStatusRing:
+    """
+    StatusRing with the same interface, kept in a memory-mapped file so every worker process of a
+    multi-worker server appends to and reads from one ring. Writers hold an exclusive fcntl lock on
+    the file, readers a shared one. Each slot holds (seq, length, JSON); a result whose JSON does
+    not fit in `slot_size` loses its OPTIONAL_FIELDS, bulkiest first, until it does (the names of
+    the dropped fields go in "truncated"), and is logged. JSON is never cut.
+    """
+
+    _HEADER = struct.Struct("<8sqqq")  # magic, capacity, slot size, last seq
+    _SLOT = struct.Struct("<qi")
+    _MAGIC = b"GLRING01"
+    OPTIONAL_FIELDS = ("window", "suggested_cause", "meter_id", "case_id", "reading_score", "sustained_anomaly")
+
+    def __init__(self, path, capacity=2000, slot_size=2048):
+        self.path = path; self.capacity = capacity; self.slot_size = slot_size
+        size = self._HEADER.size + capacity * slot_size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._thread_lock = threading.Lock()
+        with self._locked(exclusive=True):
+            header = os.pread(self._fd, self._HEADER.size, 0)
+            if len(header) < self._HEADER.size or self._HEADER.unpack(header)[:3] != (self._MAGIC, capacity, slot_size):
+                # New file, or one laid out for another capacity: start empty.
+                os.ftruncate(self._fd, 0); os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self._HEADER.pack(self._MAGIC, capacity, slot_size, 0), 0)
+        self._map = mmap.mmap(self._fd, size)
+
+    class _Lock:
+        def __init__(self, ring, exclusive): self.ring = ring; self.exclusive = exclusive
+
+        def __enter__(self):
+            self.ring._thread_lock.acquire()
+            if fcntl is not None: fcntl.flock(self.ring._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+
+        def __exit__(self, *exc):
+            if fcntl is not None: fcntl.flock(self.ring._fd, fcntl.LOCK_UN)
+            self.ring._thread_lock.release()
+
+    def _locked(self, exclusive): return self._Lock(self, exclusive)
+
+    @property
+    def last_seq(self): return struct.unpack_from("<q", self._map, 24)[0]
+
+    @property
+    def first_seq(self): return max(1, self.last_seq - self.capacity + 1)
+
+    def _encode(self, result):
+        room = self.slot_size - self._SLOT.size
+        data = json.dumps(result).encode("utf-8")
+        if len(data) <= room: return data
+        size = len(data); dropped = []
+        for field in self.OPTIONAL_FIELDS:
+            if field not in result: continue
+            dropped.append(field)
+            data = json.dumps({**{k: v for k, v in result.items() if k not in dropped}, "truncated": dropped}).encode("utf-8")
+            if len(data) <= room: break
+        else:
+            # Only the core fields left and still too big: keep a stub so the reading's seq still shows up.
+            dropped = sorted(k for k in result if k != "timestamp")
+            data = json.dumps({"timestamp": result.get("timestamp"), "truncated": dropped}).encode("utf-8")
+            if len(data) > room: data = b'{"truncated": true}'
+        print(f"--- ⚠️ WARNING: Status ring entry of {size} bytes exceeds its {room}-byte slot; stored without {', '.join(dropped)} ---")
+        return data
+
+    def _write(self, seq, data):
+        offset = self._HEADER.size + (seq % self.capacity) * self.slot_size
+        self._SLOT.pack_into(self._map, offset, seq, len(data))
+        self._map[offset + self._SLOT.size:offset + self._SLOT.size + len(data)] = data
+
+    def _read(self, seq):
+        offset = self._HEADER.size + (seq % self.capacity) * self.slot_size
+        stored_seq, length = self._SLOT.unpack_from(self._map, offset)
+        if stored_seq != seq: return None
+        try: return json.loads(self._map[offset + self._SLOT.size:offset + self._SLOT.size + length])
+        except ValueError: return None  # cut-off entry left by an older version of this class
+
+    def append(self, result): return self.extend([result])
+
+    def extend(self, results):
+        encoded = [self._encode(result) for result in results]
+        with self._locked(exclusive=True):
+            last = self.last_seq
+            for data in encoded: last += 1; self._write(last, data)
+            struct.pack_into("<q", self._map, 24, last)
+            return last
+
+    def since(self, seq, limit=None):
+        if self.last_seq <= seq: return []  # nothing new: no lock needed
+        with self._locked(exclusive=False):
+            last = self.last_seq
+            start = max(seq + 1, last - self.capacity + 1, 1)
+            if limit is not None: last = min(last, start + limit - 1)
+            entries = [(n, self._read(n)) for n in range(start, last + 1)]
+        return [{"seq": n, **result} for n, result in entries if result is not None]
+
+    def latest(self):
+        with self._locked(exclusive=False):
+            last = self.last_seq
+            result = self._read(last) if last else None
+        return None if result is None else {"seq": last, **result}
+
+
+class SnapshotWriter:
+    """Periodically writes the newest ring entry to disk (write-temp-then-rename, so readers never see half a file)."""
+
+    def __init__(self, ring, path, interval=1.0, observe=None):
+        self.ring = ring; self.path = path; self.interval = interval
+        self.observe = observe  # optional callback, gets the duration of each write in seconds
+        self._stop = threading.Event(); self._thread = None; self._written_seq = 0
+
+    def start(self):
+        if self.interval <= 0 or self._thread: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="status-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._thread: return
+        self._stop.set(); self._thread.join(); self._thread = None
+        self.write()
+
+    def write(self):
+        latest = self.ring.latest()
+        if latest is None or latest["seq"] == self._written_seq: return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"  # several worker processes may write the snapshot
+        start = time.perf_counter()
+        try:
+            with open(tmp_path, "w") as f: json.dump(latest, f)
+            os.replace(tmp_path, self.path)
+            self._written_seq = latest["seq"]
+            if self.observe: self.observe(time.perf_counter() - start)
+        except Exception as e: print(f"--- 💥 ERROR: Could not write status snapshot: {e} ---")
+
+    def _run(self):
+        while not self._stop.wait(self.interval): self.write()
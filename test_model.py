@@ -1,11 +1,23 @@
+import os
+import sys
 import joblib
-import pandas as pd
+from dataset import open_dataset
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 
+# Paths are relative to this script (override with: python test_model.py [model.pkl] [dataset.csv] [scaler.pkl]).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def find_file(name):
+    """Looks for `name` in ai_model/ first (where main.py keeps it), then next to this script."""
+    for candidate in (os.path.join(BASE_DIR, "ai_model", name), os.path.join(BASE_DIR, name)):
+        if os.path.exists(candidate): return candidate
+    return os.path.join(BASE_DIR, name)
+
 # -------------------------------------------------
 # 1️⃣ Load the trained model
 # -------------------------------------------------
-model_path = "C://Users//rinur//OneDrive//Desktop//Gridlock_system//gridlock_model.pkl"
+model_path = sys.argv[1] if len(sys.argv) > 1 else find_file("gridlock_model.pkl")
+scaler_path = sys.argv[3] if len(sys.argv) > 3 else find_file("scaler.pkl")
 
 try:
     model = joblib.load(model_path)
@@ -14,14 +26,19 @@ except Exception as e:
     print("❌ Error loading model:", e)
     exit()
 
+# The model is trained on standardized features; score through the scaler when it is available.
+scaler = joblib.load(scaler_path) if os.path.exists(scaler_path) else None
+print(f"✅ Scaler: {scaler_path if scaler is not None else 'not found, scoring raw features'}\n")
+
 # -------------------------------------------------
 # 2️⃣ Load your test dataset
 # -------------------------------------------------
-data_path = "C://Users//rinur//OneDrive//Desktop//Gridlock_system//gridlock_dataset.csv"
+data_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(BASE_DIR, "gridlock_dataset.csv")
 
+# Converted once to the canonical memory-mapped layout (see dataset.py); later runs map it directly.
 try:
-    data = pd.read_csv(data_path)
-    print(f"✅ Test data loaded successfully! Shape: {data.shape}\n")
+    data = open_dataset(data_path)
+    print(f"✅ Test data loaded successfully! Shape: {data.X.shape}\n")
 except Exception as e:
     print("❌ Error loading test data:", e)
     exit()
@@ -29,22 +46,13 @@ except Exception as e:
 # -------------------------------------------------
 # 3️⃣ Prepare features and labels
 # -------------------------------------------------
-feature_cols = ['Voltage', 'Current', 'Power', 'Power_Factor']
-label_col = 'Label'
-
-
-if not all(col in data.columns for col in feature_cols + [label_col]):
-    print("❌ Error: Required columns not found in dataset.")
-    print("Available columns:", list(data.columns))
-    exit()
-
-X_test = data[feature_cols]
-y_test = data[label_col]
+X_test = data.X
+y_test = data.y
 
 # -------------------------------------------------
 # 4️⃣ Run predictions
 # -------------------------------------------------
-y_pred = model.predict(X_test)
+y_pred = model.predict(scaler.transform(X_test) if scaler is not None else X_test)
 
 # -------------------------------------------------
 # 5️⃣ Evaluate performance
@@ -0,0 +1,39 @@
+from alerts import AlertAggregator
+
+
+def anomaly(meter_id, score=0.9):
+    return {"meter_id": meter_id, "suggested_cause": "Bypass / Tampering", "anomaly_score": score}
+
+
+def aggregator(**kwargs):
+    sent = {"alerts": [], "digests": []}
+    options = dict(window=10.0, quiet_period=30.0, burst=3, refill_seconds=100.0, global_burst=1, global_refill_seconds=100.0)
+    options.update(kwargs)
+    agg = AlertAggregator(sent["alerts"].append, sent["digests"].append, **options)
+    return agg, sent
+
+
+def test_refused_global_token_does_not_spend_the_incident_token():
+    agg, sent = aggregator(burst=1, refill_seconds=1000.0)
+    assert agg.record(anomaly("a"), now=0.0) == "alert"
+    assert agg.record(anomaly("b"), now=1.0) == "coalesced"  # global bucket empty
+    agg.flush(now=101.0)  # one global token back; b's own token must still be there
+    assert [d["meter_id"] for d in sent["digests"]] == ["b"]
+    assert agg.counters["rate_limited"] == 1
+
+
+def test_final_digest_waits_for_a_token_instead_of_vanishing():
+    agg, sent = aggregator()
+    agg.record(anomaly("a"), now=0.0); agg.record(anomaly("a"), now=1.0)
+    agg.flush(now=40.0)  # quiet: closed, but the global token went to the first alert
+    assert sent["digests"] == [] and agg.stats()["waiting_digests"] == 1
+    agg.flush(now=101.0)
+    assert [(d["meter_id"], d["final"], d["readings"]) for d in sent["digests"]] == [("a", True, 1)]
+    assert agg.stats()["waiting_digests"] == 0 and agg.counters["suppressed"] == 0
+
+
+def test_final_digests_without_a_token_at_stop_are_counted_as_suppressed():
+    agg, sent = aggregator()
+    agg.record(anomaly("a"), now=0.0); agg.record(anomaly("a"), now=1.0)
+    agg.flush(now=2.0, close_all=True)
+    assert sent["digests"] == [] and agg.counters["suppressed"] == 1
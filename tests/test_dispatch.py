@@ -0,0 +1,90 @@
+import time
+from email.message import EmailMessage
+
+import pytest
+
+from dispatch import OutboundDispatcher, SMTPMailer, http_session
+from fake_sinks import FakeHTTPSink, FakeSMTPServer
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate(): return True
+        time.sleep(0.01)
+    return predicate()
+
+def message(subject):
+    msg = EmailMessage(); msg["From"] = "alerts@gridlock.test"; msg["To"] = "ops@gridlock.test"; msg["Subject"] = subject
+    msg.set_content("Anomaly detected.")
+    return msg
+
+def post(url, payload):
+    http_session().post(url, json=payload, timeout=3).raise_for_status()
+
+def finished(dispatcher): return dispatcher.stats()["queue_depth"] == 0
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = OutboundDispatcher(workers=2, max_attempts=3, backoff=0.05, max_backoff=0.2)
+    dispatcher.start()
+    yield dispatcher
+    dispatcher.stop(timeout=2.0)
+
+
+def test_email_and_webhook_are_delivered(dispatcher):
+    with FakeSMTPServer() as smtp, FakeHTTPSink() as sink:
+        mailer = SMTPMailer(smtp.host, smtp.port)
+        assert dispatcher.submit("email", mailer.send, message("Theft suspected"))
+        assert dispatcher.submit("webhook", post, sink.url, {"hash": "abc"})
+        assert wait_for(lambda: finished(dispatcher))
+        mailer.close()
+        assert [m["message"]["Subject"] for m in smtp.messages] == ["Theft suspected"]
+        assert sink.requests == [{"path": "/", "json": {"hash": "abc"}}]
+    stats = dispatcher.stats()
+    assert stats["succeeded"] == 2 and stats["retried"] == 0 and stats["failed"] == 0
+
+
+def test_failed_delivery_is_retried_with_backoff(dispatcher):
+    with FakeHTTPSink(fail_first=2) as sink:
+        started = time.monotonic()
+        dispatcher.submit("webhook", post, sink.url, {"hash": "abc"})
+        assert wait_for(lambda: finished(dispatcher))
+        elapsed = time.monotonic() - started
+        assert len(sink.requests) == 1
+    stats = dispatcher.stats()
+    assert stats["retried"] == 2 and stats["succeeded"] == 1
+    assert elapsed >= 0.05 + 0.1  # backoff doubles: 0.05s, then 0.1s
+
+
+def test_smtp_temporary_failure_is_retried(dispatcher):
+    with FakeSMTPServer(fail_first=1) as smtp:
+        mailer = SMTPMailer(smtp.host, smtp.port)
+        dispatcher.submit("email", mailer.send, message("Retry me"))
+        assert wait_for(lambda: finished(dispatcher))
+        mailer.close()
+        assert [m["message"]["Subject"] for m in smtp.messages] == ["Retry me"]
+    assert dispatcher.stats()["retried"] == 1
+
+
+def test_delivery_gives_up_after_max_attempts(dispatcher):
+    with FakeHTTPSink(fail_first=100) as sink:
+        dispatcher.submit("webhook", post, sink.url, {"hash": "abc"})
+        assert wait_for(lambda: finished(dispatcher))
+        assert sink.requests == [] and sink.fail_first == 100 - dispatcher.max_attempts
+    stats = dispatcher.stats()
+    assert stats["failed"] == 1 and stats["retried"] == dispatcher.max_attempts - 1 and stats["succeeded"] == 0
+
+
+def test_new_job_does_not_wait_behind_a_retry_backoff():
+    dispatcher = OutboundDispatcher(workers=1, max_attempts=2, backoff=30.0, max_backoff=30.0)
+    dispatcher.start()
+    try:
+        with FakeHTTPSink(fail_first=1) as sink:
+            dispatcher.submit("webhook", post, sink.url, {"n": 1})
+            assert wait_for(lambda: dispatcher.stats()["retried"] == 1)
+            dispatcher.submit("webhook", post, sink.url, {"n": 2})
+            assert wait_for(lambda: sink.requests, timeout=2.0)
+            assert sink.requests[0]["json"] == {"n": 2}
+    finally:
+        dispatcher.stop(timeout=0.1)
@@ -0,0 +1,48 @@
+import pytest
+
+from metrics import MetricsRegistry
+
+parser = pytest.importorskip("prometheus_client.parser")
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    predictions = registry.counter("gridlock_predictions", "Readings scored.", ["endpoint"])
+    predictions.inc("/predict"); predictions.inc("/predict"); predictions.inc("/predict_batch", amount=50)
+    registry.counter("gridlock_anomalies", "Readings flagged as anomalies.").inc()
+    latency = registry.histogram("gridlock_request_seconds", "Handler latency per endpoint.", ["endpoint"])
+    latency.observe(0.003, "/predict"); latency.observe(0.2, "/predict")
+    registry.gauge("gridlock_open_cases", "Anomaly cases awaiting feedback.", lambda: 7)
+    registry.gauge("gridlock_outbound_jobs", 'Outbound jobs by "outcome"\\since startup.',
+                   lambda: {("sent",): 3, ("failed",): 1}, ["outcome"])
+    return registry
+
+
+def families(registry):
+    return {family.name: family for family in parser.text_string_to_metric_families(registry.render())}
+
+
+def test_render_parses_with_one_family_per_metric(registry):
+    parsed = families(registry)
+    assert set(parsed) == {"gridlock_predictions", "gridlock_anomalies", "gridlock_request_seconds",
+                           "gridlock_open_cases", "gridlock_outbound_jobs"}
+    assert [parsed[name].type for name in sorted(parsed)] == ["counter", "gauge", "gauge", "counter", "histogram"]
+    assert parsed["gridlock_outbound_jobs"].documentation == 'Outbound jobs by "outcome"\\since startup.'
+
+
+def test_counter_help_and_type_use_the_sample_name(registry):
+    text = registry.render()
+    assert "# HELP gridlock_predictions_total Readings scored." in text
+    assert "# TYPE gridlock_predictions_total counter" in text
+    samples = {(s.name, s.labels.get("endpoint")): s.value for s in families(registry)["gridlock_predictions"].samples}
+    assert samples == {("gridlock_predictions_total", "/predict"): 2, ("gridlock_predictions_total", "/predict_batch"): 50}
+
+
+def test_histogram_samples(registry):
+    samples = families(registry)["gridlock_request_seconds"].samples
+    by_name = {}
+    for sample in samples: by_name.setdefault(sample.name, []).append(sample)
+    assert by_name["gridlock_request_seconds_count"][0].value == 2
+    assert by_name["gridlock_request_seconds_sum"][0].value == pytest.approx(0.203)
+    assert [s.value for s in by_name["gridlock_request_seconds_bucket"] if s.labels["le"] == "+Inf"] == [2]
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+import retraining
+
+
+def synthetic_csv(path, n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    label = (rng.random(n) < 0.2).astype(int)
+    current = np.where(label == 1, rng.normal(12, 2, n), rng.normal(5, 1, n))
+    voltage = rng.normal(230, 3, n); power_factor = rng.uniform(0.85, 0.99, n)
+    power = voltage * current * power_factor * np.where(label == 1, 0.6, 1.0)
+    pd.DataFrame({"Voltage": voltage, "Current": current, "Power": power, "Power_Factor": power_factor, "Label": label}).to_csv(path, index=False)
+    return path
+
+
+def test_incremental_round_keeps_a_forest_larger_than_max_trees(tmp_path):
+    csv_path = synthetic_csv(tmp_path / "dataset.csv")
+    data = pd.read_csv(csv_path)
+    X = data.iloc[:, :4].to_numpy(); y = data["Label"].to_numpy()
+    scaler = StandardScaler().fit(X)
+    n_trees = retraining.MAX_TREES + 2 * retraining.TREES_PER_INCREMENT
+    model = RandomForestClassifier(n_estimators=n_trees, max_depth=4, random_state=0).fit(scaler.transform(X), y)
+    df_new = pd.DataFrame({"voltage": [230.0, 229.0], "current": [13.0, 4.8], "power": [1700.0, 1050.0],
+                           "power_factor": [0.9, 0.95], "Label": [1, 0]})
+
+    new_model, _, info = retraining.incremental_update(model, scaler, str(csv_path), df_new, round_seed=7)
+
+    assert info["trees"] == n_trees and len(new_model.estimators_) == n_trees
+    # Only the TREES_PER_INCREMENT oldest trees made room for the new ones.
+    assert new_model.estimators_[:-retraining.TREES_PER_INCREMENT] == model.estimators_[retraining.TREES_PER_INCREMENT:]
+    assert len(model.estimators_) == n_trees  # the live model is untouched
+
+
+def test_full_refit_holds_rows_out_only_when_asked(tmp_path):
+    csv_path = synthetic_csv(tmp_path / "dataset.csv")
+    feedback_path = str(tmp_path / "feedback")
+    _, _, info = retraining.full_refit(str(csv_path), feedback_path, n_jobs=1)
+    _, _, held = retraining.full_refit(str(csv_path), feedback_path, n_jobs=1, holdout=True)
+    assert info["holdout_rows"] == 0
+    assert held["holdout_rows"] > 0 and held["training_rows"] == info["training_rows"] - held["holdout_rows"]